@@ -1,3 +1,5 @@
+from django.core.cache import cache
+
 import amo
 
 
@@ -15,6 +17,90 @@ def match_rules(rules, app, action):
     return False
 
 
+def compile_rules(rules):
+    """
+    Returns the frozenset of (app, action) pairs allowed by `rules`, a list of
+    rules of Group.
+
+    An (app, '%') pair is added for each app having a rule, so that 'app:%'
+    checks are lookups too.
+    """
+    permissions = set()
+    for group_rules in rules:
+        for rule in group_rules.split(','):
+            rule_app, rule_action = rule.split(':')
+            permissions.add((rule_app, rule_action))
+            permissions.add((rule_app, '%'))
+    return frozenset(permissions)
+
+
+def permissions_allow(permissions, app, action):
+    """Same as `match_rules`, for a set of `compile_rules()`."""
+    return ((app, action) in permissions or (app, '*') in permissions or
+            ('*', action) in permissions or ('*', '*') in permissions)
+
+
+def permissions_key(user_id):
+    """
+    Returns the cache key of the permissions of a user, which changes with
+    the rules of any group and with the groups of the user.
+    """
+    from amo.utils import cache_ns_key
+    return 'acl:permissions:%s:%s:%s' % (
+        user_id, cache_ns_key('acl:groups'),
+        cache_ns_key('acl:user:%s' % user_id))
+
+
+def invalidate_permissions(user_id=None):
+    """
+    Invalidates the cached permissions of a user, or of everybody if no user
+    is given.
+    """
+    from amo.utils import cache_ns_key
+    if user_id is None:
+        cache_ns_key('acl:groups', increment=True)
+    else:
+        cache_ns_key('acl:user:%s' % user_id, increment=True)
+
+
+def get_permissions(user):
+    """
+    Returns the compiled permissions of `user`, a UserProfile. They are
+    cached on the user for the rest of the request, and in memcache.
+    """
+    permissions = getattr(user, '_acl_permissions', None)
+    # Users and requests can be mocks in tests, only trust a frozenset.
+    if not isinstance(permissions, frozenset):
+        key = permissions_key(user.id)
+        permissions = cache.get(key)
+        if permissions is None:
+            from access.models import Group
+            permissions = compile_rules(
+                Group.objects.filter(users=user)
+                             .values_list('rules', flat=True))
+            cache.set(key, permissions)
+        user._acl_permissions = permissions
+    return permissions
+
+
+def get_request_permissions(request):
+    """
+    Returns the compiled permissions of the request user. The ACL middleware
+    sets `request.permissions`, otherwise they are compiled once from
+    `request.groups`.
+    """
+    permissions = getattr(request, 'permissions', None)
+    if isinstance(permissions, frozenset):
+        return permissions
+    groups = getattr(request, 'groups', ())
+    compiled = getattr(request, '_acl_compiled', None)
+    # Recompile if request.groups was replaced.
+    if not isinstance(compiled, tuple) or compiled[0] is not groups:
+        compiled = (groups, compile_rules(group.rules for group in groups))
+        request._acl_compiled = compiled
+    return compiled[1]
+
+
 def action_allowed(request, app, action):
     """
     Determines if the request user has permission to do a certain action
@@ -22,16 +108,12 @@ def action_allowed(request, app, action):
     'Admin:%' is true if the user has any of:
     ('Admin:*', 'Admin:%s'%whatever, '*:*',) as rules.
     """
-    allowed = any(match_rules(group.rules, app, action) for group in
-                  getattr(request, 'groups', ()))
-    return allowed
+    return permissions_allow(get_request_permissions(request), app, action)
 
 
 def action_allowed_user(user, app, action):
     """Similar to action_allowed, but takes user instead of request."""
-    allowed = any(match_rules(group.rules, app, action) for group in
-                  user.groups.all())
-    return allowed
+    return permissions_allow(get_permissions(user), app, action)
 
 
 def check_ownership(request, obj, require_owner=False, require_author=False,
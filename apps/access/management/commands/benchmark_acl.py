@@ -0,0 +1,59 @@
+"""
+Count the permission checks per second, matching the rules of the groups of
+a user on each check as before, and with the compiled permissions:
+
+    ./manage.py benchmark_acl --groups=5 --checks=100000
+
+No database is needed, the groups are made up.
+"""
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from access.acl import compile_rules, match_rules, permissions_allow
+from access.models import Group
+
+
+RULES = ('Apps:Review,Apps:ReviewEscalated,Apps:ReviewTarball',
+         'Addons:Review,Addons:ReviewUnlisted,Personas:Review',
+         'Stats:View,CollectionStats:View,AccountLookup:View',
+         'Apps:Edit,Apps:Configure,Apps:ViewConfiguration',
+         'Users:Edit,Reviews:Edit,Collections:Edit,Admin:%')
+
+CHECKS = (('Admin', '%'), ('Apps', 'Review'), ('Addons', 'Edit'),
+          ('Personas', 'Review'), ('Apps', 'ReviewRegionCN'),
+          ('Users', 'Edit'), ('Stats', 'View'), ('Apps', 'ModerateReview'))
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--groups', action='store', type='int', default=5,
+                    help='Number of groups of the user'),
+        make_option('--checks', action='store', type='int', default=100000,
+                    help='Number of permission checks'),
+    )
+
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        groups = [Group(rules=RULES[i % len(RULES)])
+                  for i in range(kw['groups'])]
+        checks = [CHECKS[i % len(CHECKS)] for i in range(kw['checks'])]
+
+        def per_check():
+            for app, action in checks:
+                any(match_rules(g.rules, app, action) for g in groups)
+
+        def compiled():
+            permissions = compile_rules(g.rules for g in groups)
+            for app, action in checks:
+                permissions_allow(permissions, app, action)
+
+        for name, func in (('match_rules', per_check),
+                           ('compiled', compiled)):
+            start = time.time()
+            func()
+            elapsed = time.time() - start
+            self.stdout.write('%s: %s checks in %.2fs, %.0f checks/sec\n' % (
+                name, len(checks), elapsed, len(checks) / elapsed))
@@ -31,6 +31,7 @@ class ACLMiddleware(object):
             amo.set_user(amo_user)
             request.user._profile_cache = request.amo_user = amo_user
             request.groups = request.amo_user.groups.all()
+            request.permissions = acl.get_permissions(amo_user)
 
             if acl.action_allowed(request, 'Admin', '%'):
                 request.user.is_staff = True
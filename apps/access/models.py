@@ -33,9 +33,28 @@ class GroupUser(models.Model):
         db_table = u'groups_users'
 
 
+@dispatch.receiver(signals.post_save, sender=Group,
+                   dispatch_uid='group.post_save')
+@dispatch.receiver(signals.post_delete, sender=Group,
+                   dispatch_uid='group.post_delete')
+def group_invalidate_permissions(sender, instance, **kw):
+    from access import acl
+    acl.invalidate_permissions()
+
+
+def groupuser_invalidate_permissions(instance):
+    from access import acl
+    acl.invalidate_permissions(instance.user_id)
+    # Forget the permissions cached on the user for the request, if loaded.
+    user = getattr(instance, '_user_cache', None)
+    if user is not None:
+        user._acl_permissions = None
+
+
 @dispatch.receiver(signals.post_save, sender=GroupUser,
                    dispatch_uid='groupuser.post_save')
 def groupuser_post_save(sender, instance, **kw):
+    groupuser_invalidate_permissions(instance)
     if kw.get('raw'):
         return
 
@@ -51,6 +70,7 @@ def groupuser_post_save(sender, instance, **kw):
 @dispatch.receiver(signals.post_delete, sender=GroupUser,
                    dispatch_uid='groupuser.post_delete')
 def groupuser_post_delete(sender, instance, **kw):
+    groupuser_invalidate_permissions(instance)
     if kw.get('raw'):
         return
 
@@ -2,7 +2,7 @@ from django.contrib.auth.models import User
 from django.http import HttpRequest
 
 import mock
-from nose.tools import assert_false
+from nose.tools import assert_false, eq_
 
 import amo
 from amo.tests import TestCase, req_factory_factory
@@ -10,8 +10,10 @@ from amo.urlresolvers import reverse
 from addons.models import Addon, AddonUser
 from users.models import UserProfile
 
-from .acl import (action_allowed, check_addon_ownership, check_ownership,
-                  check_reviewer, match_rules)
+from .acl import (action_allowed, action_allowed_user, check_addon_ownership,
+                  check_ownership, check_reviewer, compile_rules,
+                  get_permissions, match_rules, permissions_allow)
+from .models import Group, GroupUser
 
 
 def test_match_rules():
@@ -59,6 +61,27 @@ def test_match_rules():
             "%s == Admin:%% and shouldn't" % rule
 
 
+def test_compile_rules():
+    rules = ('*:*', 'Admin:*', 'Admin:%', 'Admin:Foo', 'Editors:*,Admin:Bar',
+             'Stats:View', 'Apps:Review,Apps:ReviewRegionCN', '*:View',
+             'None:None')
+    checks = (('Admin', '%'), ('Admin', 'Foo'), ('Admin', 'Bar'),
+              ('Apps', 'Review'), ('Apps', '%'), ('Stats', 'View'),
+              ('Stats', 'Edit'), ('Editors', 'Anything'), ('Foo', 'View'))
+    for rule in rules:
+        permissions = compile_rules([rule])
+        for app, action in checks:
+            eq_(permissions_allow(permissions, app, action),
+                match_rules(rule, app, action),
+                '%s and %s:%s' % (rule, app, action))
+
+    permissions = compile_rules(['Apps:Review', 'Admin:Foo,Stats:View'])
+    assert permissions_allow(permissions, 'Admin', 'Foo')
+    assert permissions_allow(permissions, 'Stats', 'View')
+    assert not permissions_allow(permissions, 'Admin', 'Bar')
+    assert not permissions_allow(compile_rules([]), 'Admin', '%')
+
+
 def test_anonymous_user():
     # Fake request must not have .groups, just like an anonymous user.
     fake_request = HttpRequest()
@@ -236,3 +259,53 @@ class TestCheckReviewer(TestCase):
         assert not check_reviewer(req, only='app')
         assert not check_reviewer(req, only='addon')
         assert check_reviewer(req, only='persona')
+
+
+class TestPermissions(TestCase):
+    fixtures = ['base/users']
+
+    def setUp(self):
+        self.user = UserProfile.objects.get(email='regular@mozilla.com')
+
+    def get_user(self):
+        return UserProfile.objects.get(pk=self.user.pk)
+
+    def test_cached(self):
+        self.grant_permission(self.user, 'Apps:Review')
+        eq_(get_permissions(self.get_user()),
+            frozenset([('Apps', 'Review'), ('Apps', '%')]))
+        user = self.get_user()
+        with self.assertNumQueries(0):
+            assert action_allowed_user(user, 'Apps', 'Review')
+            assert not action_allowed_user(user, 'Admin', '%')
+
+    def test_group_user_invalidates(self):
+        assert not action_allowed_user(self.get_user(), 'Apps', 'Review')
+        self.grant_permission(self.user, 'Apps:Review')
+        assert action_allowed_user(self.get_user(), 'Apps', 'Review')
+        GroupUser.objects.filter(user=self.user).delete()
+        assert not action_allowed_user(self.get_user(), 'Apps', 'Review')
+
+    def test_group_invalidates(self):
+        self.grant_permission(self.user, 'Apps:Review')
+        assert action_allowed_user(self.get_user(), 'Apps', 'Review')
+        Group.objects.update(rules='Apps:Edit')
+        Group.objects.get().save()
+        user = self.get_user()
+        assert not action_allowed_user(user, 'Apps', 'Review')
+        assert action_allowed_user(user, 'Apps', 'Edit')
+
+    def test_request_permissions(self):
+        self.grant_permission(self.user, 'Apps:Review')
+        req = req_factory_factory('noop', user=self.user)
+        req.permissions = get_permissions(self.get_user())
+        # The compiled permissions are used rather than the groups.
+        req.groups = ()
+        assert action_allowed(req, 'Apps', 'Review')
+
+    def test_request_groups_replaced(self):
+        req = HttpRequest()
+        req.groups = [Group(rules='Apps:Review')]
+        assert action_allowed(req, 'Apps', 'Review')
+        req.groups = [Group(rules='Apps:Edit')]
+        assert not action_allowed(req, 'Apps', 'Review')
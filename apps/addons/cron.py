@@ -398,7 +398,6 @@ def recs():
     except Exception:
         log.error('Could not call ps', exc_info=True)
 
-    sim = recommend.similarity  # Locals are faster.
     sims, start, timers = {}, [time.time()], {'calc': [], 'sql': []}
 
     def write_recs():
@@ -413,14 +412,13 @@ def recs():
         timers['sql'].append(time.time() - calc)
         start[0] = time.time()
 
-    for idx, (addon, collections) in enumerate(addons.iteritems(), 1):
-        xs = [(other, sim(collections, cs))
-              for other, cs in addons.iteritems()]
-        # Sort by similarity and keep the top N.
-        others = sorted(xs, key=operator.itemgetter(1), reverse=True)
-        sims[addon] = [(k, v) for k, v in others[:11] if k != addon]
-
-        if idx % 50 == 0:
+    # Only the add-ons sharing collections get compared, see
+    # recommend.SimilarityIndex.
+    results = recommend.all_top(addons, k=10,
+                                processes=settings.RECOMMENDATION_PROCESSES)
+    for idx, (addon, others) in enumerate(results, 1):
+        sims[addon] = others
+        if idx % 500 == 0:
             write_recs()
     else:
         write_recs()
@@ -11,11 +11,9 @@ from amo.utils import chunked
 from devhub.tasks import convert_purified, flag_binary, get_preview_sizes
 from market.tasks import check_paypal, check_paypal_multiple
 
-from mkt.webapps.tasks import (add_uuids, clean_apps, dump_apps,
-                               fix_missing_icons, import_manifests,
+from mkt.webapps.tasks import (add_uuids, fix_missing_icons, import_manifests,
                                regenerate_icons_and_thumbnails,
-                               update_manifests, update_supported_locales,
-                               zip_apps)
+                               update_manifests, update_supported_locales)
 
 
 tasks = {
@@ -50,11 +48,6 @@ tasks = {
         'qs': [Q(type=amo.ADDON_WEBAPP, disabled_by_user=False,
                  status__in=[amo.STATUS_PENDING, amo.STATUS_PUBLIC,
                              amo.STATUS_PUBLIC_WAITING])]},
-    'dump_apps': {'method': dump_apps,
-                  'qs': [Q(type=amo.ADDON_WEBAPP, status=amo.STATUS_PUBLIC,
-                           disabled_by_user=False)],
-                  'pre': clean_apps,
-                  'post': zip_apps},
     'fix_missing_icons': {'method': fix_missing_icons,
                           'qs': [Q(type=amo.ADDON_WEBAPP,
                                    status__in=[amo.STATUS_PENDING,
@@ -46,7 +46,8 @@ from translations.fields import (LinkifiedField, PurifiedField, save_signal,
 from translations.query import order_by_translation
 from users.models import UserForeignKey, UserProfile
 from versions.compare import version_int
-from versions.models import Version
+from versions.models import (invalidate_update_cache,
+                             invalidate_update_cache_for, Version)
 
 from . import query, signals
 
@@ -1794,6 +1795,15 @@ def watch_disabled(old_attr={}, new_attr={}, instance=None, sender=None, **kw):
             f.hide_disabled_file()
 
 
+@Addon.on_change
+def watch_update_cache(old_attr={}, new_attr={}, instance=None, sender=None,
+                       **kw):
+    """Expire the update responses of an add-on made (un)available."""
+    if any(name in new_attr and old_attr.get(name) != new_attr[name]
+           for name in ('status', 'disabled_by_user')):
+        invalidate_update_cache_for(instance.guid)
+
+
 def attach_devices(addons):
     addon_dict = dict((a.id, a) for a in addons if a.type == amo.ADDON_WEBAPP)
     devices = (AddonDeviceType.objects.filter(addon__in=addon_dict)
@@ -2569,6 +2579,12 @@ models.signals.post_save.connect(update_incompatible_versions,
 models.signals.post_delete.connect(update_incompatible_versions,
                                    sender=CompatOverrideRange,
                                    dispatch_uid='cor_update_incompatible')
+models.signals.post_save.connect(
+    invalidate_update_cache, sender=IncompatibleVersions,
+    dispatch_uid='invalidate_update_cache_IncompatibleVersions')
+models.signals.post_delete.connect(
+    invalidate_update_cache, sender=IncompatibleVersions,
+    dispatch_uid='invalidate_update_cache_IncompatibleVersions')
 
 
 # webapps.models imports addons.models to get Addon, so we need to keep the
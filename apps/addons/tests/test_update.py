@@ -3,7 +3,9 @@ from datetime import datetime, timedelta
 from email import utils
 
 from django.db import connection
+from django.test.utils import override_settings
 
+import mock
 from nose.tools import eq_
 
 import amo
@@ -12,9 +14,11 @@ from addons.models import (Addon, CompatOverride, CompatOverrideRange,
                            IncompatibleVersions)
 from applications.models import Application, AppVersion
 from files.models import File
-from services import update
+from services import update, update_cache
 import settings_local
-from versions.models import ApplicationsVersions, Version
+from versions.models import (ApplicationsVersions,
+                             invalidate_pending_update_cache,
+                             invalidate_update_cache_for, Version)
 
 
 class TestDataValidate(amo.tests.TestCase):
@@ -135,7 +139,7 @@ class TestLookup(amo.tests.TestCase):
         # Allow version to be optional.
         if args[0]:
             data['version'] = args[0]
-        up = update.Update(data)
+        up = update.Update(data, compat_index=self.get_compat_index())
         up.cursor = connection.cursor()
         assert up.is_valid()
         up.data['version_int'] = args[1]
@@ -143,6 +147,9 @@ class TestLookup(amo.tests.TestCase):
         return (up.data['row'].get('version_id'),
                 up.data['row'].get('file_id'))
 
+    def get_compat_index(self):
+        return None
+
     def change_status(self, version, status):
         version = Version.objects.get(pk=version)
         file = version.files.all()[0]
@@ -394,6 +401,7 @@ class TestDefaultToCompat(amo.tests.TestCase):
         self.ver_1_1 = 1268882
         self.ver_1_2 = 1268883
         self.ver_1_3 = 1268884
+        self.compat_index = None
 
         self.expected = {
             '3.0-strict': None, '3.0-normal': None, '3.0-ignore': None,
@@ -436,7 +444,7 @@ class TestDefaultToCompat(amo.tests.TestCase):
             'version': kw.get('item_version', '1.0'),
             'appID': self.app.guid,
             'appVersion': kw.get('app_version', '3.0'),
-        })
+        }, compat_index=self.compat_index)
         up.cursor = connection.cursor()
         assert up.is_valid()
         up.compat_mode = kw.get('compat_mode', 'strict')
@@ -563,6 +571,56 @@ class TestDefaultToCompat(amo.tests.TestCase):
         self.check(self.expected)
 
 
+class TestLookupCompatIndex(TestLookup):
+    """Runs the lookup tests against `CompatIndex` instead of SQL."""
+
+    def get_compat_index(self):
+        # The tests change files in between lookups, so start afresh.
+        return update.CompatIndex(update_cache.UpdateCache(10, 60))
+
+
+class TestDefaultToCompatIndex(TestDefaultToCompat):
+    """
+    Runs the default to compatible tests against `CompatIndex`, which
+    answers every application version and compat mode from the same entry.
+    """
+
+    def setUp(self):
+        super(TestDefaultToCompatIndex, self).setUp()
+        self.compat_index = update.CompatIndex(
+            update_cache.UpdateCache(10, 60))
+
+    def test_matches_sql(self):
+        self.create_override(min_version='1.2', max_version='1.3',
+                             min_app_version='5.0', max_app_version='6.*')
+        for version in ['3.0', '4.0', '5.0', '6.0', '7.0', '8.0']:
+            for mode in ['strict', 'normal', 'ignore']:
+                up = update.Update({
+                    'reqVersion': 1,
+                    'id': self.addon.guid,
+                    'version': '1.0',
+                    'appID': self.app.guid,
+                    'appVersion': version,
+                }, compat_mode=mode)
+                up.cursor = connection.cursor()
+                assert up.is_valid()
+                up.get_beta()
+                expected = up.get_update_sql()
+                eq_(self.compat_index.lookup(up), expected,
+                    'Unexpected row for "%s-%s"' % (version, mode))
+
+    def test_no_queries_once_loaded(self):
+        self.get(app_version='4.0')
+        with self.assertNumQueries(0):
+            eq_(self.compat_index.get(self.get_update()),
+                self.compat_index.get(self.get_update()))
+
+    def get_update(self):
+        up = update.Update({'id': self.addon.guid})
+        up.data.update(guid=self.addon.guid, app_id=self.app.id)
+        return up
+
+
 class TestResponse(amo.tests.TestCase):
     fixtures = ['base/addon_3615',
                 'base/platforms',
@@ -793,3 +851,161 @@ class TestResponse(amo.tests.TestCase):
         data['appVersion'] = '5.0.1'
         upd = self.get(data)
         eq_(upd.get_rdf(), upd.get_no_updates_rdf())
+
+
+class TestUpdateCache(amo.tests.TestCase):
+
+    def setUp(self):
+        self.cache = update_cache.UpdateCache(2, 60)
+        self.key = ('guid', '1.0', 'appguid', '3.6', None, 'strict')
+
+    def test_get_set(self):
+        eq_(self.cache.get(self.key), None)
+        self.cache.set(self.key, 'rdf', 0)
+        eq_(self.cache.get(self.key), 'rdf')
+        eq_((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_disabled(self):
+        cache = update_cache.UpdateCache(0, 60)
+        cache.set(self.key, 'rdf', 0)
+        eq_(cache.get(self.key), None)
+
+    def test_no_key(self):
+        self.cache.set(None, 'rdf', 0)
+        eq_(self.cache.get(None), None)
+
+    def test_lru(self):
+        keys = [('guid-%s' % i,) + self.key[1:] for i in range(3)]
+        self.cache.set(keys[0], 'rdf-0', 0)
+        self.cache.set(keys[1], 'rdf-1', 0)
+        # Use the first one, the second one becomes the least recently used.
+        self.cache.get(keys[0])
+        self.cache.set(keys[2], 'rdf-2', 0)
+        eq_(self.cache.get(keys[0]), 'rdf-0')
+        eq_(self.cache.get(keys[1]), None)
+        eq_(self.cache.get(keys[2]), 'rdf-2')
+
+    @mock.patch('services.update_cache.time')
+    def test_timeout(self, time):
+        time.return_value = 1000
+        self.cache.set(self.key, 'rdf', 0)
+        time.return_value = 1061
+        eq_(self.cache.get(self.key), None)
+
+    def test_invalidate(self):
+        self.cache.set(self.key, 'rdf', 0)
+        self.cache.invalidate('other-guid')
+        eq_(self.cache.get(self.key), 'rdf')
+        self.cache.invalidate('GUID')
+        eq_(self.cache.get(self.key), None)
+
+    @mock.patch('services.update_cache.memcache.Client')
+    def test_invalidate_generation(self, Client):
+        client = Client.return_value
+        client.get.return_value = None
+        cache = update_cache.UpdateCache(2, 60, servers=['localhost:11211'])
+        cache.set(self.key, 'rdf', cache.generation_for(self.key))
+        eq_(cache.get(self.key), 'rdf')
+
+        # Another process bumped the generation.
+        client.get.return_value = 1
+        eq_(cache.get(self.key), None)
+
+    def test_generation_key(self):
+        eq_(self.cache.generation_key('Some@Guid'),
+            self.cache.generation_key('some@guid'))
+
+    @mock.patch('services.update_cache.memcache.Client')
+    def test_invalidated_while_computed(self, Client):
+        client = Client.return_value
+        client.get.return_value = None
+        cache = update_cache.UpdateCache(2, 60, servers=['localhost:11211'])
+        generation = cache.generation_for(self.key)
+        # A change was committed after the response was computed from the
+        # data before it.
+        client.get.return_value = 1
+        cache.set(self.key, 'rdf', generation)
+        eq_(cache.get(self.key), None)
+
+    @mock.patch('services.update_cache.memcache.Client')
+    def test_memcache_down(self, Client):
+        Client.return_value.get.side_effect = Exception
+        cache = update_cache.UpdateCache(2, 60, servers=['localhost:11211'])
+        cache.set(self.key, 'rdf', cache.generation_for(self.key))
+        eq_(cache.get(self.key), None)
+
+    def test_cache_key(self):
+        data = {
+            'id': '{2fa4ed95-0317-4c6a-a74c-5f3e3912c1f9}',
+            'version': '2.0.58',
+            'reqVersion': 1,
+            'appID': '{ec8030f7-c20a-464f-9b0e-13a3a9e97384}',
+            'appVersion': '3.7a1pre',
+            'appOS': 'something %s penguin' % amo.PLATFORM_LINUX.api_name,
+        }
+        eq_(update.Update(data, 'normal').get_cache_key(),
+            (data['id'], data['version'], data['appID'], data['appVersion'],
+             amo.PLATFORM_LINUX.id, 'normal'))
+        upper = dict(data, id=data['id'].upper())
+        eq_(update.Update(upper, 'normal').get_cache_key(),
+            update.Update(data, 'normal').get_cache_key())
+        del data['appID']
+        eq_(update.Update(data).get_cache_key(), None)
+
+    @override_settings(SERVICES_UPDATE_CACHE_SERVERS=['localhost:11211'])
+    @mock.patch('services.update_cache.UpdateCache.invalidate')
+    def test_invalidated_on_file_change(self, invalidate):
+        addon = amo.tests.addon_factory(guid='some@guid')
+        invalidate_pending_update_cache(None)
+        invalidate.reset_mock()
+        file_ = addon.current_version.files.all()[0]
+        file_.status = amo.STATUS_DISABLED
+        file_.save()
+        # Not before the change is committed, at the end of the request.
+        assert not invalidate.called
+        invalidate_pending_update_cache(None)
+        invalidate.assert_called_with('some@guid')
+
+    @override_settings(SERVICES_UPDATE_CACHE_SERVERS=['localhost:11211'])
+    @mock.patch('services.update_cache.UpdateCache.invalidate')
+    def test_invalidated_on_app_versions_change(self, invalidate):
+        addon = amo.tests.addon_factory(guid='some@guid')
+        invalidate_pending_update_cache(None)
+        invalidate.reset_mock()
+        apps = addon.current_version.apps.all()[0]
+        apps.max = AppVersion.objects.create(application=apps.application,
+                                             version='99.0')
+        apps.save()
+        invalidate_pending_update_cache(None)
+        invalidate.assert_called_with('some@guid')
+        invalidate.reset_mock()
+        apps.delete()
+        invalidate_pending_update_cache(None)
+        invalidate.assert_called_with('some@guid')
+
+    @override_settings(SERVICES_UPDATE_CACHE_SERVERS=['localhost:11211'])
+    @mock.patch('versions.models._update_cache', None)
+    @mock.patch('services.update_cache.memcache.Client')
+    def test_invalidated_with_one_client(self, Client):
+        invalidate_update_cache_for('some@guid')
+        invalidate_update_cache_for('other@guid')
+        invalidate_pending_update_cache(None)
+        eq_(Client.call_count, 1)
+        eq_(Client.return_value.incr.call_count, 2)
+
+    @override_settings(SERVICES_UPDATE_CACHE_SERVERS=['localhost:11211'])
+    @mock.patch('services.update_cache.UpdateCache.invalidate')
+    def test_invalidated_on_addon_status_change(self, invalidate):
+        addon = amo.tests.addon_factory(guid='some@guid')
+        invalidate_pending_update_cache(None)
+        invalidate.reset_mock()
+        addon.update(name='Something else')
+        invalidate_pending_update_cache(None)
+        assert not invalidate.called
+        addon.update(disabled_by_user=True)
+        invalidate_pending_update_cache(None)
+        invalidate.assert_called_with('some@guid')
+        invalidate.reset_mock()
+        addon.update(status=amo.STATUS_DISABLED)
+        invalidate_pending_update_cache(None)
+        invalidate.assert_called_with('some@guid')
@@ -88,6 +88,46 @@ class TransformQuerySet(queryset_transform.TransformQuerySet):
         f = decorators.skip_cache(fn)
         return super(TransformQuerySet, self).transform(f)
 
+    def with_related(self, *names):
+        """
+        Attach the related data registered on the model under `names`, see
+        `register_prefetch()`. Each of them costs one query for the whole
+        queryset, however many objects it contains.
+        """
+        qs = self
+        for name in names:
+            prefetch = get_prefetch(self.model, name)
+            if isinstance(prefetch, basestring):
+                qs = qs.prefetch_related(prefetch)
+            else:
+                qs = qs.transform(prefetch)
+        return qs
+
+
+def register_prefetch(model, name, prefetch):
+    """
+    Register `prefetch` as the way to attach the related data called `name` to
+    a list of `model` instances.
+
+    `prefetch` is either a relation lookup, handed over to Django's
+    `prefetch_related()`, or a transform function attaching the data to the
+    objects it is given with a single query.
+    """
+    # Don't let subclasses or proxies update the registry of their parents.
+    if '_prefetches' not in model.__dict__:
+        model._prefetches = {}
+    model._prefetches[name] = prefetch
+
+
+def get_prefetch(model, name):
+    """Return the prefetch registered as `name` for `model` or a parent."""
+    for cls in model.__mro__:
+        prefetches = cls.__dict__.get('_prefetches', {})
+        if name in prefetches:
+            return prefetches[name]
+    raise ValueError('No prefetch %r registered for %s.' %
+                     (name, model.__name__))
+
 
 class RawQuerySet(models.query.RawQuerySet):
     """A RawQuerySet with __len__."""
@@ -134,6 +174,9 @@ class UncachedManagerBase(models.Manager):
     def transform(self, fn):
         return self.all().transform(fn)
 
+    def with_related(self, *names):
+        return self.all().with_related(*names)
+
     def raw(self, raw_query, params=None, *args, **kwargs):
         return RawQuerySet(raw_query, self.model, params=params,
                            using=self._db, *args, **kwargs)
@@ -6,14 +6,16 @@ import unittest
 from django.conf import settings
 from django.core.cache import cache
 from django.core.validators import ValidationError
+from django.test.client import RequestFactory
 from django.utils import translation
 
 import mock
 from nose.tools import eq_, assert_raises, raises
 
 from amo.utils import (cache_ns_key, escape_all, find_language,
-                       LocalFileStorage, no_translation, resize_image,
-                       rm_local_tmp_dir, slugify, slug_validator, to_language)
+                       HttpResponseSendFile, LocalFileStorage, no_translation,
+                       parse_range, resize_image, rm_local_tmp_dir, slugify,
+                       slug_validator, to_language)
 from product_details import product_details
 
 u = u'Ελληνικά'
@@ -227,6 +229,113 @@ class TestCacheNamespaces(unittest.TestCase):
         eq_(cache_ns_key(self.namespace), expected)
 
 
+def test_parse_range():
+    for header, expected in (
+            ('bytes=0-4', [(0, 4)]),
+            ('bytes=5-', [(5, 9)]),
+            ('bytes=-3', [(7, 9)]),
+            ('bytes=-20', [(0, 9)]),
+            ('bytes=8-20', [(8, 9)]),
+            ('bytes=0-1, 4-5', [(0, 1), (4, 5)]),
+            ('bytes=10-20', []),
+            ('bytes=5-2', None),
+            ('bytes=a-b', None),
+            ('bytes=1', None),
+            ('lines=1-2', None)):
+        eq_(parse_range(header, 10), expected, header)
+
+
+@mock.patch.object(settings, 'XSENDFILE', False)
+@mock.patch.object(settings, 'SENDFILE_CHUNK_SIZE', 3)
+class TestHttpResponseSendFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.NamedTemporaryFile()
+        self.tmp.write('0123456789')
+        self.tmp.flush()
+
+    def tearDown(self):
+        self.tmp.close()
+
+    def get(self, **headers):
+        request = RequestFactory().get('/', **headers)
+        return HttpResponseSendFile(request, self.tmp.name, etag='abc',
+                                    content_type='application/zip')
+
+    def test_whole(self):
+        res = self.get()
+        eq_(res.status_code, 200)
+        eq_(res['Content-Length'], '10')
+        eq_(res['Accept-Ranges'], 'bytes')
+        eq_(''.join(res), '0123456789')
+
+    def test_file_wrapper(self):
+        wrapper = mock.Mock()
+        res = self.get(**{'wsgi.file_wrapper': wrapper})
+        eq_(res.__iter__(), wrapper.return_value)
+        eq_(wrapper.call_args[0][1], 3)
+
+    @mock.patch.object(settings, 'XSENDFILE', True)
+    def test_xsendfile(self):
+        res = self.get()
+        eq_(res[settings.XSENDFILE_HEADER], self.tmp.name)
+        eq_(res['Content-Length'], '10')
+        eq_(''.join(res), '')
+
+    def test_not_modified(self):
+        for etag in ('"abc"', '"xyz", "abc"', 'W/"abc"', '*'):
+            res = self.get(HTTP_IF_NONE_MATCH=etag)
+            eq_(res.status_code, 304)
+            eq_(res.reason_phrase, 'NOT MODIFIED')
+            eq_(''.join(res), '')
+
+    def test_modified(self):
+        eq_(self.get(HTTP_IF_NONE_MATCH='"xyz"').status_code, 200)
+
+    def test_range(self):
+        res = self.get(HTTP_RANGE='bytes=2-6')
+        eq_(res.status_code, 206)
+        eq_(res.reason_phrase, 'PARTIAL CONTENT')
+        eq_(res['Content-Range'], 'bytes 2-6/10')
+        eq_(res['Content-Length'], '5')
+        eq_(''.join(res), '23456')
+
+    def test_multiple_ranges(self):
+        res = self.get(HTTP_RANGE='bytes=0-1,-2')
+        eq_(res.status_code, 206)
+        assert res['Content-Type'].startswith('multipart/byteranges;')
+        body = ''.join(res)
+        eq_(int(res['Content-Length']), len(body))
+        boundary = res['Content-Type'].split('boundary=')[1]
+        eq_(body, '--%(b)s\r\nContent-Type: application/zip\r\n'
+                  'Content-Range: bytes 0-1/10\r\n\r\n01\r\n'
+                  '--%(b)s\r\nContent-Type: application/zip\r\n'
+                  'Content-Range: bytes 8-9/10\r\n\r\n89\r\n'
+                  '--%(b)s--\r\n' % {'b': boundary})
+
+    def test_unsatisfiable_range(self):
+        res = self.get(HTTP_RANGE='bytes=20-30')
+        eq_(res.status_code, 416)
+        eq_(res.reason_phrase, 'REQUESTED RANGE NOT SATISFIABLE')
+        eq_(res['Content-Range'], 'bytes */10')
+        eq_(''.join(res), '')
+
+    def test_invalid_range(self):
+        res = self.get(HTTP_RANGE='bytes=6-2')
+        eq_(res.status_code, 200)
+        eq_(''.join(res), '0123456789')
+
+    def test_if_range(self):
+        eq_(self.get(HTTP_RANGE='bytes=2-6',
+                     HTTP_IF_RANGE='"abc"').status_code, 206)
+        eq_(self.get(HTTP_RANGE='bytes=2-6',
+                     HTTP_IF_RANGE='"xyz"').status_code, 200)
+
+    @mock.patch.object(settings, 'SENDFILE_MAX_RANGES', 1)
+    def test_too_many_ranges(self):
+        eq_(self.get(HTTP_RANGE='bytes=0-1,4-5').status_code, 200)
+
+
 def test_escape_all():
     x = '-'.join([u, u])
     y = ' - '.join([u, u])
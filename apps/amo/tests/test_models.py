@@ -145,3 +145,46 @@ def test_cache_key():
     # Test that we are not taking the db into account when building our
     # cache keys for django-cache-machine. See bug 928881.
     eq_(Addon._cache_key(1, 'default'), Addon._cache_key(1, 'slave'))
+
+
+class TestWithRelated(TestCase):
+    fixtures = ['base/addon_3615']
+
+    def setUp(self):
+        self.saved = Addon.__dict__.get('_prefetches', {}).copy()
+
+    def tearDown(self):
+        Addon._prefetches = self.saved
+
+    def test_transform(self):
+        def attach_foo(addons):
+            for addon in addons:
+                addon.foo = 'bar'
+
+        amo.models.register_prefetch(Addon, 'foo', attach_foo)
+        addon = Addon.objects.with_related('foo').get(pk=3615)
+        eq_(addon.foo, 'bar')
+
+    def test_lookup(self):
+        amo.models.register_prefetch(Addon, 'categories', 'categories')
+        addon = Addon.objects.with_related('categories').get(pk=3615)
+        with self.assertNumQueries(0):
+            list(addon.categories.all())
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            Addon.objects.with_related('unknown')
+
+    def test_subclass_registry(self):
+        class Parent(object):
+            pass
+
+        class Child(Parent):
+            pass
+
+        amo.models.register_prefetch(Parent, 'foo', 'categories')
+        amo.models.register_prefetch(Child, 'bar', 'tags')
+        eq_(amo.models.get_prefetch(Child, 'foo'), 'categories')
+        eq_(amo.models.get_prefetch(Child, 'bar'), 'tags')
+        with self.assertRaises(ValueError):
+            amo.models.get_prefetch(Parent, 'bar')
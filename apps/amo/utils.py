@@ -15,6 +15,7 @@ import time
 import unicodedata
 import urllib
 import urlparse
+import uuid
 
 import django.core.mail
 from django import http
@@ -28,6 +29,7 @@ from django.core.serializers import json
 from django.core.validators import validate_slug, ValidationError
 from django.forms.fields import Field
 from django.http import HttpRequest
+from django.http.response import REASON_PHRASES
 from django.template import Context, loader
 from django.utils import translation
 from django.utils.encoding import smart_str, smart_unicode
@@ -51,6 +53,7 @@ from PIL import Image, ImageFile, PngImagePlugin
 import amo.search
 from amo import ADDON_ICON_SIZES
 from amo.urlresolvers import linkify_with_outgoing, reverse
+from translations import loader as translations_loader
 from translations.models import Translation
 from users.models import UserNotification
 from users.utils import UnsubscribeCode
@@ -513,8 +516,21 @@ def resize_image(src, dst, size=None, remove_src=True, locally=False):
     with local files it's up to you to ensure that all directories
     exist leading up to the dst filename.
     """
-    if src == dst:
-        raise Exception("src and dst can't be the same: %s" % src)
+    return resize_images(src, [(dst, size)], remove_src=remove_src,
+                         locally=locally)[0]
+
+
+def resize_images(src, targets, remove_src=True, locally=False):
+    """Resizes an image from src to every (dst, size) of targets, decoding it
+    only once. Returns the width and height of each image, in order.
+
+    The largest sizes are computed first, and the smaller ones from them
+    rather than from the source when they fit. See `resize_image()` for
+    locally.
+    """
+    for dst, size in targets:
+        if src == dst:
+            raise Exception("src and dst can't be the same: %s" % src)
 
     open_ = open if locally else storage.open
     delete = os.unlink if locally else storage.delete
@@ -522,15 +538,31 @@ def resize_image(src, dst, size=None, remove_src=True, locally=False):
     with open_(src, 'rb') as fp:
         im = Image.open(fp)
         im = im.convert('RGBA')
+
+    def area(size):
+        return size[0] * size[1] if size else float('inf')
+
+    sizes = [None] * len(targets)
+    base, base_size = im, None
+    for index in sorted(range(len(targets)), reverse=True,
+                        key=lambda index: area(targets[index][1])):
+        dst, size = targets[index]
+        resized = im
         if size:
-            im = processors.scale_and_crop(im, size)
-    with open_(dst, 'wb') as fp:
-        im.save(fp, 'png')
+            if (base_size and size[0] <= base_size[0] and
+                    size[1] <= base_size[1]):
+                resized = processors.scale_and_crop(base, size)
+            else:
+                resized = processors.scale_and_crop(im, size)
+            base, base_size = resized, size
+        with open_(dst, 'wb') as fp:
+            resized.save(fp, 'png')
+        sizes[index] = resized.size
 
     if remove_src:
         delete(src)
 
-    return im.size
+    return sizes
 
 
 def remove_icons(destination):
@@ -611,37 +643,186 @@ def get_locale_from_lang(lang):
     return Locale(translation.to_locale(lang))
 
 
+def parse_range(header, size):
+    """
+    Returns the (first, last) byte positions, inclusive, asked for by the
+    Range `header` of a request for a file of `size` bytes, leaving out the
+    ones that can't be satisfied. Returns None if the header isn't valid and
+    has to be ignored.
+    """
+    units, _, spec = header.partition('=')
+    if units.strip() != 'bytes':
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        first, sep, last = part.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if first:
+                first = int(first)
+                last = int(last) if last else size - 1
+                if last < first:
+                    return None
+            else:
+                # The last bytes of the file.
+                first, last = max(size - int(last), 0), size - 1
+        except ValueError:
+            return None
+        if first < size:
+            ranges.append((first, min(last, size - 1)))
+    return ranges
+
+
 class HttpResponseSendFile(http.HttpResponse):
+    """
+    Sends the file at `path`, through the web server when X-Sendfile is on.
+
+    A request with an If-None-Match matching the `etag` gets a 304. Without
+    X-Sendfile, which leaves them to the web server, Range requests get a 206
+    with the part of the file asked for, or several parts as
+    multipart/byteranges.
+    """
 
     def __init__(self, request, path, content=None, status=None,
                  content_type='application/octet-stream', etag=None):
         self.request = request
         self.path = path
+        self.ranges = None
+        self.boundary = None
+        self.file_content_type = content_type
         super(HttpResponseSendFile, self).__init__('', status=status,
                                                    content_type=content_type)
-        if settings.XSENDFILE:
-            self[settings.XSENDFILE_HEADER] = path
         if etag:
             self['ETag'] = '"%s"' % etag
+            if status is None and self.not_modified(etag):
+                self.set_status(304)
+                self.path = None
+                return
+
+        try:
+            self.size = os.path.getsize(path)
+        except OSError:
+            # The web server will tell if it isn't there.
+            self.size = None
 
-    def __iter__(self):
         if settings.XSENDFILE:
+            self[settings.XSENDFILE_HEADER] = path
+        elif status is None and self.size is not None:
+            self['Accept-Ranges'] = 'bytes'
+            self.ranges = self.get_ranges(etag)
+
+        if self.size is None:
+            return
+        if self.ranges is None:
+            self['Content-Length'] = self.size
+        elif not self.ranges:
+            self.set_status(416)
+            self['Content-Range'] = 'bytes */%s' % self.size
+            self['Content-Length'] = 0
+        elif len(self.ranges) == 1:
+            self.set_status(206)
+            first, last = self.ranges[0]
+            self['Content-Range'] = 'bytes %s-%s/%s' % (first, last,
+                                                        self.size)
+            self['Content-Length'] = last - first + 1
+        else:
+            self.set_status(206)
+            self.boundary = uuid.uuid4().hex
+            self['Content-Type'] = ('multipart/byteranges; boundary=%s'
+                                    % self.boundary)
+            self['Content-Length'] = (
+                sum(len(self.part_header(first, last)) +
+                    last - first + 1 + 2 for first, last in self.ranges) +
+                len('--%s--\r\n' % self.boundary))
+
+    def set_status(self, status):
+        # The reason phrase is set from the status in __init__ only.
+        self.status_code = status
+        self.reason_phrase = REASON_PHRASES.get(status, 'UNKNOWN STATUS CODE')
+
+    def not_modified(self, etag):
+        tags = [t.strip() for t in
+                self.request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]
+        return '*' in tags or any(t in tags for t in
+                                  ('"%s"' % etag, 'W/"%s"' % etag))
+
+    def get_ranges(self, etag):
+        """
+        Returns the byte ranges asked for, or None if the whole file has to
+        be sent.
+        """
+        header = self.request.META.get('HTTP_RANGE')
+        if not header or self.request.method not in ('GET', 'HEAD'):
+            return None
+        # If the file changed since the client got the start of it, it needs
+        # all of it.
+        if_range = self.request.META.get('HTTP_IF_RANGE')
+        if if_range and (not etag or if_range != '"%s"' % etag):
+            return None
+        ranges = parse_range(header, self.size)
+        if ranges and len(ranges) > settings.SENDFILE_MAX_RANGES:
+            return None
+        return ranges
+
+    def part_header(self, first, last):
+        return ('--%s\r\nContent-Type: %s\r\nContent-Range: bytes %s-%s/%s'
+                '\r\n\r\n' % (self.boundary, self.file_content_type, first,
+                                last, self.size))
+
+    def read(self, fp, first, last):
+        chunk = settings.SENDFILE_CHUNK_SIZE
+        fp.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            data = fp.read(min(chunk, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+    def read_ranges(self, fp):
+        try:
+            if self.boundary is None:
+                first, last = self.ranges[0]
+                for data in self.read(fp, first, last):
+                    yield data
+                return
+
+            for first, last in self.ranges:
+                yield self.part_header(first, last)
+                for data in self.read(fp, first, last):
+                    yield data
+                yield '\r\n'
+            yield '--%s--\r\n' % self.boundary
+        finally:
+            fp.close()
+
+    def __iter__(self):
+        if (settings.XSENDFILE or self.path is None or
+                self.status_code == 416 or self.request.method == 'HEAD'):
             return iter([])
 
-        chunk = 4096
         fp = open(self.path, 'rb')
+        if self.ranges:
+            return self.read_ranges(fp)
+
+        chunk = settings.SENDFILE_CHUNK_SIZE
         if 'wsgi.file_wrapper' in self.request.META:
+            # Lets the server send the file with sendfile(), if it can.
             return self.request.META['wsgi.file_wrapper'](fp, chunk)
-        else:
-            self['Content-Length'] = os.path.getsize(self.path)
 
-            def wrapper():
+        def wrapper():
+            try:
                 while 1:
                     data = fp.read(chunk)
                     if not data:
                         break
                     yield data
-            return wrapper()
+            finally:
+                fp.close()
+        return wrapper()
 
 
 def redirect_for_login(request):
@@ -869,36 +1050,45 @@ def smart_decode(s):
 
 def attach_trans_dict(model, objs):
     """Put all translations into a translations dict."""
-    # Get the ids of all the translations we need to fetch.
-    fields = model._meta.translated_fields
-    ids = [getattr(obj, f.attname) for f in fields
-           for obj in objs if getattr(obj, f.attname, None) is not None]
+    attach_trans_dicts([(model, objs)])
+
 
-    # Get translations in a dict, ids will be the keys. It's important to
-    # consume the result of sorted_groupby, which is an iterator.
-    qs = Translation.objects.filter(id__in=ids, localized_string__isnull=False)
-    all_translations = dict((k, list(v)) for k, v in
-                            sorted_groupby(qs, lambda trans: trans.id))
+def attach_trans_dicts(models_objs):
+    """
+    Put all translations into a translations dict, for a list of (model,
+    objs) pairs. All the translations are fetched by the translations loader
+    at once.
+    """
+    models_objs = [(model, list(objs)) for model, objs in models_objs]
+    # Get the ids of all the translations we need to fetch.
+    ids = []
+    for model, objs in models_objs:
+        ids.extend(translations_loader.translation_ids(model, objs))
+    all_translations = translations_loader.load(all_ids=ids)
 
     def get_locale_and_string(translation, new_class):
         """Convert the translation to new_class (making PurifiedTranslations
            and LinkifiedTranslations work) and return locale / string tuple."""
-        converted_translation = new_class()
-        converted_translation.__dict__ = translation.__dict__
+        converted_translation = translations_loader.copy(translation,
+                                                         new_class)
         return (converted_translation.locale.lower(),
                 unicode(converted_translation))
 
     # Build and attach translations for each field on each object.
-    for obj in objs:
-        obj.translations = collections.defaultdict(list)
-        for field in fields:
-            t_id = getattr(obj, field.attname, None)
-            field_translations = all_translations.get(t_id, None)
-            if not t_id or field_translations is None:
-                continue
-
-            obj.translations[t_id] = [get_locale_and_string(t, field.rel.to)
-                                      for t in field_translations]
+    for model, objs in models_objs:
+        fields = model._meta.translated_fields
+        for obj in objs:
+            obj.translations = collections.defaultdict(list)
+            for field in fields:
+                t_id = getattr(obj, field.attname, None)
+                field_translations = all_translations.get(t_id, None)
+                if not t_id or field_translations is None:
+                    continue
+
+                obj.translations[t_id] = [
+                    get_locale_and_string(t, field.rel.to)
+                    for t in sorted(field_translations.values(),
+                                    key=lambda t: t.autoid)]
 
 
 def rm_local_tmp_dir(path):
@@ -15,29 +15,52 @@ from files.models import FileValidation
 log = commonware.log.getLogger('z.cron')
 
 
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, dirs, files in os.walk(path) for name in files)
+
+
 @cronjobs.register
 def cleanup_extracted_file():
+    """
+    Removes the files extracted for a single file which weren't used for an
+    hour. The extractions shared by their content hash are removed least
+    recently used first, once they take more than FILE_VIEWER_CACHE_SIZE.
+    """
     log.info('Removing extracted files for file viewer.')
     root = os.path.join(settings.TMP_PATH, 'file_viewer')
+    shared = []
     for path in os.listdir(root):
         full = os.path.join(root, path)
         age = time.time() - os.stat(full)[stat.ST_ATIME]
+        id = os.path.basename(path)
+        try:
+            int(id)
+        except ValueError:
+            shared.append((age, full))
+            continue
+
         if (age) > (60 * 60):
             log.debug('Removing extracted files: %s, %dsecs old.' %
                       (full, age))
             shutil.rmtree(full)
-            # Nuke out the file and diff caches when the file gets removed.
-            id = os.path.basename(path)
-            try:
-                int(id)
-            except ValueError:
-                continue
 
+            # Nuke out the file and diff caches when the file gets removed.
             key = hashlib.md5()
             key.update(str(id))
             cache.delete('%s:memoize:%s:%s' % (settings.CACHE_PREFIX,
                                                'file-viewer', key.hexdigest()))
 
+    # Most recently used first.
+    shared.sort()
+    total = 0
+    for age, full in shared:
+        total += _dir_size(full)
+        if total > settings.FILE_VIEWER_CACHE_SIZE and age > 60 * 60:
+            log.debug('Removing extracted files: %s, %dsecs old.' %
+                      (full, age))
+            shutil.rmtree(full)
+
 
 @cronjobs.register
 def cleanup_validation_results():
@@ -5,6 +5,7 @@ import os
 import stat
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage as storage
 from django.utils.datastructures import SortedDict
 from django.utils.encoding import smart_unicode
@@ -19,7 +20,7 @@ from tower import ugettext as _
 import amo
 from amo.utils import rm_local_tmp_dir
 from amo.urlresolvers import reverse
-from files.utils import extract_xpi, get_md5
+from files.utils import extract_xpi, get_crc32, get_md5, zip_index
 from validator.testcases.packagelayout import (blacklisted_extensions,
                                                blacklisted_magic_numbers)
 
@@ -61,11 +62,33 @@ def file_tree(files, selected):
     return jinja2.Markup('\n'.join(output))
 
 
+class FileInfo(dict):
+    """
+    A file of the `FileViewer`, which only computes its md5 when it's asked
+    for, usually for the selected file only.
+    """
+
+    def __missing__(self, key):
+        if key != 'md5':
+            raise KeyError(key)
+        self['md5'] = '' if self['directory'] else get_md5(self['full'])
+        return self['md5']
+
+    def get(self, key, default=None):
+        if key == 'md5' or key in self:
+            return self[key]
+        return default
+
+
 class FileViewer(object):
     """
     Provide access to a storage-managed file by copying it locally and
     extracting info from it. `src` is a storage-managed path and `dest` is a
     local temp path.
+
+    Files with a known sha256 are extracted to a path of their own, shared by
+    every file with the same content and kept until the cache is full, see
+    `cleanup_extracted_file`.
     """
 
     def __init__(self, file_obj, is_webapp=False):
@@ -75,16 +98,51 @@ class FileViewer(object):
         self.src = (file_obj.guarded_file_path
                     if file_obj.status == amo.STATUS_DISABLED
                     else file_obj.file_path)
+        self.content_hash = self._get_content_hash()
         self.dest = os.path.join(settings.TMP_PATH, 'file_viewer',
-                                 str(file_obj.pk))
-        self._files, self.selected = None, None
+                                 self.content_hash or str(file_obj.pk))
+        self._files, self._index, self.selected = None, None, None
 
     def __str__(self):
         return str(self.file.id)
 
+    def _get_content_hash(self):
+        hash_ = getattr(self.file, 'hash', None)
+        if (not isinstance(hash_, basestring) or
+                not hash_.startswith('sha256:') or self.is_search_engine()):
+            # Search engines are copied with their own filename.
+            return None
+        return hash_[len('sha256:'):]
+
     def _extraction_cache_key(self):
         return ('%s:file-viewer:extraction-in-progress:%s' %
-                (settings.CACHE_PREFIX, self.file.id))
+                (settings.CACHE_PREFIX, os.path.basename(self.dest)))
+
+    def get_index(self):
+        """
+        Returns {path: (size, CRC-32)} of the files in the archive, read from
+        its central directory and cached by the hash of the file.
+        """
+        if self._index is not None:
+            return self._index
+
+        key = None
+        if self.content_hash:
+            key = 'file-viewer-index:%s' % self.content_hash
+            self._index = cache.get(key)
+            if self._index is not None:
+                return self._index
+
+        try:
+            with storage.open(self.src, 'rb') as fileobj:
+                self._index = zip_index(fileobj)
+        except Exception, err:
+            task_log.info('No index of %s: %s' % (self.src, err))
+            self._index = {}
+            return self._index
+        if key:
+            cache.set(key, self._index, settings.FILE_VIEWER_INDEX_TIMEOUT)
+        return self._index
 
     def extract(self):
         """
@@ -105,6 +163,9 @@ class FileViewer(object):
                         open(os.path.join(self.dest,
                                           self.file.filename), 'w'))
         else:
+            if self.content_hash and os.path.exists(self.dest):
+                # Already extracted for another file with the same content.
+                return
             try:
                 extract_xpi(self.src, self.dest, expand=True)
             except Exception, err:
@@ -121,8 +182,16 @@ class FileViewer(object):
 
     def is_extracted(self):
         """If the file has been extracted or not."""
-        return (os.path.exists(self.dest) and not
-                Message(self._extraction_cache_key()).get())
+        extracted = (os.path.exists(self.dest) and not
+                     Message(self._extraction_cache_key()).get())
+        if extracted and self.content_hash:
+            # Keep track of the extractions used last, the others are
+            # removed first.
+            try:
+                os.utime(self.dest, None)
+            except OSError:
+                pass
+        return extracted
 
     def _is_binary(self, mimetype, path):
         """Uses the filename to see if the file can be shown in HTML or not."""
@@ -323,6 +392,7 @@ class FileViewer(object):
 
         iterate(self.dest)
 
+        index = self.get_index()
         url_prefix = 'mkt.%s' if self.is_webapp else '%s'
         for path in all_files:
             filename = smart_unicode(os.path.basename(path), errors='replace')
@@ -331,26 +401,35 @@ class FileViewer(object):
             if not mime and filename == 'manifest.webapp':
                 mime = 'application/x-web-app-manifest+json'
             directory = os.path.isdir(path)
+            stats = os.stat(path)
+
+            crc = ''
+            if not directory:
+                size, crc = index.get(short, (None, None))
+                if size != stats[stat.ST_SIZE]:
+                    # Not extracted from the archive as is.
+                    crc = get_crc32(path)
+                crc = '%08x' % crc
 
-            res[short] = {
+            res[short] = FileInfo({
                 'binary': self._is_binary(mime, path),
+                'crc': crc,
                 'depth': short.count(os.sep),
                 'directory': directory,
                 'filename': filename,
                 'full': path,
-                'md5': get_md5(path) if not directory else '',
                 'mimetype': mime or 'application/octet-stream',
                 'syntax': self.get_syntax(filename),
-                'modified': os.stat(path)[stat.ST_MTIME],
+                'modified': stats[stat.ST_MTIME],
                 'short': short,
-                'size': os.stat(path)[stat.ST_SIZE],
+                'size': stats[stat.ST_SIZE],
                 'truncated': self.truncate(filename),
                 'url': reverse(url_prefix % 'files.list',
                                args=[self.file.id, 'file', short]),
                 'url_serve': reverse(url_prefix % 'files.redirect',
                                      args=[self.file.id, short]),
                 'version': self.file.version.version,
-            }
+            })
 
         return res
 
@@ -395,7 +474,7 @@ class DiffHelper(object):
         different = []
         for key, file in left_files.items():
             file['url'] = self.get_url(file['short'])
-            diff = file['md5'] != right_files.get(key, {}).get('md5')
+            diff = file['crc'] != right_files.get(key, {}).get('crc')
             file['diff'] = diff
             if diff:
                 different.append(file)
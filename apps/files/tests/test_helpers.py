@@ -16,7 +16,7 @@ import amo.tests
 from amo.urlresolvers import reverse
 from files.helpers import FileViewer, DiffHelper
 from files.models import File
-from files.utils import SafeUnzip
+from files.utils import get_crc32 as get_crc32_, get_md5, SafeUnzip
 
 root = os.path.join(settings.ROOT, 'apps/files/fixtures/files')
 get_file = lambda x: '%s/%s' % (root, x)
@@ -193,11 +193,60 @@ class TestFileHelper(amo.tests.TestCase):
         eq_(res, '')
         assert self.viewer.selected['msg'].startswith('That file no')
 
-    @patch('files.helpers.get_md5')
-    def test_delete_mid_tree(self, get_md5):
-        get_md5.side_effect = IOError('ow')
+    def test_delete_mid_tree(self):
         self.viewer.extract()
-        eq_({}, self.viewer.get_files())
+        with patch('files.helpers.storage.listdir') as listdir:
+            listdir.side_effect = OSError('ow')
+            eq_({}, self.viewer.get_files())
+
+    def test_get_files_from_index(self):
+        self.viewer.extract()
+        with patch('files.helpers.get_crc32') as get_crc32:
+            with patch('files.helpers.get_md5') as get_md5:
+                files = self.viewer.get_files()
+        # Nothing is hashed, the CRC-32s come from the archive.
+        assert not get_crc32.called
+        assert not get_md5.called
+        eq_(files['install.js']['crc'],
+            '%08x' % get_crc32_(files['install.js']['full']))
+        eq_(files['__MACOSX']['crc'], '')
+
+    def test_get_files_md5(self):
+        self.viewer.extract()
+        files = self.viewer.get_files()
+        eq_(files['install.js']['md5'], get_md5(files['install.js']['full']))
+        eq_(files['install.js'].get('md5'),
+            get_md5(files['install.js']['full']))
+        eq_(files['__MACOSX']['md5'], '')
+
+    def test_get_files_changed(self):
+        self.viewer.extract()
+        path = os.path.join(self.viewer.dest, 'install.js')
+        open(path, 'a').write('changed')
+        files = self.viewer.get_files()
+        eq_(files['install.js']['crc'], '%08x' % get_crc32_(path))
+
+    def test_shared_extraction(self):
+        src = get_file('dictionary-test.xpi')
+        one = FileViewer(make_file(1, src, hash='sha256:abc'))
+        two = FileViewer(make_file(2, src, hash='sha256:abc'))
+        eq_(one.dest, two.dest)
+        eq_(os.path.basename(one.dest), 'abc')
+        try:
+            one.extract()
+            assert two.is_extracted()
+            eq_(sorted(two.get_files()), sorted(one.get_files()))
+        finally:
+            one.cleanup()
+
+    def test_index_cached(self):
+        src = get_file('dictionary-test.xpi')
+        index = FileViewer(make_file(1, src, hash='sha256:abc')).get_index()
+        eq_(len(index), 11)
+        with patch('files.helpers.zip_index') as zip_index:
+            eq_(FileViewer(make_file(2, src, hash='sha256:abc')).get_index(),
+                index)
+        assert not zip_index.called
 
 
 class TestSearchEngineHelper(amo.tests.TestCase):
@@ -422,6 +422,16 @@ class TestFileViewer(FilesBase, amo.tests.TestCase):
         eq_(res[settings.XSENDFILE_HEADER],
             self.file_viewer.get_files().get(binary)['full'])
 
+    @patch.object(settings, 'XSENDFILE', False)
+    def test_bounce_range(self):
+        self.file_viewer.extract()
+        res = self.client.get(self.files_redirect(binary), follow=True,
+                              HTTP_RANGE='bytes=0-1')
+        eq_(res.status_code, 206)
+        path = self.file_viewer.get_files().get(binary)['full']
+        with open(path, 'rb') as fp:
+            eq_(''.join(res), fp.read(2))
+
     @patch.object(settings, 'FILE_VIEWER_SIZE_LIMIT', 5)
     def test_file_size(self):
         self.file_viewer.extract()
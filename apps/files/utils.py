@@ -10,6 +10,7 @@ import stat
 import StringIO
 import tempfile
 import zipfile
+import zlib
 
 from cStringIO import StringIO as cStringIO
 from datetime import datetime
@@ -20,6 +21,7 @@ from zipfile import BadZipfile, ZipFile
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
+from django.utils.encoding import smart_unicode
 from django.utils.translation import trans_real as translation
 from django.core.files.storage import default_storage as storage
 
@@ -539,6 +541,43 @@ def get_md5(filename, **kw):
     return _get_hash(filename, **kw)
 
 
+def get_crc32(filename, block_size=2 ** 20):
+    """Returns the CRC-32 of a file, as stored in zip files."""
+    crc = 0
+    with open(filename, 'rb') as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            crc = zlib.crc32(data, crc)
+    return crc & 0xffffffff
+
+
+def zip_index(fileobj, prefix=u'', depth=0):
+    """
+    Returns {path: (size, CRC-32)} of the files in the zip `fileobj`, read
+    from its central directory without extracting anything. Like
+    `extract_xpi(expand=True)`, the .jar and .xpi files inside are indexed as
+    directories of their own files, up to 10 levels deep.
+    """
+    index = {}
+    archive = ZipFile(fileobj)
+    for info in archive.infolist():
+        if info.filename.endswith('/'):
+            continue
+        path = prefix + smart_unicode(info.filename, errors='replace')
+        if (depth < 10 and
+                os.path.splitext(info.filename)[1] in ('.jar', '.xpi')):
+            try:
+                index.update(zip_index(cStringIO(archive.read(info)),
+                                       path + u'/', depth + 1))
+                continue
+            except (BadZipfile, zipfile.LargeZipFile):
+                pass
+        index[path] = (info.file_size, info.CRC)
+    return index
+
+
 def get_sha256(filename, **kw):
     return _get_hash(filename, hash=hashlib.sha256, **kw)
 
@@ -0,0 +1,231 @@
+"""
+Loads translations for a whole unit of work, a request or a celery task.
+
+Queryset transforms, `attach_trans_dict()`, serializers and indexers ask for
+the translations they need here. Within a unit of work they are kept in an
+LRU keyed by (id, locale), so that each translation is fetched at most once,
+and everything missing from a call is fetched with a single query.
+
+Saving or deleting a translation drops it from the cache. The cache only
+lives until the end of the unit of work, so it never holds translations
+changed by other processes for long. Outside of a unit of work nothing is
+cached, use `scope()` to get one in a cron or a script.
+"""
+import collections
+import contextlib
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+from celery.signals import task_postrun, task_prerun
+
+from .models import Translation
+
+
+_local = threading.local()
+
+# Cached in place of the translations which don't exist.
+MISSING = object()
+
+
+class TranslationCache(object):
+    """
+    An LRU of translations keyed by (id, locale), which also remembers the
+    ids it has all the locales of.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.items = collections.OrderedDict()
+        self.locales = collections.defaultdict(set)
+        self.complete = set()
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, id, locale):
+        """Returns the translation, MISSING, or None if it isn't known."""
+        key = (id, locale.lower())
+        value = self.items.pop(key, None)
+        if value is None:
+            return MISSING if id in self.complete else None
+        # Move it back to the end of the LRU.
+        self.items[key] = value
+        return value
+
+    def get_all(self, id):
+        """Returns {locale: translation} or None if it isn't known."""
+        if id not in self.complete:
+            return None
+        return dict((locale, self.get(id, locale))
+                    for locale in self.locales[id])
+
+    def set(self, id, locale, value):
+        key = (id, locale.lower())
+        self.items.pop(key, None)
+        self.items[key] = value
+        self.locales[id].add(key[1])
+        while len(self.items) > self.size:
+            (old_id, old_locale), _ = self.items.popitem(last=False)
+            self.locales[old_id].discard(old_locale)
+            self.complete.discard(old_id)
+
+    def set_all(self, id, translations):
+        """Caches all the translations of `id`, {locale: translation}."""
+        for locale, value in translations.items():
+            self.set(id, locale, value)
+        # Translations can only be remembered as complete if they fit.
+        if len(translations) <= self.size:
+            self.complete.add(id)
+
+    def invalidate(self, id):
+        for locale in self.locales.pop(id, ()):
+            self.items.pop((id, locale), None)
+        self.complete.discard(id)
+
+
+def get_cache():
+    """Returns the cache of the current unit of work, if there is one."""
+    return getattr(_local, 'cache', None)
+
+
+def start(**kw):
+    """Starts a unit of work, which may run within another one."""
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    _local.stack.append(get_cache())
+    _local.cache = TranslationCache(settings.TRANSLATIONS_CACHE_SIZE)
+
+
+def finish(**kw):
+    """Finishes the unit of work, going back to the enclosing one if any."""
+    stack = getattr(_local, 'stack', None)
+    _local.cache = stack.pop() if stack else None
+
+
+@contextlib.contextmanager
+def scope():
+    start()
+    try:
+        yield
+    finally:
+        finish()
+
+
+def invalidate(ids):
+    cache = get_cache()
+    if cache is not None:
+        for id in ids:
+            cache.invalidate(id)
+
+
+def copy(translation, cls=Translation):
+    """
+    Returns a copy of the cached `translation` as a `cls`, so that cleaning or
+    changing it doesn't change the cache.
+    """
+    new = cls()
+    new.__dict__ = dict(translation.__dict__)
+    return new
+
+
+def load(ids=(), locales=(), all_ids=()):
+    """
+    Returns {id: {locale: translation}} for the translations of `ids` in any
+    of `locales`, and for all the translations of `all_ids`. The locales are
+    lowercase and only translations with a string are returned.
+
+    The translations which aren't in the cache of the unit of work are
+    fetched with a single query. Don't change the translations, see `copy()`.
+    """
+    cache = get_cache()
+    locales = set(locale.lower() for locale in locales if locale)
+    all_ids = set(filter(None, all_ids))
+    ids = set(filter(None, ids)) - all_ids
+    result = collections.defaultdict(dict)
+
+    def add(id, locale, value):
+        if value is not MISSING:
+            result[id][locale] = value
+
+    missing_all, missing = set(), set()
+    if cache is None:
+        missing_all, missing = all_ids, ids
+    else:
+        for id in all_ids:
+            translations = cache.get_all(id)
+            if translations is None:
+                missing_all.add(id)
+            else:
+                for locale, value in translations.items():
+                    add(id, locale, value)
+        for id in ids:
+            for locale in locales:
+                value = cache.get(id, locale)
+                if value is None:
+                    missing.add(id)
+                else:
+                    add(id, locale, value)
+
+    q = Q()
+    if missing_all:
+        q |= Q(id__in=missing_all)
+    if missing and locales:
+        q |= Q(id__in=missing, locale__in=locales)
+    if not q:
+        return result
+
+    fetched = collections.defaultdict(dict)
+    qs = Translation.objects.no_cache().filter(
+        q, localized_string__isnull=False)
+    for translation in qs:
+        fetched[translation.id][translation.locale.lower()] = translation
+
+    for id in missing_all:
+        if cache is not None:
+            cache.set_all(id, fetched[id])
+        for locale, value in fetched[id].items():
+            add(id, locale, value)
+    for id in missing:
+        for locale in locales:
+            value = fetched[id].get(locale, MISSING)
+            if cache is not None:
+                cache.set(id, locale, value)
+            add(id, locale, value)
+    return result
+
+
+def translation_ids(model, objs):
+    """Returns the ids of the translations of `objs`, `model` instances."""
+    return [getattr(obj, field.attname)
+            for field in model._meta.translated_fields for obj in objs
+            if getattr(obj, field.attname, None) is not None]
+
+
+def prefetch(model, objs):
+    """
+    Fetches all the translations of `objs` at once into the cache of the
+    unit of work, if there is one.
+    """
+    if get_cache() is not None:
+        load(all_ids=translation_ids(model, objs))
+
+
+def invalidate_translation(sender, instance, **kw):
+    if isinstance(instance, Translation):
+        invalidate([instance.id])
+
+
+request_started.connect(start, dispatch_uid='translations_loader_start')
+request_finished.connect(finish, dispatch_uid='translations_loader_finish')
+task_prerun.connect(start, dispatch_uid='translations_loader_task_start',
+                    weak=False)
+task_postrun.connect(finish, dispatch_uid='translations_loader_task_finish',
+                     weak=False)
+post_save.connect(invalidate_translation,
+                  dispatch_uid='translations_loader_save')
+post_delete.connect(invalidate_translation,
+                    dispatch_uid='translations_loader_delete')
@@ -22,6 +22,9 @@ class TranslationManager(amo.models.ManagerBase):
         qs = Translation.objects.filter(id__in=filter(None, ids),
                                         locale=locale)
         qs.update(localized_string=None, localized_string_clean=None)
+        # The update doesn't send any signal.
+        from .loader import invalidate
+        invalidate(filter(None, ids))
 
 
 class Translation(amo.models.ModelBase):
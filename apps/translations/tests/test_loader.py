@@ -0,0 +1,140 @@
+from django.utils import translation
+
+from nose.tools import eq_, ok_
+from test_utils import trans_eq, TestCase
+
+from amo.utils import attach_trans_dicts
+from testapp.models import FancyModel, TranslatedModel
+from translations import loader
+from translations.models import Translation
+
+
+def test_cache_lru():
+    cache = loader.TranslationCache(2)
+    cache.set(1, 'en-US', 'a')
+    cache.set(2, 'en-US', 'b')
+    eq_(cache.get(1, 'en-us'), 'a')
+    cache.set(3, 'fr', 'c')
+    eq_(len(cache), 2)
+    eq_(cache.get(2, 'en-us'), None)
+    eq_(cache.get(1, 'EN-US'), 'a')
+    eq_(cache.get(3, 'fr'), 'c')
+
+
+def test_cache_complete():
+    cache = loader.TranslationCache(10)
+    cache.set_all(1, {'en-us': 'a'})
+    eq_(cache.get(1, 'fr'), loader.MISSING)
+    eq_(cache.get_all(1), {'en-us': 'a'})
+    eq_(cache.get_all(2), None)
+
+    cache.invalidate(1)
+    eq_(cache.get(1, 'en-us'), None)
+    eq_(cache.get_all(1), None)
+
+
+def test_cache_evicted_not_complete():
+    cache = loader.TranslationCache(2)
+    cache.set_all(1, {'en-us': 'a', 'fr': 'b'})
+    cache.set(2, 'de', 'c')
+    eq_(cache.get_all(1), None)
+    eq_(cache.get(1, 'de'), None)
+
+
+def test_scope():
+    with loader.scope():
+        outer = loader.get_cache()
+        ok_(outer is not None)
+        with loader.scope():
+            ok_(loader.get_cache() not in (None, outer))
+        ok_(loader.get_cache() is outer)
+
+
+class TestLoader(TestCase):
+    fixtures = ['testapp/test_models.json']
+
+    def setUp(self):
+        super(TestLoader, self).setUp()
+        translation.activate('en-US')
+        loader.start()
+
+    def tearDown(self):
+        loader.finish()
+        super(TestLoader, self).tearDown()
+
+    def test_load(self):
+        with self.assertNumQueries(1):
+            translations = loader.load(ids=[1, 2], locales=['en-US', 'de'],
+                                       all_ids=[3])
+        eq_(sorted(translations[1]), ['de', 'en-us'])
+        eq_(sorted(translations[2]), ['en-us'])
+        eq_(sorted(translations[3]), ['en-us', 'fr'])
+        eq_(unicode(translations[1]['de']), 'German!! (unst unst)')
+
+    def test_cached(self):
+        loader.load(ids=[1], locales=['en-US', 'fr'])
+        with self.assertNumQueries(0):
+            translations = loader.load(ids=[1], locales=['en-us', 'fr'])
+        eq_(translations[1].keys(), ['en-us'])
+
+        # The German translation wasn't asked for yet.
+        with self.assertNumQueries(1):
+            translations = loader.load(ids=[1], locales=['de'])
+        eq_(translations[1].keys(), ['de'])
+
+    def test_all_locales_cached(self):
+        loader.load(all_ids=[1])
+        with self.assertNumQueries(0):
+            eq_(loader.load(ids=[1], locales=['de'])[1].keys(), ['de'])
+            eq_(loader.load(ids=[1], locales=['fr']).get(1), None)
+
+    def test_not_cached_outside_unit_of_work(self):
+        loader.finish()
+        loader.load(all_ids=[1])
+        with self.assertNumQueries(1):
+            loader.load(all_ids=[1])
+
+    def test_save_invalidates(self):
+        loader.load(all_ids=[1])
+        trans = Translation.objects.get(id=1, locale='de')
+        trans.localized_string = 'Neu'
+        trans.save()
+        eq_(unicode(loader.load(all_ids=[1])[1]['de']), 'Neu')
+
+    def test_new_translation_invalidates(self):
+        eq_(loader.load(ids=[1], locales=['fr']).get(1), None)
+        Translation.objects.create(id=1, locale='fr', localized_string='Oui')
+        eq_(unicode(loader.load(ids=[1], locales=['fr'])[1]['fr']), 'Oui')
+
+    def test_remove_for_invalidates(self):
+        obj = TranslatedModel.objects.get(id=1)
+        loader.load(all_ids=[1])
+        Translation.objects.remove_for(obj, 'de')
+        eq_(sorted(loader.load(all_ids=[1])[1]), ['en-us'])
+
+    def test_transformer(self):
+        TranslatedModel.objects.no_cache().get(id=1)
+        # Only the model is fetched again, not its translations.
+        with self.assertNumQueries(1):
+            obj = TranslatedModel.objects.no_cache().get(id=1)
+        trans_eq(obj.name, 'some name', 'en-US')
+        trans_eq(obj.description, 'some description', 'en-US')
+        trans_eq(obj.no_locale, 'blammo', 'en-US')
+
+    def test_transformer_copies(self):
+        obj = TranslatedModel.objects.no_cache().get(id=1)
+        obj.name.localized_string = 'changed'
+        obj = TranslatedModel.objects.no_cache().get(id=1)
+        trans_eq(obj.name, 'some name', 'en-US')
+
+    def test_attach_trans_dicts(self):
+        obj = TranslatedModel.objects.no_cache().get(id=1)
+        fancy = FancyModel.objects.no_cache().get(id=1)
+        with loader.scope():
+            with self.assertNumQueries(1):
+                attach_trans_dicts([(TranslatedModel, [obj]),
+                                    (FancyModel, [fancy])])
+        eq_(obj.translations[1], [('en-us', 'some name'),
+                                  ('de', 'German!! (unst unst)')])
+        eq_(obj.translations[10], [('en-us', 'blammo')])
+        eq_([locale for locale, _ in fancy.translations[20]], ['en-us'])
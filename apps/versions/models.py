@@ -2,12 +2,14 @@
 import datetime
 import json
 import os
+import threading
 
 import django.dispatch
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.storage import default_storage as storage
-from django.db import models
+from django.core.signals import request_finished
+from django.db import connection, models
 
 import caching.base
 import commonware.log
@@ -22,6 +24,7 @@ from amo.urlresolvers import reverse
 from applications.models import Application, AppVersion
 from files import utils
 from files.models import File, Platform, cleanup_file
+from services.update_cache import UpdateCache
 from tower import ugettext as _
 from translations.fields import (LinkifiedField, PurifiedField, save_signal,
                                  TranslatedField)
@@ -613,6 +616,58 @@ def clear_compatversion_cache_on_delete(sender, instance, **kw):
         instance.addon.invalidate_d2c_versions()
 
 
+def invalidate_update_cache(sender, instance, **kw):
+    """Expire the responses of the update service cached for the add-on."""
+    if kw.get('raw') or not settings.SERVICES_UPDATE_CACHE_SERVERS:
+        return
+    try:
+        version = instance if sender is Version else instance.version
+        guid = version.addon.guid
+    except ObjectDoesNotExist:
+        return
+    invalidate_update_cache_for(guid)
+
+
+_update_cache = None
+_pending_update_cache = threading.local()
+
+
+def invalidate_update_cache_for(guid):
+    """Expire the update responses and compat index of the add-on `guid`."""
+    if not guid or not settings.SERVICES_UPDATE_CACHE_SERVERS:
+        return
+    if connection.in_atomic_block or not connection.get_autocommit():
+        # The service would cache the data from before the change again until
+        # it's committed, expire them at the end of the request instead.
+        if not hasattr(_pending_update_cache, 'guids'):
+            _pending_update_cache.guids = set()
+        _pending_update_cache.guids.add(guid)
+    else:
+        _invalidate_update_cache(guid)
+
+
+def _invalidate_update_cache(guid):
+    global _update_cache
+    # One memcache client for the process, rather than a new connection for
+    # every change.
+    if _update_cache is None:
+        _update_cache = UpdateCache(
+            0, 0, servers=settings.SERVICES_UPDATE_CACHE_SERVERS)
+    _update_cache.invalidate(guid)
+
+
+def invalidate_pending_update_cache(sender, **kw):
+    """Expires the update responses of the add-ons changed by a request."""
+    guids = getattr(_pending_update_cache, 'guids', set())
+    _pending_update_cache.guids = set()
+    for guid in guids:
+        _invalidate_update_cache(guid)
+
+
+request_finished.connect(invalidate_pending_update_cache,
+                         dispatch_uid='invalidate_pending_update_cache')
+
+
 version_uploaded = django.dispatch.Signal()
 models.signals.pre_save.connect(
     save_signal, sender=Version, dispatch_uid='version_translations')
@@ -637,6 +692,13 @@ models.signals.post_save.connect(
 models.signals.post_delete.connect(
     clear_compatversion_cache_on_delete, sender=Version,
     dispatch_uid='clear_compatversion_cache_del')
+for sender in (Version, File):
+    models.signals.post_save.connect(
+        invalidate_update_cache, sender=sender,
+        dispatch_uid='invalidate_update_cache_%s' % sender.__name__)
+    models.signals.post_delete.connect(
+        invalidate_update_cache, sender=sender,
+        dispatch_uid='invalidate_update_cache_%s' % sender.__name__)
 
 
 class LicenseManager(amo.models.ManagerBase):
@@ -705,3 +767,13 @@ class ApplicationsVersions(caching.base.CachingMixin, models.Model):
             return _(u'{app} {min} and later').format(app=self.application,
                                                       min=self.min)
         return u'%s %s - %s' % (self.application, self.min, self.max)
+
+
+# The compat index of the update service holds the application versions
+# ranges of each version.
+models.signals.post_save.connect(
+    invalidate_update_cache, sender=ApplicationsVersions,
+    dispatch_uid='invalidate_update_cache_ApplicationsVersions')
+models.signals.post_delete.connect(
+    invalidate_update_cache, sender=ApplicationsVersions,
+    dispatch_uid='invalidate_update_cache_ApplicationsVersions')
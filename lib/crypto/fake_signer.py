@@ -0,0 +1,84 @@
+"""
+A fake receipt signing server, for tests and benchmarks of the signing client.
+
+It answers /1.0/sign like the real one, with a receipt that can be cracked
+but isn't signed with a real certificate, after an optional delay:
+
+    python lib/crypto/fake_signer.py --port=9000 --delay=0.05
+
+Then set SIGNING_SERVER to http://localhost:9000.
+"""
+import json
+import optparse
+import threading
+import time
+from SocketServer import ThreadingMixIn
+from wsgiref import simple_server
+
+import jwt
+
+
+class ThreadingServer(ThreadingMixIn, simple_server.WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(simple_server.WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def make_app(delay=0, status=200):
+    """Returns the WSGI app, answering after `delay` seconds with `status`."""
+    cert = jwt.encode({'iss': 'fake-signer', 'typ': 'certified-key'},
+                      'fake-signer')
+
+    def app(environ, start_response):
+        if environ['PATH_INFO'] != '/1.0/sign':
+            start_response('404 Not Found', [('Content-Length', '0')])
+            return ['']
+
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        receipt = json.loads(environ['wsgi.input'].read(length))
+        if delay:
+            time.sleep(delay)
+
+        body = json.dumps({
+            'receipt': '~'.join([cert, jwt.encode(receipt, 'fake-signer')])})
+        start_response('%s Fake' % status,
+                       [('Content-Type', 'application/json'),
+                        ('Content-Length', str(len(body)))])
+        return [body]
+
+    return app
+
+
+def start(port=0, **kw):
+    """
+    Serves the fake signer from a thread, on a free port by default. Returns
+    the server, which has to be shut down, and its URL.
+    """
+    server = simple_server.make_server('127.0.0.1', port, make_app(**kw),
+                                       server_class=ThreadingServer,
+                                       handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:%s' % server.server_port
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--port', type='int', default=9000)
+    parser.add_option('--delay', type='float', default=0,
+                      help='Seconds to wait before answering.')
+    options, args = parser.parse_args()
+    server = simple_server.make_server('127.0.0.1', options.port,
+                                       make_app(delay=options.delay),
+                                       server_class=ThreadingServer)
+    print 'Serving the fake signer on port %s' % options.port
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,11 @@ import json
 import os
 import shutil
 import tempfile
+import time
+import uuid
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage as storage
 
 from base64 import b64decode
@@ -88,9 +91,26 @@ def _sign_app(src, dest, ids, reviewer, tempname):
     except:
         log.error('App signing failed', exc_info=True)
         raise SigningError('App signing failed')
-    with storage.open(dest, 'w') as destf:
-        tempf = open(tempname)
-        shutil.copyfileobj(tempf, destf)
+    _copy_in_place(tempname, dest)
+
+
+def _copy_in_place(src, dest):
+    """
+    Copies `src` to `dest` through a temporary file moved in place once
+    complete: another process may be signing the same version to `dest` at
+    the same time, `dest` is never seen half written.
+    """
+    dest_dir = os.path.dirname(dest)
+    if not os.path.exists(dest_dir):
+        os.makedirs(dest_dir)
+    tmp = '%s.%s.tmp' % (dest, uuid.uuid4().hex)
+    try:
+        shutil.copy(src, tmp)
+        os.rename(tmp, dest)
+    except:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
 
 
 def _get_endpoint(reviewer=False):
@@ -116,10 +136,7 @@ def _no_sign(src, dest):
     # If this is a local development instance, just copy the file around
     # so that everything seems to work locally.
     log.info('Not signing the app, no signing server is active.')
-    dest_dir = os.path.dirname(dest)
-    if not os.path.exists(dest_dir):
-        os.makedirs(dest_dir)
-    shutil.copy(src, dest)
+    _copy_in_place(src, dest)
 
 
 @task
@@ -152,17 +169,55 @@ def sign(version_id, reviewer=False, resign=False, **kw):
         log.info('[Webapp:%s] Already signed app exists.' % app.id)
         return path
 
+    # Only one process signs a version at once, the others wait for it and
+    # use what it signed rather than sign again.
+    lock = 'sign:%s:%s' % ('reviewer' if reviewer else 'public', version_id)
+    if not cache.add(lock, 1, settings.SIGNED_APPS_LOCK_TIMEOUT):
+        log.info('[Webapp:%s] Waiting for version %s to be signed.'
+                 % (app.id, version_id))
+        if _wait_for_sign(lock, path):
+            return path
+        # The other process failed, or is still at it: sign it here rather
+        # than fail.
+        log.info('[Webapp:%s] Version %s not signed elsewhere, signing it.'
+                 % (app.id, version_id))
+        cache.set(lock, 1, settings.SIGNED_APPS_LOCK_TIMEOUT)
+    elif storage.exists(path) and not resign:
+        # Signed by another process since the check above.
+        cache.delete(lock)
+        log.info('[Webapp:%s] Already signed app exists.' % app.id)
+        return path
+
     ids = json.dumps({
         'id': app.guid,
         'version': version_id
     })
-    with statsd.timer('services.sign.app'):
-        try:
+    start = time.time()
+    try:
+        with statsd.timer('services.sign.app'):
             sign_app(file_obj.file_path, path, ids, reviewer)
-        except SigningError:
-            log.info('[Webapp:%s] Signing failed' % app.id)
-            if storage.exists(path):
-                storage.delete(path)
-            raise
-    log.info('[Webapp:%s] Signing complete.' % app.id)
+    except SigningError:
+        # Nothing was written to `path`, it's only moved in place once
+        # signed.
+        log.info('[Webapp:%s] Signing failed' % app.id)
+        raise
+    finally:
+        cache.delete(lock)
+    log.info('[Webapp:%s] Signing of version %s complete in %.2fs.'
+             % (app.id, version_id, time.time() - start))
     return path
+
+
+def _wait_for_sign(lock, path):
+    """
+    Waits for the process holding `lock` to sign the app to `path`, for up
+    to SIGNED_APPS_LOCK_TIMEOUT seconds. Returns whether it did.
+    """
+    end = time.time() + settings.SIGNED_APPS_LOCK_TIMEOUT
+    with statsd.timer('services.sign.app.wait'):
+        while cache.get(lock) and time.time() < end:
+            time.sleep(0.1)
+    if not storage.exists(path):
+        statsd.incr('services.sign.app.wait_failed')
+        return False
+    return True
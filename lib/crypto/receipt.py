@@ -1,10 +1,13 @@
 import json
-import urllib2
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 
 from django.conf import settings
 from django_statsd.clients import statsd
 
 import commonware.log
+import requests
 
 import jwt
 
@@ -16,48 +19,153 @@ class SigningError(Exception):
     pass
 
 
+class SigningClient(object):
+    """
+    A client for the receipt signing server, shared by the threads of a
+    process.
+
+    Connections to the server are kept open in a pool of `pool_size`. At most
+    `max_pending` receipts are signed at once, others wait `pending_timeout`
+    seconds for their turn and then fail, so that a spike of installs doesn't
+    tie up every web worker waiting on the server. After `max_failures`
+    errors or timeouts in a row, the server isn't called for `cool_off`
+    seconds and signing fails straight away.
+    """
+
+    def __init__(self, server, timeout, pool_size=10, max_pending=20,
+                 pending_timeout=1, max_failures=5, cool_off=30):
+        self.destination = server + '/1.0/sign'
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_pending = max_pending
+        self.pending_timeout = pending_timeout
+        self.max_failures = max_failures
+        self.cool_off = cool_off
+
+        self.session = requests.Session()
+        self.session.mount(server, requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size))
+        self.lock = threading.Condition()
+        self.pending = 0
+        self.failures = 0
+        self.open_until = 0
+        self.pool = None
+
+    def acquire(self):
+        with self.lock:
+            if self.open_until > time.time():
+                statsd.incr('services.sign.circuit_open')
+                raise SigningError('Signing server is unavailable')
+
+            end = time.time() + self.pending_timeout
+            while self.pending >= self.max_pending:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    statsd.incr('services.sign.queue_full')
+                    raise SigningError('Too many receipts being signed')
+                self.lock.wait(remaining)
+            self.pending += 1
+
+    def release(self, failed):
+        with self.lock:
+            self.pending -= 1
+            self.lock.notify()
+            if not failed:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                log.error('Signing server failed %s times in a row, not '
+                          'calling it for %ss' % (self.failures,
+                                                  self.cool_off))
+                statsd.incr('services.sign.circuit_break')
+                self.open_until = time.time() + self.cool_off
+
+    def sign(self, receipt):
+        """Signs the `receipt`, a dict or a string of JSON."""
+        receipt_json = json.dumps(receipt)
+        log.info('Calling service: %s' % self.destination)
+        log.info('Receipt contents: %s' % receipt_json)
+        headers = {'Content-Type': 'application/json'}
+        data = receipt if isinstance(receipt, basestring) else receipt_json
+
+        self.acquire()
+        failed = True
+        try:
+            with statsd.timer('services.sign.receipt'):
+                response = self.session.post(self.destination, data=data,
+                                             headers=headers,
+                                             timeout=self.timeout)
+            # Errors of the server count against it, not refusals.
+            failed = response.status_code >= 500
+        except requests.exceptions.RequestException:
+            log.error('Posting to receipt signing failed', exc_info=True)
+            raise SigningError('Posting receipt signing failed')
+        finally:
+            self.release(failed)
+
+        if response.status_code != 200:
+            msg = response.content.strip()
+            log.error('Posting to receipt signing failed: %s, %s'
+                      % (response.status_code, msg))
+            raise SigningError('Posting to receipt signing failed: %s, %s'
+                               % (response.status_code, msg))
+
+        return json.loads(response.content)['receipt']
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPool(self.pool_size)
+            return self.pool
+
+    def sign_async(self, receipt):
+        """
+        Signs the `receipt` in the background. Returns an AsyncResult, whose
+        `get()` returns the signed receipt or raises SigningError.
+        """
+        return self.get_pool().apply_async(self.sign, (receipt,))
+
+    def sign_many(self, receipts):
+        """
+        Signs the `receipts` over several connections at once, returns the
+        signed receipts in the same order.
+        """
+        return self.get_pool().map(self.sign, receipts)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the SigningClient of this process for the SIGNING_SERVER.
+    """
+    server = settings.SIGNING_SERVER
+    with _clients_lock:
+        if server not in _clients:
+            _clients[server] = SigningClient(
+                server, settings.SIGNING_SERVER_TIMEOUT,
+                pool_size=settings.SIGNING_SERVER_POOL_SIZE,
+                max_pending=settings.SIGNING_SERVER_MAX_PENDING,
+                pending_timeout=settings.SIGNING_SERVER_PENDING_TIMEOUT,
+                max_failures=settings.SIGNING_SERVER_MAX_FAILURES,
+                cool_off=settings.SIGNING_SERVER_COOL_OFF)
+        return _clients[server]
+
+
 def sign(receipt):
     """
     Send the receipt to the signing service.
 
-    This could possibly be made async via celery.
+    The connections to the signing service are reused, see `SigningClient`.
     """
     # If no destination is set. Just ignore this request.
     if not settings.SIGNING_SERVER:
         return ValueError('Invalid config. SIGNING_SERVER empty.')
 
-    destination = settings.SIGNING_SERVER + '/1.0/sign'
-    timeout = settings.SIGNING_SERVER_TIMEOUT
-
-    receipt_json = json.dumps(receipt)
-    log.info('Calling service: %s' % destination)
-    log.info('Receipt contents: %s' % receipt_json)
-    headers = {'Content-Type': 'application/json'}
-    data = receipt if isinstance(receipt, basestring) else receipt_json
-    request = urllib2.Request(destination, data, headers)
-
-    try:
-        with statsd.timer('services.sign.receipt'):
-            response = urllib2.urlopen(request, timeout=timeout)
-    except urllib2.HTTPError, error:
-        # Will occur when a 3xx or greater code is returned
-        msg = error.read().strip()
-        log.error('Posting to receipt signing failed: %s, %s'
-                  % (error.code, msg))
-        raise SigningError('Posting to receipt signing failed: %s, %s'
-                           % (error.code, msg))
-    except:
-        # Will occur when some other error occurs.
-        log.error('Posting to receipt signing failed', exc_info=True)
-        raise SigningError('Posting receipt signing failed')
-
-    if response.getcode() != 200:
-        log.error('Posting to signing failed: %s'
-                  % (response.getcode()))
-        raise SigningError('Posting to signing failed: %s'
-                           % (response.getcode()))
-
-    return json.loads(response.read())['receipt']
+    return get_client().sign(receipt)
 
 
 def decode(receipt):
@@ -2,17 +2,20 @@
 import json
 import os
 import shutil
+import time
 import zipfile
 
 from django.conf import settings  # For mocking.
+from django.core.cache import cache
 from django.core.files.storage import default_storage as storage
 
 import jwt
 import mock
+import requests
 from nose.tools import eq_, raises
 
 import amo.tests
-from lib.crypto import packaged
+from lib.crypto import fake_signer, packaged, receipt
 from lib.crypto.receipt import crack, sign, SigningError
 from mkt.webapps.models import Webapp
 from versions.models import Version
@@ -37,40 +40,110 @@ def mock_sign(version_id, reviewer=False):
     return path
 
 
-@mock.patch('lib.crypto.receipt.urllib2.urlopen')
+@mock.patch('lib.crypto.receipt.requests.Session.post')
 @mock.patch.object(settings, 'SIGNING_SERVER', 'http://localhost')
 class TestReceipt(amo.tests.TestCase):
 
-    def test_called(self, urlopen):
-        urlopen.return_value = self.get_response(200)
+    def setUp(self):
+        receipt._clients.clear()
+
+    def test_called(self, post):
+        post.return_value = self.get_response(200)
         sign('my-receipt')
-        eq_(urlopen.call_args[0][0].data, 'my-receipt')
+        eq_(post.call_args[1]['data'], 'my-receipt')
 
-    def test_some_unicode(self, urlopen):
-        urlopen.return_value = self.get_response(200)
+    def test_some_unicode(self, post):
+        post.return_value = self.get_response(200)
         sign({'name': u'Вагиф Сәмәдоғлу'})
 
     def get_response(self, code):
         response = mock.Mock()
-        response.getcode = mock.Mock()
-        response.getcode.return_value = code
-        response.read.return_value = json.dumps({'receipt': ''})
+        response.status_code = code
+        response.content = json.dumps({'receipt': ''})
         return response
 
     @raises(SigningError)
-    def test_error(self, urlopen):
-        urlopen.return_value = self.get_response(403)
+    def test_error(self, post):
+        post.return_value = self.get_response(403)
+        sign('x')
+
+    def test_good(self, post):
+        post.return_value = self.get_response(200)
         sign('x')
 
-    def test_good(self, urlopen):
-        urlopen.return_value = self.get_response(200)
+    @raises(SigningError)
+    def test_other(self, post):
+        post.return_value = self.get_response(206)
         sign('x')
 
     @raises(SigningError)
-    def test_other(self, urlopen):
-        urlopen.return_value = self.get_response(206)
+    def test_connection_error(self, post):
+        post.side_effect = requests.exceptions.ConnectionError
         sign('x')
 
+    def test_same_client(self, post):
+        eq_(receipt.get_client(), receipt.get_client())
+
+
+class TestSigningClient(amo.tests.TestCase):
+
+    def start(self, **kw):
+        server, url = fake_signer.start(**kw)
+        self.addCleanup(server.shutdown)
+        return url
+
+    def test_sign(self):
+        client = receipt.SigningClient(self.start(), 5)
+        eq_(crack(client.sign({'typ': 'purchase-receipt'}))[1],
+            {'typ': 'purchase-receipt'})
+
+    def test_sign_many(self):
+        client = receipt.SigningClient(self.start(delay=0.01), 5,
+                                       pool_size=3)
+        receipts = [{'id': k} for k in range(10)]
+        eq_([crack(r)[1] for r in client.sign_many(receipts)], receipts)
+
+    def test_sign_async(self):
+        client = receipt.SigningClient(self.start(), 5)
+        eq_(crack(client.sign_async({'id': 1}).get(timeout=5))[1], {'id': 1})
+
+    def test_circuit_breaker(self):
+        client = receipt.SigningClient(self.start(status=500), 5,
+                                       max_failures=2, cool_off=60)
+        with mock.patch.object(client.session, 'post',
+                               wraps=client.session.post) as post:
+            for k in range(4):
+                self.assertRaises(SigningError, client.sign, 'x')
+            # The server isn't called once the circuit is open.
+            eq_(post.call_count, 2)
+
+    def test_circuit_closes(self):
+        client = receipt.SigningClient(self.start(), 5, max_failures=1)
+        client.failures, client.open_until = 1, time.time() - 1
+        client.sign('x')
+        eq_(client.failures, 0)
+
+    def test_refusal_not_failure(self):
+        client = receipt.SigningClient(self.start(status=403), 5,
+                                       max_failures=1)
+        self.assertRaises(SigningError, client.sign, 'x')
+        eq_(client.open_until, 0)
+
+    def test_timeout(self):
+        client = receipt.SigningClient(self.start(delay=0.5), 0.1,
+                                       max_failures=1)
+        self.assertRaises(SigningError, client.sign, 'x')
+        assert client.open_until
+
+    def test_too_many_pending(self):
+        client = receipt.SigningClient(self.start(delay=0.5), 5,
+                                       max_pending=1, pending_timeout=0.05)
+        first = client.sign_async('x')
+        time.sleep(0.1)
+        self.assertRaises(SigningError, client.sign, 'y')
+        assert first.get(timeout=5)
+        eq_(client.pending, 0)
+
 
 class TestCrack(amo.tests.TestCase):
 
@@ -142,6 +215,82 @@ class TestPackaged(PackagedApp, amo.tests.TestCase):
         packaged.sign(self.version.pk, resign=True)
         assert sign_app.called
 
+    @mock.patch('lib.crypto.packaged.sign_app')
+    @mock.patch('lib.crypto.packaged.cache')
+    def test_signing_elsewhere(self, cache, sign_app):
+        cache.add.return_value = False
+
+        def signed(key):
+            # The other process is done signing.
+            storage.open(self.file.signed_file_path, 'w').close()
+            return None
+
+        cache.get.side_effect = signed
+        eq_(packaged.sign(self.version.pk), self.file.signed_file_path)
+        assert not sign_app.called
+
+    @mock.patch('lib.crypto.packaged.sign_app')
+    @mock.patch('lib.crypto.packaged.cache')
+    def test_signing_elsewhere_failed(self, cache, sign_app):
+        cache.add.return_value = False
+        cache.get.return_value = None
+        packaged.sign(self.version.pk)
+        assert sign_app.called
+
+    @mock.patch('lib.crypto.packaged.sign_app')
+    @mock.patch('lib.crypto.packaged.cache')
+    def test_signing_elsewhere_too_slow(self, cache, sign_app):
+        cache.add.return_value = False
+        cache.get.return_value = 1
+        with self.settings(SIGNED_APPS_LOCK_TIMEOUT=0):
+            eq_(packaged.sign(self.version.pk), self.file.signed_file_path)
+        assert sign_app.called
+
+    @mock.patch('lib.crypto.packaged.sign_app')
+    def test_signed_while_locking(self, sign_app):
+        add = cache.add
+
+        def signed(*args):
+            # Another process signed it and released the lock meanwhile.
+            storage.open(self.file.signed_file_path, 'w').close()
+            return add(*args)
+
+        with mock.patch.object(packaged.cache, 'add', side_effect=signed):
+            eq_(packaged.sign(self.version.pk), self.file.signed_file_path)
+        assert not sign_app.called
+        eq_(cache.get('sign:public:%s' % self.version.pk), None)
+
+    @mock.patch('lib.crypto.packaged.sign_app')
+    def test_lock_released(self, sign_app):
+        packaged.sign(self.version.pk)
+        eq_(cache.get('sign:public:%s' % self.version.pk), None)
+
+    @mock.patch('lib.crypto.packaged.sign_app')
+    def test_lock_released_on_failure(self, sign_app):
+        sign_app.side_effect = packaged.SigningError
+        with self.assertRaises(packaged.SigningError):
+            packaged.sign(self.version.pk)
+        eq_(cache.get('sign:public:%s' % self.version.pk), None)
+
+    @mock.patch.object(packaged, '_get_endpoint', lambda _: None)
+    def test_moved_in_place(self):
+        path = self.file.signed_file_path
+        rename = os.rename
+
+        def moved(src, dest):
+            # Written to a file of its own, not in place.
+            assert not storage.exists(path)
+            assert src.startswith(path + '.') and src.endswith('.tmp')
+            eq_(dest, path)
+            rename(src, dest)
+
+        with mock.patch('lib.crypto.packaged.os.rename',
+                        side_effect=moved) as move:
+            eq_(packaged.sign(self.version.pk), path)
+        assert move.called
+        eq_(storage.open(path).read(),
+            open(self.packaged_app_path('mozball.zip')).read())
+
     @raises(ValueError)
     def test_server_active(self):
         with self.settings(SIGNED_APPS_SERVER_ACTIVE=True):
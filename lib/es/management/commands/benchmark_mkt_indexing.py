@@ -0,0 +1,59 @@
+"""
+A Marketplace only command comparing the speed of document extraction for
+apps, one by one versus in chunks. Nothing is sent to ES.
+
+Call like:
+
+    ./manage.py benchmark_mkt_indexing --limit=1000 --chunk-size=100
+
+"""
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from amo.utils import chunked
+from mkt.webapps.models import Webapp, WebappIndexer
+
+
+def _get_apps(ids):
+    return list(Webapp.indexing_transformer(
+        Webapp.with_deleted.no_cache().filter(id__in=ids)))
+
+
+def extract_one_by_one(ids, chunk_size):
+    for chunk in chunked(ids, chunk_size):
+        for obj in _get_apps(chunk):
+            WebappIndexer.extract_document(obj.id, obj)
+
+
+def extract_in_chunks(ids, chunk_size):
+    max_downloads = WebappIndexer.get_max_downloads()
+    for chunk in chunked(ids, chunk_size):
+        WebappIndexer.extract_documents(_get_apps(chunk),
+                                        max_downloads=max_downloads)
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--limit', action='store', type='int', default=1000,
+                    help='Number of apps to extract'),
+        make_option('--chunk-size', action='store', type='int', default=100,
+                    help='Number of apps loaded at once'),
+    )
+
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        ids = list(WebappIndexer.get_indexable()[:kw['limit']])
+        if not ids:
+            self.stdout.write('No apps to extract.\n')
+            return
+
+        for name, func in (('one by one', extract_one_by_one),
+                           ('in chunks', extract_in_chunks)):
+            start = time.time()
+            func(ids, kw['chunk_size'])
+            elapsed = time.time() - start
+            self.stdout.write('%s: %s docs in %.2fs, %.1f docs/sec\n' % (
+                name, len(ids), elapsed, len(ids) / elapsed))
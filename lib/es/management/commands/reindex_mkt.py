@@ -7,6 +7,7 @@ reindex command that has args for AMO and MKT.
 """
 
 import logging
+import multiprocessing
 import os
 import sys
 import time
@@ -17,12 +18,14 @@ from celery import task
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 
 from amo.utils import chunked, timestamp_index
 from addons.models import Webapp  # To avoid circular import.
 from lib.es.utils import (flag_reindexing_mkt, is_reindexing_mkt,
                           unflag_reindexing_mkt)
 
+from mkt.search.utils import invalidate_featured_cache
 from mkt.webapps.models import WebappIndexer
 
 
@@ -92,21 +95,41 @@ def index_webapp(ids, **kw):
     qs = Webapp.indexing_transformer(Webapp.with_deleted.no_cache()
                                      .filter(id__in=ids))
 
-    docs = []
-    for obj in qs:
-        try:
-            docs.append(WebappIndexer.extract_document(obj.id, obj=obj))
-        except Exception as e:
-            sys.stdout.write('Failed to index obj: {0}. {1}'.format(obj.id, e))
+    try:
+        docs = WebappIndexer.extract_documents(
+            qs, max_downloads=kw.pop('max_downloads', None))
+    except Exception as e:
+        # Fall back to extracting documents one by one so that a single
+        # broken app doesn't prevent the rest of the chunk from being indexed.
+        sys.stdout.write('Failed to index chunk, retrying one by one. %s' % e)
+        docs = []
+        for obj in qs:
+            try:
+                docs.append(WebappIndexer.extract_document(obj.id, obj=obj))
+            except Exception as e:
+                sys.stdout.write(
+                    'Failed to index obj: {0}. {1}'.format(obj.id, e))
 
     WebappIndexer.bulk_index(docs, es=ES, index=index)
+    return len(docs)
+
+
+def _index_webapp_chunk(args):
+    """Process pool entry point: index a chunk of ids in a child process."""
+    # Each child process needs its own database connection, never share the
+    # one inherited from the parent.
+    connection.close()
+    ids, kw = args
+    return index_webapp(ids, **kw)
 
 
 @task(time_limit=time_limits['hard'], soft_time_limit=time_limits['soft'])
-def run_indexing(index):
+def run_indexing(index, processes=1, chunk_size=100):
     """Index the objects.
 
     - index: name of the index
+    - processes: number of processes to spread the chunks across
+    - chunk_size: number of apps to extract and send to ES at once
 
     Note: Our ES doc sizes are about 5k in size. Chunking by 100 sends ~500kb
     of data to ES at a time.
@@ -117,9 +140,22 @@ def run_indexing(index):
     """
     sys.stdout.write('Indexing apps into index: %s' % index)
 
-    qs = WebappIndexer.get_indexable()
-    for chunk in chunked(list(qs), 100):
-        index_webapp(chunk, index=index)
+    # The max downloads are used to compute the weight of each app, compute
+    # them once instead of once per app.
+    kw = {'index': index, 'max_downloads': WebappIndexer.get_max_downloads()}
+    chunks = chunked(list(WebappIndexer.get_indexable()), chunk_size)
+    if processes > 1:
+        connection.close()
+        pool = multiprocessing.Pool(processes)
+        try:
+            count = sum(pool.imap_unordered(
+                _index_webapp_chunk, ((chunk, kw) for chunk in chunks)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        count = sum(index_webapp(chunk, **kw) for chunk in chunks)
+    sys.stdout.write('Indexed %s apps' % count)
 
 
 @task
@@ -166,6 +202,8 @@ def update_alias(new_index, old_index, alias, settings):
             {'remove': {'index': old_index, 'alias': alias}}
         )
     ES.update_aliases(dict(actions=actions))
+    # The featured search responses cached from the old index are stale.
+    invalidate_featured_cache()
 
 
 @task
@@ -185,6 +223,12 @@ class Command(BaseCommand):
                     help=('Bypass the database flag that says '
                           'another indexation is ongoing'),
                     default=False),
+        make_option('--processes', action='store', type='int',
+                    help='Number of processes used to index apps',
+                    default=1),
+        make_option('--chunk-size', action='store', type='int',
+                    help='Number of apps sent to ES in each bulk request',
+                    default=100),
     )
 
     def handle(self, *args, **kwargs):
@@ -199,6 +243,8 @@ class Command(BaseCommand):
 
         force = kwargs.get('force', False)
         prefix = kwargs.get('prefix', '')
+        processes = kwargs.get('processes', 1)
+        chunk_size = kwargs.get('chunk_size', 100)
 
         if is_reindexing_mkt() and not force:
             raise CommandError('Indexation already occuring - use --force to '
@@ -245,7 +291,8 @@ class Command(BaseCommand):
             'refresh_interval': '-1'})
 
         # Index all the things!
-        chain |= run_indexing.si(new_index)
+        chain |= run_indexing.si(new_index, processes=processes,
+                                 chunk_size=chunk_size)
 
         # After indexing we optimize the index, adjust settings, and point the
         # alias to the new index.
@@ -1,4 +1,10 @@
+import csv
 import logging
+import mmap
+import socket
+import struct
+import threading
+from collections import OrderedDict
 
 import requests
 from django_statsd.clients import statsd
@@ -25,14 +31,159 @@ def is_public(ip):
     return True
 
 
+def ip_to_int(address):
+    """Returns the IPv4 `address` as an int, or None if it isn't one."""
+    try:
+        return struct.unpack('>I', socket.inet_aton(address))[0]
+    except (socket.error, TypeError):
+        return None
+
+
+# A range of IPv4 addresses, inclusive, and its country code.
+RECORD = struct.Struct('>II2s')
+
+
+def build_database(rows, path):
+    """
+    Writes the (first ip, last ip, country code) `rows` to a database file
+    at `path`, for `GeoIPDatabase`. Returns the number of ranges written.
+
+    Adjacent ranges of the same country are merged.
+    """
+    ranges = []
+    for first, last, country in sorted(rows):
+        country = country.lower()
+        if ranges and ranges[-1][2] == country and ranges[-1][1] + 1 == first:
+            ranges[-1][1] = last
+        else:
+            ranges.append([first, last, country])
+
+    with open(path, 'wb') as fp:
+        for first, last, country in ranges:
+            fp.write(RECORD.pack(first, last, country))
+    return len(ranges)
+
+
+def read_csv(fp):
+    """
+    Yields the (first ip, last ip, country code) rows of a MaxMind GeoIP
+    country CSV file, where each line is like:
+
+        "1.0.0.0","1.0.0.255","16777216","16777471","AU","Australia"
+
+    """
+    for row in csv.reader(fp):
+        yield int(row[2]), int(row[3]), row[4]
+
+
+class GeoIPDatabase(object):
+    """
+    Resolves IPv4 addresses to country codes from a file of sorted ranges,
+    see `build_database`, mapped in memory and searched in place.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as fp:
+            self.map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = len(self.map) // RECORD.size
+
+    def lookup(self, ip):
+        """
+        Returns the (first ip, last ip, country code) range `ip`, an int, is
+        in, or None.
+        """
+        # Find the last range starting at or before the ip.
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if struct.unpack_from('>I', self.map, mid * RECORD.size)[0] > ip:
+                hi = mid
+            else:
+                lo = mid + 1
+        if not lo:
+            return None
+        first, last, country = RECORD.unpack_from(self.map,
+                                                  (lo - 1) * RECORD.size)
+        if ip > last:
+            return None
+        return first, last, country
+
+
+class LRUCache(object):
+    """A bounded, thread safe, least recently used cache."""
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.entries[key] = value
+            return value
+
+    def set(self, key, value):
+        if not self.size:
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
 class GeoIP:
-    """Call to geodude server to resolve an IP to Geo Info block."""
+    """
+    Resolves an IP to a country code, from a local database when
+    GEOIP_DB_PATH is set, otherwise or failing that from a geodude server.
+    """
 
     def __init__(self, settings):
         self.timeout = float(getattr(settings, 'GEOIP_DEFAULT_TIMEOUT', .2))
         self.url = getattr(settings, 'GEOIP_URL', '')
         self.default_val = getattr(settings, 'GEOIP_DEFAULT_VAL',
                                    regions.RESTOFWORLD.slug).lower()
+        self.db = None
+        self.cache = LRUCache(getattr(settings, 'GEOIP_CACHE_SIZE', 0))
+        path = getattr(settings, 'GEOIP_DB_PATH', '')
+        if path:
+            try:
+                self.db = GeoIPDatabase(path)
+            except (IOError, ValueError, mmap.error):
+                # Empty files can't be mapped.
+                log.error('Could not load the GeoIP database: {0}'
+                          .format(path), exc_info=True)
+
+    def lookup_local(self, address):
+        """
+        Resolves an IP address from the local database, or returns None.
+
+        Lookups are cached by /24 prefix, unless the range found for the
+        address doesn't cover its whole /24.
+        """
+        ip = ip_to_int(address)
+        if ip is None:
+            return None
+        prefix = ip & 0xffffff00
+        # The network address of a /24 is an address too, keep them apart.
+        country = self.cache.get(('prefix', prefix))
+        if country is None:
+            country = self.cache.get(('ip', ip))
+        if country is not None:
+            statsd.incr('z.geoip.local.cache.hit')
+            return country or None
+
+        statsd.incr('z.geoip.local.cache.miss')
+        found = self.db.lookup(ip)
+        # An empty string caches that the address is unknown.
+        country = found[2] if found else ''
+        if found and found[0] <= prefix and prefix + 0xff <= found[1]:
+            self.cache.set(('prefix', prefix), country)
+        else:
+            self.cache.set(('ip', ip), country)
+        return country or None
 
     def lookup(self, address):
         """Resolve an IP address to a block of geo information.
@@ -42,6 +193,13 @@ class GeoIP:
 
         """
         public_ip = is_public(address)
+        if self.db and public_ip:
+            with statsd.timer('z.geoip.local'):
+                country_code = self.lookup_local(address)
+            if country_code:
+                statsd.incr('z.geoip.local.success')
+                return country_code
+
         if self.url and public_ip:
             with statsd.timer('z.geoip'):
                 res = None
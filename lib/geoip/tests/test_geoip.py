@@ -1,4 +1,7 @@
+import os
+import tempfile
 from random import randint
+from StringIO import StringIO
 
 import mock
 import requests
@@ -6,12 +9,15 @@ from nose.tools import eq_
 
 import amo.tests
 
-from lib.geoip import GeoIP
+from lib.geoip import (build_database, GeoIP, GeoIPDatabase, ip_to_int,
+                       read_csv)
 
 
-def generate_settings(url='', default='restofworld', timeout=0.2):
+def generate_settings(url='', default='restofworld', timeout=0.2,
+                      db_path='', cache_size=10):
     return mock.Mock(GEOIP_URL=url, GEOIP_DEFAULT_VAL=default,
-                     GEOIP_DEFAULT_TIMEOUT=timeout)
+                     GEOIP_DEFAULT_TIMEOUT=timeout, GEOIP_DB_PATH=db_path,
+                     GEOIP_CACHE_SIZE=cache_size)
 
 
 class GeoIPTest(amo.tests.TestCase):
@@ -86,3 +92,83 @@ class GeoIPTest(amo.tests.TestCase):
             result = geoip.lookup(ip)
             assert not mock_post.called
             eq_(result, 'restofworld')
+
+
+class GeoIPDatabaseTest(amo.tests.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+        self.count = build_database(read_csv(StringIO(
+            '"1.0.0.0","1.0.0.255","16777216","16777471","AU","Australia"\n'
+            '"1.0.1.0","1.0.1.255","16777472","16777727","AU","Australia"\n'
+            '"2.0.0.0","2.0.0.10","33554432","33554442","FR","France"\n'
+            '"2.0.0.11","2.0.1.255","33554443","33554943","DE","Germany"\n'
+        )), self.path)
+
+    def geoip(self, **kw):
+        return GeoIP(generate_settings(db_path=self.path, **kw))
+
+    def test_merged(self):
+        eq_(self.count, 3)
+        eq_(os.path.getsize(self.path), 30)
+
+    def test_lookup(self):
+        db = GeoIPDatabase(self.path)
+        eq_(db.lookup(ip_to_int('1.0.1.1')),
+            (ip_to_int('1.0.0.0'), ip_to_int('1.0.1.255'), 'au'))
+        eq_(db.lookup(ip_to_int('2.0.0.10'))[2], 'fr')
+        eq_(db.lookup(ip_to_int('2.0.0.11'))[2], 'de')
+        eq_(db.lookup(ip_to_int('0.0.0.1')), None)
+        eq_(db.lookup(ip_to_int('1.0.2.0')), None)
+        eq_(db.lookup(ip_to_int('9.9.9.9')), None)
+
+    @mock.patch('requests.post')
+    def test_local(self, mock_post):
+        eq_(self.geoip(url='localhost').lookup('1.0.0.1'), 'au')
+        assert not mock_post.called
+
+    @mock.patch('requests.post')
+    def test_fallback(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=200, json=lambda: {
+            'country_code': 'US'})
+        eq_(self.geoip(url='localhost').lookup('9.9.9.9'), 'us')
+        assert mock_post.called
+
+    def test_no_fallback(self):
+        eq_(self.geoip().lookup('9.9.9.9'), 'restofworld')
+
+    def test_cache_prefix(self):
+        geoip = self.geoip()
+        geoip.lookup('1.0.0.1')
+        eq_(geoip.cache.entries.keys(), [('prefix', ip_to_int('1.0.0.0'))])
+        with mock.patch.object(geoip.db, 'lookup') as lookup:
+            eq_(geoip.lookup('1.0.0.200'), 'au')
+            assert not lookup.called
+
+    def test_cache_split_prefix(self):
+        # 2.0.0.0/24 is split between two countries.
+        geoip = self.geoip()
+        eq_(geoip.lookup('2.0.0.1'), 'fr')
+        eq_(geoip.lookup('2.0.0.100'), 'de')
+        eq_(geoip.cache.entries.keys(),
+            [('ip', ip_to_int('2.0.0.1')), ('ip', ip_to_int('2.0.0.100'))])
+
+    def test_cache_split_prefix_network_address(self):
+        # The network address of a split /24 isn't cached as its prefix.
+        geoip = self.geoip()
+        eq_(geoip.lookup('2.0.0.0'), 'fr')
+        eq_(geoip.lookup('2.0.0.100'), 'de')
+        eq_(geoip.lookup('2.0.0.0'), 'fr')
+
+    def test_cache_size(self):
+        geoip = self.geoip(cache_size=1)
+        geoip.lookup('1.0.0.1')
+        geoip.lookup('2.0.0.1')
+        eq_(geoip.cache.entries.keys(), [('ip', ip_to_int('2.0.0.1'))])
+
+    def test_missing_database(self):
+        geoip = GeoIP(generate_settings(db_path='/does/not/exist'))
+        eq_(geoip.db, None)
+        eq_(geoip.lookup('1.0.0.1'), 'restofworld')
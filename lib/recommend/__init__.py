@@ -4,6 +4,10 @@ items.
 
 Check the function docs, they expect specific preconditions.
 """
+import array
+import heapq
+import multiprocessing
+from collections import defaultdict
 
 # Placeholders for the fast functions implemented in C.
 
@@ -20,3 +24,88 @@ try:
     from _recommend import symmetric_diff_count, similarity
 except ImportError:
     pass
+
+
+class SimilarityIndex(object):
+    """
+    Finds the items most similar to each other, for `similarity`.
+
+    `items` is a dict of {item: sorted array of collections}. An inverted
+    index of {collection: array of items} gives the items sharing collections
+    with an item, the only ones that need to be scored. The similarity of the
+    others only depends on their number of collections, so the candidates
+    among them are the ones with the fewest.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.lengths = dict((item, len(cs)) for item, cs in items.iteritems())
+        index = defaultdict(lambda: array.array('l'))
+        for item in sorted(items):
+            for collection in items[item]:
+                index[collection].append(item)
+        self.index = dict(index)
+        self.by_length = sorted(items, key=lambda i: (self.lengths[i], i))
+
+    def top(self, item, k=10):
+        """Returns the [(other, score)] of the k items most similar to item."""
+        shared = defaultdict(int)
+        for collection in self.items[item]:
+            for other in self.index[collection]:
+                shared[other] += 1
+        shared.pop(item, None)
+
+        # |xs ^ ys| == |xs| + |ys| - 2 * |xs & ys|
+        size, lengths = self.lengths[item], self.lengths
+        candidates = [(1. / (1 + size + lengths[other] - 2 * count), other)
+                      for other, count in shared.iteritems()]
+        disjoint = 0
+        for other in self.by_length:
+            if disjoint == k:
+                break
+            if other != item and other not in shared:
+                candidates.append((1. / (1 + size + lengths[other]), other))
+                disjoint += 1
+
+        best = heapq.nsmallest(k, candidates, key=lambda c: (-c[0], c[1]))
+        return [(other, score) for score, other in best]
+
+
+# The index shared with the processes of the pool, see `all_top`.
+_index = None
+
+
+def _top_chunk(args):
+    items, k = args
+    return [(item, _index.top(item, k)) for item in items]
+
+
+def all_top(items, k=10, processes=1, chunk_size=100):
+    """
+    Yields (item, [(other, score)]) with the k items most similar to each
+    of `items`, a dict of {item: sorted array of collections}.
+
+    With more than one process, the work is split in chunks of items across
+    a pool of processes forked with the index.
+    """
+    global _index
+    index = SimilarityIndex(items)
+    ids = sorted(items)
+    if processes <= 1:
+        for item in ids:
+            yield item, index.top(item, k)
+        return
+
+    _index = index
+    pool = multiprocessing.Pool(processes)
+    try:
+        chunks = [(ids[i:i + chunk_size], k)
+                  for i in xrange(0, len(ids), chunk_size)]
+        for result in pool.imap_unordered(_top_chunk, chunks):
+            for pair in result:
+                yield pair
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        _index = None
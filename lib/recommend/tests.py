@@ -1,5 +1,6 @@
+import random
 from array import array
-from nose.tools import eq_
+from nose.tools import eq_, ok_
 
 import recommend
 
@@ -31,3 +32,47 @@ def test_symmetric_diff_count():
 # The algorithm is in flux so this is minimal coverage.
 def test_similarity():
     eq_(1/2., recommend.similarity([1], [1, 2]))
+
+
+def _random_items(count=200, collections=150):
+    rand = random.Random(42)
+    return dict((item, array('l', sorted(set(
+                    rand.randint(0, collections)
+                    for _ in range(rand.randint(4, 20))))))
+                for item in range(count))
+
+
+def _brute_force_top(items, item, k=10):
+    scores = [(recommend.similarity(items[item], cs), other)
+              for other, cs in items.items() if other != item]
+    return [score for score, other in sorted(scores, reverse=True)[:k]]
+
+
+def test_similarity_index():
+    items = _random_items()
+    index = recommend.SimilarityIndex(items)
+    for item in items:
+        top = index.top(item)
+        eq_(len(top), 10)
+        ok_(item not in dict(top))
+        # Ties can be in any order, compare the scores only.
+        eq_([score for other, score in top], _brute_force_top(items, item))
+
+
+def test_similarity_index_disjoint():
+    items = {1: array('l', [1, 2, 3, 4]),
+             2: array('l', [5, 6, 7, 8, 9, 10, 11]),
+             3: array('l', [1, 12, 13, 14, 15, 16, 17, 18, 19]),
+             4: array('l', [20, 21, 22, 23])}
+    # 3 shares a collection with 1, but its many other collections make it
+    # less similar than 4 and 2.
+    eq_(recommend.SimilarityIndex(items).top(1),
+        [(4, 1 / 9.), (2, 1 / 12.), (3, 1 / 12.)])
+
+
+def test_all_top_processes():
+    items = _random_items()
+    expected = dict(recommend.all_top(items, k=5))
+    eq_(sorted(expected), sorted(items))
+    eq_(dict(recommend.all_top(items, k=5, processes=2, chunk_size=30)),
+        expected)
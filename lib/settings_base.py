@@ -68,6 +68,9 @@ UGLIFY_BIN = 'uglifyjs'  # Set as None to use YUI instead (at your risk).
 
 # Path to pngcrush (for image optimization).
 PNGCRUSH_BIN = 'pngcrush'
+# How many pngcrush processes a task runs at once, to optimize the sizes of
+# an icon.
+PNGCRUSH_WORKERS = 4
 
 ADMINS = (
     # ('Your Name', 'your_email@domain.com'),
@@ -106,6 +109,18 @@ SERVICES_DATABASE = {
     'HOST': '',
 }
 
+# In-process cache of the responses of services/update.py, keyed on the
+# normalized query. Set the size to 0 to disable it.
+SERVICES_UPDATE_CACHE_SIZE = 10000
+SERVICES_UPDATE_CACHE_TIMEOUT = 60 * 5
+# Number of (add-on, application) pairs whose files are kept in memory by the
+# update service to answer queries without SQL. Set to 0 to disable it.
+SERVICES_UPDATE_INDEX_SIZE = 5000
+# Memcache servers shared with the update service, used to invalidate cached
+# responses when the files or versions of an add-on change. Without them, the
+# cached responses only expire after SERVICES_UPDATE_CACHE_TIMEOUT.
+SERVICES_UPDATE_CACHE_SERVERS = []
+
 DATABASE_ROUTERS = ('multidb.PinningMasterSlaveRouter',)
 
 # For use django-mysql-pool backend.
@@ -258,6 +273,9 @@ SIGNED_APPS_SERVER = ''
 SIGNED_APPS_REVIEWER_SERVER = ''
 # And how long we'll give the server to respond.
 SIGNED_APPS_SERVER_TIMEOUT = 10
+# How long other processes wait for an app being signed, rather than sign it
+# again.
+SIGNED_APPS_LOCK_TIMEOUT = 30
 # Send the more terse manifest signatures to the app signing server.
 SIGNED_APPS_OMIT_PER_FILE_SIGS = True
 
@@ -282,6 +300,13 @@ DUMPED_USERS_PATH = NETAPP_STORAGE + '/dumped-users'
 # Tarballs in DUMPED_USERS_PATH deleted 30 days after they have been written.
 DUMPED_USERS_DAYS_DELETE = 3600 * 24 * 30
 
+# Number of apps or users serialized at once by the public dumps, each chunk
+# with a single query.
+DUMP_CHUNK_SIZE = 100
+
+# Number of processes serializing the chunks of the public dumps.
+DUMP_PROCESSES = 4
+
 # paths that don't require an app prefix
 SUPPORTED_NONAPPS = ('about', 'admin', 'apps', 'blocklist', 'credits',
                      'developer_agreement', 'developer_faq', 'developers',
@@ -1328,6 +1353,13 @@ MAX_PERSONA_UPLOAD_SIZE = 300 * 1024
 MAX_REVIEW_ATTACHMENT_UPLOAD_SIZE = 5 * 1024 * 1024
 MAX_WEBAPP_UPLOAD_SIZE = 2 * 1024 * 1024
 
+# How many manifests of hosted apps update_manifests fetches at once, how
+# many of them from the same host, and the minimum number of seconds between
+# two requests to the same host.
+MANIFEST_CRAWLER_WORKERS = 10
+MANIFEST_CRAWLER_HOST_CONCURRENCY = 2
+MANIFEST_CRAWLER_HOST_INTERVAL = 0.1
+
 # RECAPTCHA - copy all three statements to settings_local.py
 RECAPTCHA_PUBLIC_KEY = ''
 RECAPTCHA_PRIVATE_KEY = ''
@@ -1357,6 +1389,12 @@ SPIDERMONKEY = None
 VALIDATE_ADDONS = True
 # Number of seconds before celery tasks will abort addon validation:
 VALIDATOR_TIMEOUT = 110
+# Number of seconds the validation results of files are cached for, by their
+# hash, so that the same file is only validated once.
+VALIDATION_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+# Bump to drop the cached validation results, when the validator changes in
+# a way its version and git commit don't tell.
+VALIDATOR_CACHE_VERSION = 1
 
 # When True include full tracebacks in JSON. This is useful for QA on preview.
 EXPOSE_VALIDATOR_TRACEBACKS = False
@@ -1371,6 +1409,10 @@ UNLINK_SITE_STATS = True
 # Set to True if we're allowed to use X-SENDFILE.
 XSENDFILE = True
 XSENDFILE_HEADER = 'X-SENDFILE'
+# Without X-Sendfile, files are read and sent by chunks of that many bytes.
+SENDFILE_CHUNK_SIZE = 64 * 1024
+# Range requests asking for more parts of a file than that get all of it.
+SENDFILE_MAX_RANGES = 20
 
 MOBILE_COOKIE = 'mamo'
 
@@ -1383,10 +1425,18 @@ DEFAULT_SUGGESTED_CONTRIBUTION = 5
 # Path to `ps`.
 PS_BIN = '/bin/ps'
 
+# Number of processes computing the add-on recommendations in the recs cron.
+RECOMMENDATION_PROCESSES = 4
+
 BLOCKLIST_COOKIE = 'BLOCKLIST_v1'
 
 # The maximum file size that is shown inside the file viewer.
 FILE_VIEWER_SIZE_LIMIT = 1048576
+# The maximum size in bytes of the files extracted for the file viewer which
+# are kept around, by the hash of their archive.
+FILE_VIEWER_CACHE_SIZE = 5 * 1024 * 1024 * 1024
+# How long the index of the files in an archive is cached for.
+FILE_VIEWER_INDEX_TIMEOUT = 60 * 60 * 24 * 7
 # The maximum file size that you can have inside a zip file.
 FILE_UNZIP_SIZE_LIMIT = 104857600
 
@@ -1466,6 +1516,9 @@ WEBAPPS_RECEIPT_KEY = ''
 WEBAPPS_RECEIPT_EXPIRY_SECONDS = 60 * 60 * 24 * 182
 # Send a new receipt back when it expires.
 WEBAPPS_RECEIPT_EXPIRED_SEND = False
+# The most receipts that can be posted at once, as a JSON array, for
+# verification.
+WEBAPPS_RECEIPT_VERIFY_BATCH_SIZE = 100
 
 CSRF_FAILURE_VIEW = 'amo.views.csrf_failure'
 
@@ -1501,8 +1554,21 @@ SIGNING_SERVER_ACTIVE = False
 SIGNING_SERVER = ''
 # And how long we'll give the server to respond.
 SIGNING_SERVER_TIMEOUT = 10
+# How many connections to the server are kept open by each process.
+SIGNING_SERVER_POOL_SIZE = 10
+# How many receipts each process signs at once, and how long others wait
+# for their turn before failing.
+SIGNING_SERVER_MAX_PENDING = 20
+SIGNING_SERVER_PENDING_TIMEOUT = 1
+# After that many errors or timeouts in a row, stop calling the server for
+# that many seconds.
+SIGNING_SERVER_MAX_FAILURES = 5
+SIGNING_SERVER_COOL_OFF = 30
 # The domains that we will accept certificate issuers for receipts.
 SIGNING_VALID_ISSUERS = []
+# How long the receipt verifier, with the issuer certificates it fetched, and
+# the receipt key are kept in memory by the verify service.
+SIGNING_VERIFIER_CACHE_TIMEOUT = 60 * 60
 
 # True when the Django app is running from the test suite.
 IN_TEST_SUITE = False
@@ -1602,6 +1668,20 @@ JINGO_MINIFY_USE_STATIC = False
 MONOLITH_SERVER = None
 MONOLITH_INDEX = 'time_*'
 MONOLITH_MAX_DATE_RANGE = 365
+# How monolith records are written: 'db' saves each of them in the request,
+# 'buffer' writes them in batches with multi-row INSERTs, 'celery' hands the
+# batches to a task and 'spool' appends them to a file per host in
+# MONOLITH_SPOOL_DIR, loaded by the load_monolith_spool command.
+MONOLITH_SINK = 'db'
+# Buffered records are written once that many of them are waiting...
+MONOLITH_BUFFER_SIZE = 100
+# ...or that many seconds after the last write.
+MONOLITH_BUFFER_INTERVAL = 5
+# Records are dropped past that many waiting, if writing them keeps failing.
+MONOLITH_BUFFER_MAX_SIZE = 10000
+# The command only runs on the cron host: the spool files have to be on
+# storage shared by all the hosts, which supports flock().
+MONOLITH_SPOOL_DIR = NETAPP_STORAGE + '/monolith-spool'
 
 # Error generation service. Should *not* be on in production.
 ENABLE_API_ERROR_SERVICE = False
@@ -1615,6 +1695,25 @@ API_THROTTLE = True
 
 # Cache timeout on the /search/featured API.
 CACHE_SEARCH_FEATURED_API_TIMEOUT = 60 * 60  # 1 hour.
+# How long stale /search/featured API responses can still be served while
+# they are refreshed.
+CACHE_SEARCH_FEATURED_API_STALE = 60 * 60  # 1 hour.
+
+# How long the reviewer queue counts are cached. They are invalidated when
+# apps move between queues and recounted by the reconcile_queue_counts cron.
+REVIEWER_QUEUE_COUNTS_TIMEOUT = 60 * 60  # 1 hour.
+
+# How many (id, locale) translations are kept in memory by the translations
+# loader during a request or a task.
+TRANSLATIONS_CACHE_SIZE = 10000
+
+# How often, in seconds, processes check whether the region exclusions of
+# apps changed elsewhere and need to be reloaded.
+REGION_EXCLUSIONS_CHECK_INTERVAL = 30
+
+# How often, in seconds, processes reload the region exclusions of apps even
+# if they didn't see them change.
+REGION_EXCLUSIONS_RELOAD_INTERVAL = 60 * 10
 
 # Whitelist IP addresses of the allowed clients that can post email
 # through the API.
@@ -0,0 +1,11 @@
+CREATE TABLE `webapps_manifest_validators` (
+    `id` int(11) UNSIGNED AUTO_INCREMENT NOT NULL PRIMARY KEY,
+    `created` datetime NOT NULL,
+    `modified` datetime NOT NULL,
+    `addon_id` int(11) UNSIGNED NOT NULL UNIQUE,
+    `manifest_url` varchar(255),
+    `etag` varchar(255),
+    `last_modified` varchar(64)
+) ENGINE=InnoDB CHARACTER SET utf8 COLLATE utf8_general_ci;
+
+ALTER TABLE `webapps_manifest_validators` ADD CONSTRAINT `addon_id_manifest_validators` FOREIGN KEY (`addon_id`) REFERENCES `addons` (`id`);
@@ -7,7 +7,9 @@ from urlparse import urlparse
 from django.conf import settings
 from django.core import mail
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
 from django.utils.http import urlencode
 
 from mock import patch, Mock
@@ -299,6 +301,33 @@ class TestInstalled(RestOAuth):
         eq_(data['meta']['offset'], 2)
         eq_(data['meta']['next'], None)
 
+    def test_installed_user_state_queries(self):
+        for app in [app_factory() for i in range(3)]:
+            Installed.objects.create(user=self.user, addon=app)
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(self.list_url)
+        eq_(res.status_code, 200)
+        eq_(len(json.loads(res.content)['objects']), 3)
+        # The user state of all the apps of the page is loaded at once.
+        for table in ('addons_users', 'addon_purchase'):
+            eq_(len([q for q in context.captured_queries
+                     if '`%s`' % table in q['sql']]), 1, table)
+
+    def translation_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(self.list_url)
+        eq_(res.status_code, 200)
+        return len([q for q in context.captured_queries
+                    if '`translations`' in q['sql']])
+
+    def test_installed_translations_queries(self):
+        Installed.objects.create(user=self.user, addon=app_factory())
+        queries = self.translation_queries()
+        for app in [app_factory() for i in range(3)]:
+            Installed.objects.create(user=self.user, addon=app)
+        # The translations of all the apps of the page are loaded at once.
+        eq_(self.translation_queries(), queries)
+
     def test_installed_order(self):
         # Should be reverse chronological order.
         ins1 = Installed.objects.create(user=self.user, addon=app_factory())
@@ -20,6 +20,7 @@ from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
 
 import amo
+from access import acl
 from amo.utils import send_mail_jinja
 from users.models import UserProfile
 from users.views import browserid_authenticate
@@ -169,6 +170,7 @@ class LoginView(CORSMixin, CreateAPIViewWithoutModel):
 
         request.user, request.amo_user = profile.user, profile
         request.groups = profile.groups.all()
+        request.permissions = acl.get_permissions(profile)
 
         auth.login(request, profile.user)
         profile.log_login_attempt(True)  # TODO: move this to the signal.
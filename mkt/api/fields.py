@@ -8,6 +8,7 @@ from rest_framework import fields, serializers
 from rest_framework.compat import smart_text
 
 from amo.utils import to_language
+from translations import loader
 
 
 class MultiSlugChoiceField(fields.WritableField):
@@ -103,10 +104,13 @@ class TranslationSerializerField(fields.WritableField):
             self.requested_language = request.GET['lang']
 
     def fetch_all_translations(self, obj, source, field):
-        translations = field.__class__.objects.filter(id=field.id,
-            localized_string__isnull=False)
-        return dict((to_language(trans.locale), unicode(trans))
-                        for trans in translations) if translations else None
+        # The translations loader fetches them once per request.
+        translations = loader.load(all_ids=[field.id]).get(field.id)
+        if not translations:
+            return None
+        return dict((to_language(trans.locale),
+                     unicode(loader.copy(trans, field.__class__)))
+                    for trans in translations.values())
 
     def fetch_single_translation(self, obj, source, field):
         return unicode(field) if field else None
@@ -10,6 +10,7 @@ from addons.models import Addon, Category, clean_slug
 from amo.decorators import use_master
 from amo.models import SlugField
 from amo.utils import to_language
+from mkt.search.utils import invalidate_featured_cache
 from mkt.webapps.models import Webapp
 from mkt.webapps.tasks import index_webapps
 from translations.fields import PurifiedField, save_signal
@@ -190,3 +191,9 @@ models.signals.pre_save.connect(save_signal, sender=Collection,
 # not Webapp, because that's the real model underneath).
 models.signals.post_delete.connect(remove_deleted_apps, sender=Addon,
                                    dispatch_uid='apps_collections_cleanup')
+
+# The featured apps in search results come from the collections.
+for sender in (Collection, CollectionMembership):
+    for signal in (models.signals.post_save, models.signals.post_delete):
+        signal.connect(invalidate_featured_cache, sender=sender,
+                       dispatch_uid='featured_cache_%s' % sender.__name__)
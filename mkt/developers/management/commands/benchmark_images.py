@@ -0,0 +1,96 @@
+"""
+Compares resizing icons and previews one size after the other, decoding the
+source every time as before, with resizing them to all their sizes from a
+single decode. With --crush, also compares optimizing the icon sizes with
+one pngcrush after the other and with the bounded pool of pngcrush_many.
+
+Call like:
+
+    ./manage.py benchmark_images --corpus=/path/to/images --crush
+
+"""
+import os
+import shutil
+import tempfile
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import amo
+from amo.utils import resize_image, resize_images
+from mkt.constants import APP_PREVIEW_SIZES
+from mkt.developers.tasks import _pngcrush, pngcrush_many
+
+
+EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--corpus', action='store',
+                    default=os.path.join(settings.ROOT, 'apps', 'amo',
+                                         'tests', 'images'),
+                    help='Directory of icons and screenshots'),
+        make_option('--repeat', action='store', type='int', default=5,
+                    help='Number of times each image is resized'),
+        make_option('--crush', action='store_true', default=False,
+                    help='Also benchmark pngcrush'),
+    )
+
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        images = [os.path.join(kw['corpus'], name)
+                  for name in sorted(os.listdir(kw['corpus']))
+                  if name.lower().endswith(EXTENSIONS)] * kw['repeat']
+        tmp = tempfile.mkdtemp()
+        icon_sizes = [(s, s) for s in amo.ADDON_ICON_SIZES]
+        preview_sizes = [size[:2] for size in APP_PREVIEW_SIZES]
+
+        def one_by_one(sizes):
+            def run(src, dst):
+                for size in sizes:
+                    resize_image(src, '%s-%s.png' % (dst, size[0]), size,
+                                 remove_src=False, locally=True)
+            return run
+
+        def single_decode(sizes):
+            def run(src, dst):
+                resize_images(src, [('%s-%s.png' % (dst, size[0]), size)
+                                    for size in sizes],
+                              remove_src=False, locally=True)
+            return run
+
+        try:
+            for name, sizes in (('icons', icon_sizes),
+                                ('previews', preview_sizes)):
+                for how, resize in (('one by one', one_by_one(sizes)),
+                                    ('single decode', single_decode(sizes))):
+                    start = time.time()
+                    for k, src in enumerate(images):
+                        resize(src, os.path.join(tmp, str(k)))
+                    elapsed = time.time() - start
+                    self.stdout.write('%s, %s: %.1f images/sec\n' % (
+                        name, how, len(images) / elapsed))
+
+            if kw['crush']:
+                icons = [os.path.join(tmp, '%s-%s.png' % (k, size[0]))
+                         for k in range(len(images) / kw['repeat'])
+                         for size in icon_sizes]
+                for how, crush in (('one by one', lambda srcs: map(_pngcrush,
+                                                                   srcs)),
+                                   ('pool', pngcrush_many)):
+                    # Crush copies, not the icons crushed already.
+                    srcs = []
+                    for icon in icons:
+                        srcs.append('%s-%s.png' % (icon, len(srcs)))
+                        shutil.copyfile(icon, srcs[-1])
+                    start = time.time()
+                    crush(srcs)
+                    elapsed = time.time() - start
+                    self.stdout.write('pngcrush, %s: %.1f images/sec\n' % (
+                        how, len(icons) / elapsed))
+        finally:
+            shutil.rmtree(tmp)
@@ -12,12 +12,15 @@ import urlparse
 import uuid
 import zipfile
 from datetime import date
+from multiprocessing.pool import ThreadPool
 
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage as storage
 from django.utils.http import urlencode
 
+import pkg_resources
 import requests
 from appvalidator import validate_app, validate_packaged_app
 from celery_tasktree import task_with_callbacks
@@ -31,7 +34,7 @@ import lib.iarc
 from addons.models import Addon
 from amo.decorators import set_modified_on, write
 from amo.helpers import absolutify
-from amo.utils import remove_icons, resize_image, send_mail_jinja, strip_bom
+from amo.utils import remove_icons, resize_images, send_mail_jinja, strip_bom
 from files.models import FileUpload, File, FileValidation
 from files.utils import SafeUnzip
 
@@ -59,7 +62,8 @@ def validator(upload_id, **kw):
         return
 
     try:
-        validation_result = run_validator(upload.path, url=kw.get('url'))
+        validation_result = run_validator(upload.path, url=kw.get('url'),
+                                          hash=upload.hash)
         if upload.validation:
             # If there's any preliminary validation result, merge it with the
             # actual validation result.
@@ -102,29 +106,116 @@ def file_validator(file_id, **kw):
         return
     # Unlike upload validation, let the validator raise an exception if there
     # is one.
-    result = run_validator(file.file_path, url=file.version.addon.manifest_url)
+    result = run_validator(file.file_path, url=file.version.addon.manifest_url,
+                           hash=file.hash)
     return FileValidation.from_json(file, result)
 
 
-def run_validator(file_path, url=None):
-    """A pre-configured wrapper around the app validator."""
+_validator_versions = []
+
+
+def _validator_version():
+    """
+    Returns the version of the validator, with the git commit checked out
+    when it's installed from a checkout: its version number doesn't change
+    when the commit it's pinned to moves.
+    """
+    if not _validator_versions:
+        try:
+            dist = pkg_resources.get_distribution('app-validator')
+        except pkg_resources.DistributionNotFound:
+            _validator_versions.append('')
+            return ''
+        version = dist.version
+        if os.path.exists(os.path.join(dist.location, '.git')):
+            try:
+                version += '-' + subprocess.check_output(
+                    ['git', 'rev-parse', 'HEAD'], cwd=dist.location,
+                    stderr=subprocess.STDOUT).strip()
+            except (OSError, subprocess.CalledProcessError):
+                log.error('Could not get the commit of the validator.',
+                          exc_info=True)
+        _validator_versions.append(version)
+    return _validator_versions[0]
+
+
+def validation_cache_key(hash, url=None):
+    """
+    The cache key of the validation of the file with the sha256 `hash`, by
+    this version of the validator and with these settings. `url` is the one
+    of a manifest, which is validated as well.
+    """
+    parts = [hash, url, _validator_version(), settings.VALIDATOR_CACHE_VERSION,
+             settings.VALIDATOR_IAF_URLS, bool(settings.SPIDERMONKEY)]
+    return 'validation:%s' % hashlib.sha256(json.dumps(parts)).hexdigest()
+
+
+# Parts of the ids of the messages the validator adds when it times out or
+# fails unexpectedly, rather than because of the file.
+VALIDATOR_SYSTEM_ERRORS = ('timeout', 'unexpected_exception')
+
+
+def _is_system_error(result):
+    """Tells whether the validation `result` failed for a system error."""
+    try:
+        messages = json.loads(result).get('messages', [])
+    except (TypeError, ValueError):
+        return True
+    return any(part in VALIDATOR_SYSTEM_ERRORS
+               for message in messages for part in message.get('id', ()))
+
+
+def _cached_validation(key, validate):
+    """Returns the cached validation result for `key`, or `validate()`."""
+    if key:
+        result = cache.get(key)
+        if result is not None:
+            statsd.incr('mkt.developers.validator.cache_hit')
+            return result
+        statsd.incr('mkt.developers.validator.cache_miss')
+    result = validate()
+    # The same file may validate next time, don't keep a system error.
+    if key and not _is_system_error(result):
+        cache.set(key, result, settings.VALIDATION_CACHE_TIMEOUT)
+    return result
+
+
+def run_validator(file_path, url=None, hash=None):
+    """
+    A pre-configured wrapper around the app validator.
+
+    The results are cached by the sha256 `hash` of the file, so that a file
+    is only validated once. The hash of a manifest is computed if it isn't
+    given, packages are only cached when it is.
+    """
 
     with statsd.timer('mkt.developers.validator'):
         is_packaged = zipfile.is_zipfile(file_path)
         if is_packaged:
-            log.info(u'Running `validate_packaged_app` for path: %s'
-                     % (file_path))
-            with statsd.timer('mkt.developers.validate_packaged_app'):
-                return validate_packaged_app(file_path,
-                    market_urls=settings.VALIDATOR_IAF_URLS,
-                    timeout=settings.VALIDATOR_TIMEOUT,
-                    spidermonkey=settings.SPIDERMONKEY)
+            def validate():
+                log.info(u'Running `validate_packaged_app` for path: %s'
+                         % (file_path))
+                with statsd.timer('mkt.developers.validate_packaged_app'):
+                    return validate_packaged_app(file_path,
+                        market_urls=settings.VALIDATOR_IAF_URLS,
+                        timeout=settings.VALIDATOR_TIMEOUT,
+                        spidermonkey=settings.SPIDERMONKEY)
+
+            return _cached_validation(
+                hash and validation_cache_key(hash), validate)
         else:
-            log.info(u'Running `validate_app` for path: %s' % (file_path))
-            with statsd.timer('mkt.developers.validate_app'):
-                return validate_app(storage.open(file_path).read(),
-                    market_urls=settings.VALIDATOR_IAF_URLS,
-                    url=url)
+            content = storage.open(file_path).read()
+
+            def validate():
+                log.info(u'Running `validate_app` for path: %s' % (file_path))
+                with statsd.timer('mkt.developers.validate_app'):
+                    return validate_app(content,
+                        market_urls=settings.VALIDATOR_IAF_URLS,
+                        url=url)
+
+            hash = hash or 'sha256:%s' % hashlib.sha256(content).hexdigest()
+            return _cached_validation(validation_cache_key(hash, url),
+                                      validate)
 
 
 def _hash_file(fd):
@@ -137,11 +228,9 @@ def resize_icon(src, dst, sizes, locally=False, **kw):
     """Resizes addon icons."""
     log.info('[1@None] Resizing icon: %s' % dst)
     try:
-        for s in sizes:
-            size_dst = '%s-%s.png' % (dst, s)
-            resize_image(src, size_dst, (s, s),
-                         remove_src=False, locally=locally)
-            pngcrush_image.delay(size_dst, **kw)
+        targets = [('%s-%s.png' % (dst, s), (s, s)) for s in sizes]
+        resize_images(src, targets, remove_src=False, locally=locally)
+        pngcrush_images.delay([size_dst for size_dst, s in targets], **kw)
 
         if locally:
             with open(src) as fd:
@@ -158,11 +247,11 @@ def resize_icon(src, dst, sizes, locally=False, **kw):
         log.error("Error saving addon icon: %s; %s" % (e, dst))
 
 
-@task
-@set_modified_on
-def pngcrush_image(src, **kw):
-    """Optimizes a PNG image by running it through Pngcrush."""
-    log.info('[1@None] Optimizing image: %s' % src)
+def _pngcrush(src):
+    """
+    Runs Pngcrush on `src`, replacing it. Returns whether it succeeded, the
+    errors are logged.
+    """
     try:
         # pngcrush -ow has some issues, use a temporary file and do the final
         # renaming ourselves.
@@ -177,7 +266,6 @@ def pngcrush_image(src, **kw):
         if sp.returncode != 0:
             log.error('Error optimizing image: %s; %s' % (src,
                                                                stderr.strip()))
-            pngcrush_image.retry(args=[src], kwargs=kw, max_retries=3)
             return False
 
         shutil.move(tmp_path, src)
@@ -185,6 +273,48 @@ def pngcrush_image(src, **kw):
         return True
     except Exception, e:
         log.error('Error optimizing image: %s; %s' % (src, e))
+        # Not worth retrying.
+        return None
+
+
+@task
+@set_modified_on
+def pngcrush_image(src, **kw):
+    """Optimizes a PNG image by running it through Pngcrush."""
+    log.info('[1@None] Optimizing image: %s' % src)
+    result = _pngcrush(src)
+    if result is False:
+        pngcrush_image.retry(args=[src], kwargs=kw, max_retries=3)
+    return result
+
+
+def pngcrush_many(srcs):
+    """
+    Optimizes the PNG images `srcs` with at most PNGCRUSH_WORKERS Pngcrush
+    processes at once. Returns the images which failed and can be retried.
+    """
+    if len(srcs) < 2 or settings.PNGCRUSH_WORKERS < 2:
+        results = map(_pngcrush, srcs)
+    else:
+        pool = ThreadPool(min(settings.PNGCRUSH_WORKERS, len(srcs)))
+        try:
+            results = pool.map(_pngcrush, srcs)
+        finally:
+            pool.close()
+            pool.join()
+    return [src for src, result in zip(srcs, results) if result is False]
+
+
+@task
+@set_modified_on
+def pngcrush_images(srcs, **kw):
+    """Optimizes PNG images, the sizes of an icon, in a single task."""
+    log.info('[%s@None] Optimizing images: %s' % (len(srcs), srcs[0]))
+    failed = pngcrush_many(srcs)
+    if failed:
+        pngcrush_images.retry(args=[failed], kwargs=kw, max_retries=3)
+        return False
+    return True
 
 
 @task
@@ -198,6 +328,7 @@ def resize_preview(src, instance, **kw):
         thumbnail_size = APP_PREVIEW_SIZES[0][:2]
         image_size = APP_PREVIEW_SIZES[1][:2]
         with storage.open(src, 'rb') as fp:
+            # Only reads the header.
             size = Image.open(fp).size
         if size[0] > size[1]:
             # If the image is wider than tall, then reverse the wanted size
@@ -206,14 +337,17 @@ def resize_preview(src, instance, **kw):
             thumbnail_size = thumbnail_size[::-1]
             image_size = image_size[::-1]
 
+        targets = []
         if kw.get('generate_thumbnail', True):
-            sizes['thumbnail'] = resize_image(src, thumb_dst,
-                                              thumbnail_size,
-                                              remove_src=False)
+            targets.append(('thumbnail', thumb_dst, thumbnail_size))
         if kw.get('generate_image', True):
-            sizes['image'] = resize_image(src, full_dst,
-                                          image_size,
-                                          remove_src=False)
+            targets.append(('image', full_dst, image_size))
+        if targets:
+            resized = resize_images(src, [(dst, size_)
+                                          for name, dst, size_ in targets],
+                                    remove_src=False)
+            for (name, dst, size_), new_size in zip(targets, resized):
+                sizes[name] = new_size
         instance.sizes = sizes
         instance.save()
         log.info('Preview resized to: %s' % thumb_dst)
@@ -245,10 +379,21 @@ def get_preview_sizes(ids, **kw):
                           % (addon.pk, err))
 
 
-def _fetch_content(url):
+def _fetch_content(url, headers=None):
+    """
+    Fetches `url`, sending the conditional `headers` if any, in which case a
+    304 Not Modified response is returned as well.
+    """
     with statsd.timer('developers.tasks.fetch_content'):
         try:
-            res = requests.get(url, timeout=30, stream=True)
+            if headers:
+                res = requests.get(url, timeout=30, stream=True,
+                                   headers=headers)
+                if res.status_code == 304:
+                    statsd.incr('developers.tasks.fetch_content.not_modified')
+                    return res
+            else:
+                res = requests.get(url, timeout=30, stream=True)
 
             if not 200 <= res.status_code < 300:
                 statsd.incr('developers.tasks.fetch_content.error')
@@ -375,7 +520,20 @@ def failed_validation(*messages, **kwargs):
                        'prelim': True})
 
 
-def _fetch_manifest(url, upload=None):
+class ManifestNotModified(Exception):
+    """The manifest didn't change since it was fetched with the validators."""
+
+
+def _fetch_manifest(url, upload=None, validators=None):
+    """
+    Fetches and returns the manifest at `url`, failing on `upload` or with an
+    exception if it can't be used.
+
+    `validators` is an optional {'etag': ..., 'last_modified': ...} dict of
+    the manifest fetched before. They are sent in a conditional request,
+    ManifestNotModified is raised if the server answers the manifest didn't
+    change, and the dict is updated with the validators of the new manifest.
+    """
     def fail(message, upload=None):
         if upload is None:
             # If `upload` is None, that means we're using one of @washort's old
@@ -383,14 +541,24 @@ def _fetch_manifest(url, upload=None):
             raise Exception(message)
         upload.update(validation=failed_validation(message, upload=upload))
 
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
     try:
-        response = _fetch_content(url)
+        response = _fetch_content(url, headers=headers)
     except Exception, e:
         log.error('Failed to fetch manifest from %r: %s' % (url, e))
         fail(_('No manifest was found at that URL. Check the address and try '
                'again.'), upload=upload)
         return
 
+    if headers and response.status_code == 304:
+        raise ManifestNotModified()
+
     ct = response.headers.get('content-type', '')
     if not ct.startswith('application/x-web-app-manifest+json'):
         fail(_('Manifests must be served with the HTTP header '
@@ -426,6 +594,9 @@ def _fetch_manifest(url, upload=None):
                  upload=upload)
 
     content = strip_bom(content)
+    if validators is not None:
+        validators.update(etag=response.headers.get('etag'),
+                          last_modified=response.headers.get('last-modified'))
     return content
 
 
@@ -14,7 +14,7 @@ from django.core.files.storage import default_storage as storage
 from django.test.utils import override_settings
 
 import mock
-from nose.tools import eq_
+from nose.tools import eq_, ok_
 from PIL import Image, ImageChops
 from requests import RequestException
 
@@ -106,6 +106,38 @@ def _uploader(resize_size, final_size):
     assert not os.path.exists(src.name)
 
 
+@mock.patch('mkt.developers.tasks.pngcrush_images.delay')
+@mock.patch('amo.utils.Image.open', wraps=Image.open)
+def test_resize_icon_decodes_once(open_, pngcrush):
+    src = tempfile.NamedTemporaryFile(mode='r+w+b', suffix='.png',
+                                      delete=False)
+    shutil.copyfile(get_image_path('mozilla.png'), src.name)
+    dest_name = os.path.join(settings.ADDON_ICONS_PATH, '1234')
+    tasks.resize_icon(src.name, dest_name, [32, 82, 100], locally=True)
+    eq_(open_.call_count, 1)
+    # All the sizes are optimized by a single task.
+    pngcrush.assert_called_once_with(
+        ['%s-%s.png' % (dest_name, size) for size in [32, 82, 100]])
+
+
+@mock.patch('mkt.developers.tasks._pngcrush')
+def test_pngcrush_many(_pngcrush):
+    _pngcrush.side_effect = lambda src: {'b.png': False,
+                                         'c.png': None}.get(src, True)
+    eq_(tasks.pngcrush_many(['a.png', 'b.png', 'c.png', 'd.png']),
+        ['b.png'])
+    eq_(sorted(call[0][0] for call in _pngcrush.call_args_list),
+        ['a.png', 'b.png', 'c.png', 'd.png'])
+
+
+@mock.patch('mkt.developers.tasks.pngcrush_many')
+@mock.patch('mkt.developers.tasks.pngcrush_images.retry')
+def test_pngcrush_images_retries_failures(retry, pngcrush_many):
+    pngcrush_many.return_value = ['b.png']
+    eq_(tasks.pngcrush_images(['a.png', 'b.png']), False)
+    eq_(retry.call_args[1]['args'], [['b.png']])
+
+
 class TestPngcrushImage(amo.tests.TestCase):
 
     def setUp(self):
@@ -184,6 +216,79 @@ class TestValidator(amo.tests.TestCase):
         tasks.validator(self.upload.pk)
         assert _mock.called
 
+    @mock.patch('mkt.developers.tasks.validate_app')
+    @mock.patch('mkt.developers.tasks.storage.open')
+    def test_validate_manifest_cached(self, _open, _mock):
+        _open.side_effect = lambda path: StringIO('{}')
+        _mock.return_value = '{"errors": 0}'
+        tasks.validator(self.upload.pk)
+        upload = FileUpload.objects.create()
+        tasks.validator(upload.pk)
+        eq_(_mock.call_count, 1)
+        assert FileUpload.objects.get(pk=upload.pk).valid
+
+        _open.side_effect = lambda path: StringIO('{"name": "Changed"}')
+        tasks.validator(upload.pk)
+        eq_(_mock.call_count, 2)
+
+    @mock.patch('mkt.developers.tasks.validate_packaged_app')
+    @mock.patch('zipfile.is_zipfile')
+    def test_validate_packaged_app_cached(self, _zipfile, _mock):
+        _zipfile.return_value = True
+        _mock.return_value = '{"errors": 0}'
+        self.upload.update(hash='sha256:abc')
+        tasks.validator(self.upload.pk)
+        upload = FileUpload.objects.create(hash='sha256:abc')
+        tasks.validator(upload.pk)
+        eq_(_mock.call_count, 1)
+        assert FileUpload.objects.get(pk=upload.pk).valid
+
+    @mock.patch('mkt.developers.tasks.validate_packaged_app')
+    @mock.patch('zipfile.is_zipfile')
+    def test_validate_packaged_app_not_cached_without_hash(self, _zipfile,
+                                                           _mock):
+        _zipfile.return_value = True
+        _mock.return_value = '{"errors": 0}'
+        tasks.validator(self.upload.pk)
+        tasks.validator(self.upload.pk)
+        eq_(_mock.call_count, 2)
+
+    @mock.patch('mkt.developers.tasks.validate_packaged_app')
+    @mock.patch('zipfile.is_zipfile')
+    def test_validate_packaged_app_timeout_not_cached(self, _zipfile, _mock):
+        _zipfile.return_value = True
+        _mock.return_value = json.dumps({'errors': 1, 'messages': [
+            {'id': ['main', 'prepare_package', 'timeout'],
+             'type': 'error'}]})
+        self.upload.update(hash='sha256:abc')
+        tasks.validator(self.upload.pk)
+        tasks.validator(self.upload.pk)
+        eq_(_mock.call_count, 2)
+
+    def test_validation_cache_key(self):
+        key = tasks.validation_cache_key('sha256:abc')
+        eq_(key, tasks.validation_cache_key('sha256:abc'))
+        ok_(key != tasks.validation_cache_key('sha256:abd'))
+        ok_(key != tasks.validation_cache_key('sha256:abc', 'http://a.com'))
+        with self.settings(VALIDATOR_IAF_URLS=['https://example.com']):
+            ok_(key != tasks.validation_cache_key('sha256:abc'))
+        with mock.patch('mkt.developers.tasks._validator_version') as version:
+            version.return_value = '0.0.1-new'
+            ok_(key != tasks.validation_cache_key('sha256:abc'))
+        with self.settings(VALIDATOR_CACHE_VERSION=2):
+            ok_(key != tasks.validation_cache_key('sha256:abc'))
+
+    @mock.patch('mkt.developers.tasks._validator_versions', [])
+    @mock.patch('subprocess.check_output')
+    @mock.patch('pkg_resources.get_distribution')
+    def test_validator_version_git(self, get_distribution, check_output):
+        get_distribution.return_value = mock.Mock(
+            version='1.0', location=settings.ROOT)
+        check_output.return_value = 'e4a7a1a\n'
+        eq_(tasks._validator_version(), '1.0-e4a7a1a')
+        eq_(tasks._validator_version(), '1.0-e4a7a1a')
+        eq_(check_output.call_count, 1)
+
 
 storage_open = storage.open
 
@@ -28,6 +28,28 @@ class TestDownload(BasePackagedAppTest):
         eq_(res.status_code, 200)
         assert settings.XSENDFILE_HEADER in res
 
+    @mock.patch('lib.crypto.packaged.sign')
+    def test_already_signed(self, sign):
+        mock_sign(self.file.version_id)
+        eq_(self.client.get(self.url).status_code, 200)
+        assert not sign.called
+
+    @mock.patch.object(settings, 'XSENDFILE', False)
+    @mock.patch.object(packaged, 'sign', mock_sign)
+    def test_range(self):
+        res = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        eq_(res.status_code, 206)
+        eq_(res['Content-Length'], '10')
+        with open(self.file.signed_file_path, 'rb') as signed:
+            eq_(''.join(res), signed.read(10))
+
+    @mock.patch.object(packaged, 'sign', mock_sign)
+    def test_not_modified(self):
+        etag = '"%s"' % self.file.hash.split(':')[-1]
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        eq_(res.status_code, 304)
+        assert settings.XSENDFILE_HEADER not in res
+
     def test_disabled(self):
         self.app.update(status=amo.STATUS_DISABLED)
         eq_(self.client.get(self.url).status_code, 404)
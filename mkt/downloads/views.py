@@ -1,4 +1,5 @@
 from django import http
+from django.core.files.storage import default_storage as storage
 from django.shortcuts import get_object_or_404
 
 import commonware.log
@@ -24,7 +25,10 @@ def download_file(request, file_id, type=None):
 
     # We treat blocked files like public files so users get the update.
     if file.status in [amo.STATUS_PUBLIC, amo.STATUS_BLOCKED]:
-        path = webapp.sign_if_packaged(file.version_id)
+        # Apps are signed when they are published, serve that if it's there.
+        path = file.signed_file_path
+        if not storage.exists(path):
+            path = webapp.sign_if_packaged(file.version_id)
 
     else:
         # This is someone asking for an unsigned packaged app.
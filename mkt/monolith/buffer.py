@@ -0,0 +1,299 @@
+"""
+Buffered writes of monolith records, so that recording a stat doesn't cost
+an INSERT on the master in the middle of an install request.
+
+`record_stat` hands its records to the buffer of the process when
+MONOLITH_SINK isn't 'db'. The buffer writes them in batches with one of the
+writers below: multi-row INSERTs ('buffer'), a celery task ('celery') or an
+append-only spool file ('spool'), loaded by the load_monolith_spool command.
+
+Each host spools to its own file in MONOLITH_SPOOL_DIR, which has to be on
+storage shared by all the hosts, supporting locks: the command only runs on
+the cron host and loads the files of every host.
+"""
+import datetime
+import errno
+import fcntl
+import glob
+import json
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+import commonware.log
+from django_statsd.clients import statsd
+
+
+log = commonware.log.getLogger('z.monolith')
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def to_row(record):
+    """Returns a JSON serializable row of a `MonolithRecord`."""
+    return (record.key, record.recorded.strftime(DATE_FORMAT),
+            record.user_hash, record.value)
+
+
+def from_row(row):
+    from mkt.monolith.models import MonolithRecord
+    key, recorded, user_hash, value = row
+    return MonolithRecord(
+        key=key, user_hash=user_hash, value=value,
+        recorded=datetime.datetime.strptime(recorded, DATE_FORMAT))
+
+
+def write_db(records):
+    """Writes the records with multi-row INSERTs, in one transaction."""
+    from mkt.monolith.models import MonolithRecord
+    with transaction.atomic():
+        MonolithRecord.objects.bulk_create(
+            records, batch_size=settings.MONOLITH_BUFFER_SIZE)
+
+
+def in_transaction():
+    """Tells whether the queries run now are part of a transaction."""
+    return connection.in_atomic_block or not connection.get_autocommit()
+
+
+def write_celery(records):
+    """Hands the records to a celery task writing them."""
+    from mkt.monolith.tasks import write_records
+    write_records.delay([to_row(r) for r in records])
+
+
+def spool_path():
+    """Returns the spool file of this host."""
+    return os.path.join(settings.MONOLITH_SPOOL_DIR,
+                        '%s.spool' % socket.gethostname())
+
+
+def _is_open(fp, path):
+    """Tells whether `fp` is still the file at `path`."""
+    try:
+        return os.fstat(fp.fileno()).st_ino == os.stat(path).st_ino
+    except OSError, e:
+        if e.errno != errno.ENOENT:
+            raise
+        return False
+
+
+def write_spool(records, path=None):
+    """Appends the records to the spool file, one JSON row per line."""
+    path = path or spool_path()
+    data = ''.join(json.dumps(to_row(r)) + '\n' for r in records)
+    if not os.path.exists(os.path.dirname(path)):
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError:
+            pass  # Created by another process in the meantime.
+    while True:
+        with open(path, 'a') as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                # The file may have been moved aside to be loaded since it
+                # was opened, write to the new one then.
+                if _is_open(fp, path):
+                    fp.write(data)
+                    fp.flush()
+                    return
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+WRITERS = {
+    'buffer': write_db,
+    'celery': write_celery,
+    'spool': write_spool,
+}
+
+
+class RecordBuffer(object):
+    """
+    Collects records in memory and writes them once `size` of them are
+    waiting, or `interval` seconds after the last write.
+
+    When writing fails the records are kept for the next try. No more than
+    `max_size` records are kept though: past that, records are dropped and
+    counted in statsd rather than slowing down the requests.
+
+    A `transactional` writer isn't called from `add` while a transaction is
+    open: the records of every request would be rolled back with the one of
+    the request that happened to flush. They are written once the request
+    is finished instead.
+    """
+
+    def __init__(self, writer, size=100, interval=5, max_size=10000,
+                 transactional=False):
+        self.writer = writer
+        self.transactional = transactional
+        self.size = size
+        self.interval = interval
+        self.max_size = max_size
+        self.records = []
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record):
+        """Adds a record, returning False if it was dropped."""
+        with self.lock:
+            if len(self.records) >= self.max_size:
+                statsd.incr('monolith.buffer.dropped')
+                return False
+            self.records.append(record)
+        if self.is_due() and not (self.transactional and in_transaction()):
+            self.flush()
+        return True
+
+    def is_due(self):
+        return (len(self.records) >= self.size or
+                time.time() - self.last_flush >= self.interval)
+
+    def flush(self):
+        """Writes all the records, returning how many were written."""
+        with self.lock:
+            records, self.records = self.records, []
+            self.last_flush = time.time()
+        if not records:
+            return 0
+
+        try:
+            with statsd.timer('monolith.buffer.flush'):
+                self.writer(records)
+        except Exception:
+            log.error('Writing %s monolith records failed' % len(records),
+                      exc_info=True)
+            self.requeue(records)
+            return 0
+        statsd.incr('monolith.buffer.written', len(records))
+        return len(records)
+
+    def requeue(self, records):
+        with self.lock:
+            records = records + self.records
+            kept = records[-self.max_size:]
+            dropped = len(records) - len(kept)
+            self.records = kept
+        if dropped:
+            statsd.incr('monolith.buffer.dropped', dropped)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Returns the buffer of this process, for the MONOLITH_SINK setting."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            writer = WRITERS[settings.MONOLITH_SINK]
+            _buffer = RecordBuffer(
+                writer,
+                size=settings.MONOLITH_BUFFER_SIZE,
+                interval=settings.MONOLITH_BUFFER_INTERVAL,
+                max_size=settings.MONOLITH_BUFFER_MAX_SIZE,
+                transactional=writer is write_db)
+        return _buffer
+
+
+def flush_if_due(**kw):
+    """Writes the buffered records if they are enough or waited long enough."""
+    if _buffer is not None and _buffer.is_due():
+        _buffer.flush()
+
+
+def flush(**kw):
+    if _buffer is not None:
+        _buffer.flush()
+
+
+def _save_offset(path, offset):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fp:
+        fp.write(str(offset))
+    os.rename(tmp, path)
+
+
+def _load_spool(path, chunk_size, writer):
+    loading = path + '.loading'
+    offset_path = loading + '.offset'
+    # A previous load may have failed halfway, resume it first.
+    if not os.path.exists(loading):
+        if not os.path.exists(path):
+            return 0
+        os.rename(path, loading)
+        # Wait for a writer which locked the file before the rename. Those
+        # locking it after see that it moved and write to a new file.
+        with open(loading) as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+    offset = 0
+    if os.path.exists(offset_path):
+        with open(offset_path) as fp:
+            offset = int(fp.read())
+    loaded = 0
+    with open(loading) as fp:
+        fp.seek(offset)
+        records = []
+        while True:
+            line = fp.readline()
+            if line.strip():
+                records.append(from_row(json.loads(line)))
+            if records and (len(records) >= chunk_size or not line):
+                writer(records)
+                loaded += len(records)
+                records = []
+                # The rows before are written, don't write them again if
+                # the load fails after.
+                _save_offset(offset_path, fp.tell())
+            if not line:
+                break
+    os.remove(loading)
+    if os.path.exists(offset_path):
+        os.remove(offset_path)
+    return loaded
+
+
+def load_spool(path=None, chunk_size=1000, writer=write_db):
+    """
+    Moves the spool file aside and writes its records by chunks of
+    `chunk_size`, returning how many were written. Rows appended in the
+    meantime go to a new spool file.
+
+    The offset of the rows written is saved after each chunk, a load which
+    failed goes on from there. A spool being loaded by another process is
+    skipped.
+    """
+    path = path or spool_path()
+    with open(path + '.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError, e:
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            log.info('Skipping %s, it is being loaded already' % path)
+            return 0
+        try:
+            return _load_spool(path, chunk_size, writer)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_spools(directory=None, chunk_size=1000, writer=write_db):
+    """Loads the spool files of all the hosts, see `load_spool`."""
+    directory = directory or settings.MONOLITH_SPOOL_DIR
+    paths = set(path[:-len('.loading')] if path.endswith('.loading')
+                else path
+                for path in glob.glob(os.path.join(directory, '*.spool')) +
+                glob.glob(os.path.join(directory, '*.spool.loading')))
+    return sum(load_spool(path, chunk_size, writer)
+               for path in sorted(paths))
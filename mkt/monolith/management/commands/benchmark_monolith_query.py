@@ -0,0 +1,63 @@
+"""
+Time the on-the-fly monolith stats over ranges of days ending today, running
+one query per day as before and a single GROUP BY query:
+
+    ./manage.py benchmark_monolith_query --days=30,365,1000
+
+"""
+import datetime
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import override_settings
+
+from mkt.monolith.resources import daterange, QueryResult, STATS
+
+
+def per_day(key, start, end):
+    """The previous computation, one aggregation query per day."""
+    stat = STATS[key]
+    qs = stat['qs'].values('addon').annotate(**stat['sums'])
+    rows = 0
+    for day in daterange(start, end):
+        next_day = day + datetime.timedelta(days=1)
+        if stat['type'] == 'total':
+            day_qs = qs.filter(created__lt=next_day)
+        else:
+            day_qs = qs.filter(created__gte=day, created__lt=next_day)
+        rows += len([stat['value'](sums) for sums in day_qs])
+    return rows
+
+
+def grouped(key, start, end):
+    return sum(1 for _ in QueryResult(key, start, end))
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--days', action='store', default='30,365,1000',
+                    help='Comma separated lengths of the ranges'),
+        make_option('--key', action='store', default=None,
+                    help='Only time this stat'),
+    )
+
+    help = __doc__
+
+    @override_settings(DEBUG=True)
+    def handle(self, *args, **kw):
+        keys = [kw['key']] if kw['key'] else sorted(STATS)
+        today = datetime.date.today()
+        for days in map(int, kw['days'].split(',')):
+            start = today - datetime.timedelta(days=days)
+            for key in keys:
+                for name, func in (('per day', per_day),
+                                   ('grouped', grouped)):
+                    reset_queries()
+                    begin = time.time()
+                    rows = func(key, start, today)
+                    self.stdout.write(
+                        '%s days, %s, %s: %s rows, %s queries, %.2fs\n' % (
+                            days, key, name, rows, len(connection.queries),
+                            time.time() - begin))
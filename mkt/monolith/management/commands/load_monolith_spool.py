@@ -0,0 +1,30 @@
+"""
+Loads the monolith records spooled by the 'spool' MONOLITH_SINK on every
+host into the database, with multi-row INSERTs.
+
+Each chunk is committed on its own: a run which failed goes on after the last
+chunk written.
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from mkt.monolith.buffer import load_spool, load_spools
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--path', action='store', default=None,
+                    help='Spool file, all of MONOLITH_SPOOL_DIR by default'),
+        make_option('--chunk-size', action='store', type='int', default=1000,
+                    help='Number of records inserted at once'),
+    )
+
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        if kw['path']:
+            total = load_spool(kw['path'], chunk_size=kw['chunk_size'])
+        else:
+            total = load_spools(chunk_size=kw['chunk_size'])
+        self.stdout.write('Loaded %s monolith records.\n' % total)
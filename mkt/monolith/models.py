@@ -1,9 +1,14 @@
+import atexit
 import datetime
 import hashlib
 import json
 
+from django.conf import settings
+from django.core.signals import request_finished
 from django.db import models
 
+from mkt.monolith import buffer
+
 
 class MonolithRecord(models.Model):
     """Data stored temporarily for monolith.
@@ -57,5 +62,15 @@ def record_stat(key, request, **data):
 
     record = MonolithRecord(key=key, user_hash=get_user_hash(request),
                             recorded=recorded, value=json.dumps(data))
-    record.save()
+    if settings.MONOLITH_SINK == 'db':
+        record.save()
+    else:
+        buffer.get_buffer().add(record)
     return record
+
+
+# Write the buffered records which have waited long enough once the response
+# is sent, and all of them when the process exits.
+request_finished.connect(buffer.flush_if_due,
+                         dispatch_uid='monolith-buffer-flush')
+atexit.register(buffer.flush)
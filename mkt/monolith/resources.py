@@ -1,8 +1,10 @@
 import datetime
+import itertools
 import json
 import logging
+import operator
 
-from django.db.models import Avg, Count
+from django.db.models import Count, Sum
 from rest_framework import serializers, status
 from rest_framework.exceptions import ParseError
 from rest_framework.generics import ListAPIView
@@ -25,36 +27,32 @@ log = logging.getLogger('z.monolith')
 
 # TODO: Move the stats that can be calculated on the fly from
 # apps/stats/tasks.py here.
+#
+# Each stat is computed per app and day from `sums`, aggregates which can be
+# added up: 'slice' stats give the `value` of the sums of each day, 'total'
+# stats the `value` of the sums from the beginning of time to each day.
 STATS = {
     'apps_ratings': {
-        'qs': Review.objects
-            .filter(editorreview=0, addon__type=amo.ADDON_WEBAPP)
-            .values('addon')
-            .annotate(count=Count('addon')),
+        'qs': Review.objects.filter(editorreview=0,
+                                    addon__type=amo.ADDON_WEBAPP),
         'type': 'slice',
-        'field_map': {
-            'count': 'count',
-            'app-id': 'addon'},
+        'sums': {'count': Count('addon')},
+        'value': operator.itemgetter('count'),
     },
     'apps_average_rating': {
-        'qs': Review.objects
-            .filter(editorreview=0, addon__type=amo.ADDON_WEBAPP)
-            .values('addon')
-            .annotate(avg=Avg('rating')),
+        # Developer replies are reviews without a rating.
+        'qs': Review.objects.filter(editorreview=0, rating__isnull=False,
+                                    addon__type=amo.ADDON_WEBAPP),
         'type': 'total',
-        'field_map': {
-            'count': 'avg',
-            'app-id': 'addon'},
+        'sums': {'ratings': Sum('rating'), 'count': Count('rating')},
+        'value': lambda sums: (float(sums['ratings'] or 0) / sums['count']
+                               if sums['count'] else None),
     },
     'apps_abuse_reports': {
-        'qs': AbuseReport.objects
-            .filter(addon__type=amo.ADDON_WEBAPP)
-            .values('addon')
-            .annotate(count=Count('addon')),
+        'qs': AbuseReport.objects.filter(addon__type=amo.ADDON_WEBAPP),
         'type': 'slice',
-        'field_map': {
-            'count': 'count',
-            'app-id': 'addon'},
+        'sums': {'count': Count('addon')},
+        'value': operator.itemgetter('count'),
     }
 }
 
@@ -75,44 +73,99 @@ class MonolithSerializer(serializers.ModelSerializer):
         return json.loads(value)
 
 
-def _get_query_result(key, start, end):
-    # To do on-the-fly queries we have to produce results as if they
-    # were calculated daily, which means we need to iterate over each
-    # day in the range and perform an aggregation on this date.
+class QueryResult(object):
+    """
+    The results of an on-the-fly stat for each day in [start, end), as if
+    they were calculated daily.
+
+    The stat is aggregated by day and app in a single GROUP BY query, plus one
+    for the sums before `start` of 'total' stats, which are then accumulated
+    day by day. The results are generated as they are iterated or sliced, so
+    a page of a long range doesn't build the whole list.
+    """
+
+    def __init__(self, key, start, end):
+        self.key = key
+        self.stat = STATS[key]
+        self.start = start
+        self.end = end
+        self._rows = None
+        self._initial_sums = None
+
+    def group_by_day(self):
+        """Returns the {day: [(app, sums)]} of the stat in [start, end)."""
+        if self._rows is None:
+            qs = self.stat['qs']
+            day = 'DATE(%s.created)' % qs.model._meta.db_table
+            qs = (qs.filter(created__gte=self.start,
+                            created__lt=self.end)
+                    .extra(select={'day': day})
+                    .values('day', 'addon')
+                    .annotate(**self.stat['sums'])
+                    .order_by('day', 'addon'))
+            self._rows = {}
+            for row in qs:
+                self._rows.setdefault(row.pop('day'), []).append(
+                    (row.pop('addon'), row))
+        return self._rows
+
+    def initial_sums(self):
+        """Returns the {app: sums} of a 'total' stat before start."""
+        if self._initial_sums is None:
+            qs = (self.stat['qs'].filter(created__lt=self.start)
+                                 .values('addon')
+                                 .annotate(**self.stat['sums'])
+                                 .order_by())
+            self._initial_sums = dict((row.pop('addon'), row) for row in qs)
+        return self._initial_sums
+
+    def days(self):
+        """Yields (day, [(app, sums)]) for each day of the range."""
+        rows = self.group_by_day()
+        if self.stat['type'] != 'total':
+            for day in daterange(self.start, self.end):
+                yield day, rows.get(day, [])
+            return
+
+        totals = dict((app, dict(sums))
+                      for app, sums in self.initial_sums().items())
+        for day in daterange(self.start, self.end):
+            for app, sums in rows.get(day, []):
+                if app in totals:
+                    for name, value in sums.items():
+                        # SUM() is NULL when there is nothing to add up.
+                        totals[app][name] = ((totals[app][name] or 0) +
+                                             (value or 0))
+                else:
+                    totals[app] = dict(sums)
+            yield day, sorted(totals.items())
+
+    def __iter__(self):
+        value = self.stat['value']
+        for day, apps in self.days():
+            for app, sums in apps:
+                yield {'key': self.key,
+                       'recorded': day,
+                       'user_hash': None,
+                       'value': {'count': value(sums), 'app-id': app}}
+
+    def __len__(self):
+        return sum(len(apps) for day, apps in self.days())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(itertools.islice(self, index.start, index.stop,
+                                         index.step))
+        return next(itertools.islice(self, index, None))
 
-    data = []
-    today = datetime.date.today()
-    stat = STATS[key]
 
+def _get_query_result(key, start, end):
     # Choose start and end dates that make sense if none provided.
     if not start:
         raise ParseError('`start` was not provided')
     if not end:
-        end = today
-
-    for day in daterange(start, end):
-        if stat['type'] == 'total':
-            # If it's a totalling queryset, we want to filter by the
-            # end date until the beginning of time to get the total
-            # objects up until this point in time.
-            date_filtered = stat['qs'].filter(
-                created__lt=(day + datetime.timedelta(days=1)))
-        else:
-            # Otherwise, we want to filter by both start/end to get
-            # counts on a specific day.
-            date_filtered = stat['qs'].filter(
-                created__gte=day,
-                created__lt=(day + datetime.timedelta(days=1)))
-
-        data.extend([{
-            'key': key,
-            'recorded': day,
-            'user_hash': None,
-            'value': {'count': d.get(stat['field_map']['count']),
-                      'app-id': d.get(stat['field_map']['app-id'])}}
-            for d in date_filtered])
-
-    return data
+        end = datetime.date.today()
+    return QueryResult(key, start, end)
 
 
 class MonolithView(CORSMixin, MarketplaceView, ListAPIView):
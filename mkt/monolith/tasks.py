@@ -0,0 +1,14 @@
+import commonware.log
+from celeryutils import task
+
+from mkt.monolith.buffer import from_row, write_db
+
+
+log = commonware.log.getLogger('z.task')
+
+
+@task
+def write_records(rows, **kw):
+    """Writes the monolith records handed over by the buffer."""
+    log.info('Writing %s monolith records.' % len(rows))
+    write_db([from_row(row) for row in rows])
@@ -1,20 +1,29 @@
 import datetime
+import fcntl
 import json
+import os
+import shutil
+import tempfile
 import uuid
 from collections import namedtuple
 
 import mock
 from nose.tools import eq_, ok_
 
+from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.test import client
 
-from amo.tests import TestCase
+from amo.tests import app_factory, TestCase
 from mkt.api.tests.test_oauth import RestOAuth
 from mkt.site.fixtures import fixture
 
+from . import buffer
+from reviews.models import Review
+from users.models import UserProfile
+
 from .models import MonolithRecord, record_stat
-from .resources import daterange
+from .resources import daterange, QueryResult, STATS
 
 
 class RequestFactory(client.RequestFactory):
@@ -66,6 +75,159 @@ class TestModels(TestCase):
             record_stat('app.install', self.request)
 
 
+class TestRecordBuffer(TestCase):
+
+    def setUp(self):
+        super(TestRecordBuffer, self).setUp()
+        self.request = RequestFactory()
+        self.written = []
+        self.buffer = buffer.RecordBuffer(self.written.extend, size=3,
+                                          interval=60, max_size=5)
+
+    def record(self, value=1):
+        return MonolithRecord(key='app.install', user_hash='a',
+                              recorded=datetime.datetime(2014, 1, 2, 3, 4),
+                              value=json.dumps({'value': value}))
+
+    def test_flushed_when_full(self):
+        self.buffer.add(self.record())
+        self.buffer.add(self.record())
+        eq_(self.written, [])
+        self.buffer.add(self.record())
+        eq_(len(self.written), 3)
+        eq_(len(self.buffer), 0)
+
+    def test_flushed_when_due(self):
+        self.buffer.add(self.record())
+        self.buffer.last_flush -= 60
+        self.buffer.add(self.record())
+        eq_(len(self.written), 2)
+
+    @mock.patch('mkt.monolith.buffer.in_transaction', lambda: True)
+    def test_transactional_not_flushed_in_transaction(self):
+        self.buffer.transactional = True
+        for i in range(4):
+            self.buffer.add(self.record(i))
+        eq_(self.written, [])
+        # Written at the end of the request.
+        with mock.patch.object(buffer, '_buffer', self.buffer):
+            buffer.flush_if_due()
+        eq_(len(self.written), 4)
+
+    @mock.patch('mkt.monolith.buffer.in_transaction', lambda: True)
+    def test_not_transactional_flushed_in_transaction(self):
+        for i in range(3):
+            self.buffer.add(self.record(i))
+        eq_(len(self.written), 3)
+
+    @mock.patch('mkt.monolith.buffer.statsd')
+    def test_requeued_and_dropped(self, statsd):
+        self.buffer.writer = mock.Mock(side_effect=IOError)
+        for i in range(3):
+            ok_(self.buffer.add(self.record(i)))
+        # The failed records are kept for the next flush.
+        eq_(len(self.buffer), 3)
+        ok_(self.buffer.add(self.record(3)))
+        ok_(self.buffer.add(self.record(4)))
+        ok_(not self.buffer.add(self.record(5)))
+        statsd.incr.assert_called_with('monolith.buffer.dropped')
+
+        self.buffer.writer = self.written.extend
+        eq_(self.buffer.flush(), 5)
+        eq_([json.loads(r.value)['value'] for r in self.written],
+            range(5))
+
+    def test_write_db(self):
+        buffer.write_db([self.record(1), self.record(2)])
+        eq_(sorted(r.value for r in MonolithRecord.objects.all()),
+            [json.dumps({'value': 1}), json.dumps({'value': 2})])
+
+    def test_rows(self):
+        record = buffer.from_row(json.loads(json.dumps(
+            buffer.to_row(self.record()))))
+        eq_(record.recorded, datetime.datetime(2014, 1, 2, 3, 4))
+        eq_(record.value, json.dumps({'value': 1}))
+
+    def values(self, records):
+        return [json.loads(r.value)['value'] for r in records]
+
+    def test_spool(self):
+        path = tempfile.mktemp()
+        buffer.write_spool([self.record(1)], path)
+        buffer.write_spool([self.record(2)], path)
+        eq_(buffer.load_spool(path, writer=self.written.extend), 2)
+        eq_(self.values(self.written), [1, 2])
+        ok_(not os.path.exists(path))
+        ok_(not os.path.exists(path + '.loading'))
+
+    def test_spool_moved_aside(self):
+        path = tempfile.mktemp()
+        buffer.write_spool([self.record(1)], path)
+        flock = fcntl.flock
+
+        def load_first(fp, operation):
+            # The spool is moved aside to be loaded while the writer waits.
+            if operation == fcntl.LOCK_EX and not loaded:
+                loaded.append(path)
+                buffer.load_spool(path, writer=records.extend)
+            flock(fp, operation)
+
+        loaded, records = [], []
+        with mock.patch('fcntl.flock', side_effect=load_first):
+            buffer.write_spool([self.record(2)], path)
+        eq_(self.values(records), [1])
+        buffer.load_spool(path, writer=self.written.extend)
+        eq_(self.values(self.written), [2])
+
+    def test_spool_resumed(self):
+        path = tempfile.mktemp()
+        buffer.write_spool([self.record(i) for i in range(5)], path)
+
+        def fail_second(records):
+            if self.written:
+                raise IOError
+            self.written.extend(records)
+
+        with self.assertRaises(IOError):
+            buffer.load_spool(path, chunk_size=2, writer=fail_second)
+        eq_(self.values(self.written), [0, 1])
+        # Only the rows which weren't written are loaded again.
+        eq_(buffer.load_spool(path, chunk_size=2,
+                              writer=self.written.extend), 3)
+        eq_(self.values(self.written), range(5))
+        ok_(not os.path.exists(path + '.loading'))
+        ok_(not os.path.exists(path + '.loading.offset'))
+
+    def test_spool_locked(self):
+        path = tempfile.mktemp()
+        buffer.write_spool([self.record(1)], path)
+        with open(path + '.lock', 'a') as lock:
+            # Another process is loading the spool.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            eq_(buffer.load_spool(path, writer=self.written.extend), 0)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        eq_(self.written, [])
+        ok_(os.path.exists(path))
+
+    def test_spools(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        buffer.write_spool([self.record(1)],
+                           os.path.join(directory, 'a.spool'))
+        buffer.write_spool([self.record(2)],
+                           os.path.join(directory, 'b.spool'))
+        eq_(buffer.load_spools(directory, writer=self.written.extend), 2)
+        eq_(self.values(self.written), [1, 2])
+        eq_(sorted(os.listdir(directory)), ['a.spool.lock', 'b.spool.lock'])
+
+    @mock.patch.object(settings, 'MONOLITH_SINK', 'buffer')
+    @mock.patch('mkt.monolith.buffer.get_buffer')
+    def test_record_stat_buffered(self, get_buffer):
+        record = record_stat('app.install', self.request, value=1)
+        get_buffer.return_value.add.assert_called_with(record)
+        eq_(MonolithRecord.objects.count(), 0)
+
+
 class TestMonolithResource(RestOAuth):
     fixtures = fixture('user_2519')
 
@@ -226,3 +388,76 @@ class TestDateRange(TestCase):
         eq_(len(range), 7)
         eq_(range[0], self.week_ago)
         ok_(self.today not in range)
+
+
+class TestQueryResult(TestCase):
+    fixtures = fixture('user_2519')
+
+    def setUp(self):
+        self.user = UserProfile.objects.get(pk=2519)
+        self.app = app_factory()
+        self.other = app_factory()
+        self.start = datetime.date(2013, 1, 10)
+        self.end = datetime.date(2013, 1, 14)
+
+    def review(self, app, created, rating=5):
+        review = Review.objects.create(addon=app, user=self.user,
+                                       rating=rating, body='yo')
+        review.update(created=created)
+        return review
+
+    def values(self, key):
+        return [(r['recorded'].day, r['value']['app-id'],
+                 r['value']['count'])
+                for r in QueryResult(key, self.start, self.end)]
+
+    def test_slice(self):
+        self.review(self.app, datetime.datetime(2013, 1, 9, 12))
+        self.review(self.app, datetime.datetime(2013, 1, 11, 12))
+        self.review(self.app, datetime.datetime(2013, 1, 11, 13))
+        self.review(self.other, datetime.datetime(2013, 1, 13))
+        self.review(self.other, datetime.datetime(2013, 1, 14))
+        eq_(self.values('apps_ratings'),
+            [(11, self.app.pk, 2), (13, self.other.pk, 1)])
+
+    def test_total(self):
+        self.review(self.app, datetime.datetime(2013, 1, 1), rating=1)
+        self.review(self.app, datetime.datetime(2013, 1, 11), rating=4)
+        self.review(self.other, datetime.datetime(2013, 1, 12), rating=3)
+        self.review(self.app, datetime.datetime(2013, 1, 14), rating=1)
+        eq_(self.values('apps_average_rating'),
+            [(10, self.app.pk, 1.), (11, self.app.pk, 2.5),
+             (12, self.app.pk, 2.5), (12, self.other.pk, 3.),
+             (13, self.app.pk, 2.5), (13, self.other.pk, 3.)])
+
+    def test_total_replies(self):
+        review = self.review(self.app, datetime.datetime(2013, 1, 9),
+                             rating=4)
+        # Developer replies have no rating.
+        reply = Review.objects.create(addon=self.app, user=self.user,
+                                      reply_to=review, rating=None,
+                                      body='thanks')
+        reply.update(created=datetime.datetime(2013, 1, 11))
+        reply = Review.objects.create(addon=self.other, user=self.user,
+                                      rating=None, body='hi')
+        reply.update(created=datetime.datetime(2013, 1, 12))
+        eq_(self.values('apps_average_rating'),
+            [(10, self.app.pk, 4.), (11, self.app.pk, 4.),
+             (12, self.app.pk, 4.), (13, self.app.pk, 4.)])
+        eq_(STATS['apps_average_rating']['value'](
+            {'ratings': None, 'count': 0}), None)
+
+    def test_queries(self):
+        self.end = self.start + datetime.timedelta(days=365)
+        self.review(self.app, datetime.datetime(2013, 1, 1))
+        self.review(self.app, datetime.datetime(2013, 5, 1))
+        with self.assertNumQueries(2):
+            eq_(len(list(QueryResult('apps_average_rating', self.start,
+                                     self.end))), 365)
+
+    def test_slicing(self):
+        self.review(self.app, datetime.datetime(2013, 1, 1))
+        result = QueryResult('apps_average_rating', self.start, self.end)
+        eq_(len(result), 4)
+        eq_([r['recorded'].day for r in result[1:3]], [11, 12])
+        eq_(result[3]['recorded'].day, 13)
@@ -0,0 +1,69 @@
+"""
+Compares the throughput and latency of receipt signing against a local fake
+signer: with a new connection for every receipt as before, with the pooled
+signing client, and with the pooled client signing receipts concurrently.
+
+Call like:
+
+    ./manage.py benchmark_signing --receipts=500 --delay=0.02
+
+"""
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from lib.crypto import fake_signer
+from lib.crypto.receipt import SigningClient
+
+
+def percentile(timings, percent):
+    return timings[min(len(timings) - 1, int(len(timings) * percent / 100))]
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--receipts', action='store', type='int', default=500,
+                    help='Number of receipts to sign'),
+        make_option('--delay', action='store', type='float', default=0.02,
+                    help='Seconds the fake signer takes to sign a receipt'),
+        make_option('--pool-size', action='store', type='int', default=10,
+                    help='Number of connections of the pooled client'),
+    )
+
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        server, url = fake_signer.start(delay=kw['delay'])
+        receipts = [{'typ': 'purchase-receipt', 'id': k}
+                    for k in range(kw['receipts'])]
+        client = SigningClient(url, 10, pool_size=kw['pool_size'],
+                               max_pending=kw['pool_size'])
+
+        def new_connection(receipt):
+            return SigningClient(url, 10, pool_size=1).sign(receipt)
+
+        def timed(sign):
+            def inner(receipt):
+                start = time.time()
+                sign(receipt)
+                return (time.time() - start) * 1000
+            return inner
+
+        try:
+            for name, run in (
+                    ('new connection', lambda: map(timed(new_connection),
+                                                   receipts)),
+                    ('pooled', lambda: map(timed(client.sign), receipts)),
+                    ('pooled, concurrent',
+                     lambda: client.get_pool().map(timed(client.sign),
+                                                   receipts))):
+                start = time.time()
+                timings = sorted(run())
+                elapsed = time.time() - start
+                self.stdout.write(
+                    '%s: %.1f receipts/sec, p50 %.1fms, p99 %.1fms\n' % (
+                        name, len(receipts) / elapsed,
+                        percentile(timings, 50), percentile(timings, 99)))
+        finally:
+            server.shutdown()
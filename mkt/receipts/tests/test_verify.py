@@ -1,6 +1,8 @@
 # -*- coding: utf8 -*-
 import calendar
+import json
 import time
+from StringIO import StringIO
 from urllib import urlencode
 
 from django.db import connection
@@ -327,6 +329,167 @@ class TestVerify(amo.tests.TestCase):
         assert ('Cache-Control', 'no-cache') in hdrs, 'No cache header needed'
 
 
+@mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_KEY',
+                   amo.tests.AMOPaths.sample_key())
+@mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_URL', 'http://foo.com')
+class TestVerifyBatch(amo.tests.TestCase):
+    fixtures = fixture('webapp_337141', 'user_999')
+
+    def setUp(self):
+        self.addon = Addon.objects.get(pk=337141)
+        self.user = UserProfile.objects.get(pk=999)
+        self.user_data = {'user': {'type': 'directed-identifier',
+                                   'value': 'some-uuid'},
+                          'product': {'url': 'http://f.com',
+                                      'storedata': urlencode({'id': 337141})},
+                          'verify': 'https://foo.com/verifyme/',
+                          'exp': calendar.timegm(time.gmtime()) + 1000,
+                          'typ': 'purchase-receipt'}
+        self.purchase = AddonPurchase.objects.create(
+            addon=self.addon, user=self.user, uuid='some-uuid')
+
+    def receipt(self, **kw):
+        data = self.user_data.copy()
+        data.update(kw)
+        return data
+
+    @mock.patch.object(verify, 'decode_receipt')
+    def get(self, decoded, decode_receipt):
+        # The receipts are indexes into the decoded receipts.
+        decode_receipt.side_effect = lambda receipt, verifier: (
+            decoded[int(receipt)])
+        v = verify.VerifyBatch([str(k) for k in range(len(decoded))],
+                               RequestFactory().get('/verifyme/').META)
+        v.cursor = connection.cursor()
+        return v.check_full()
+
+    def test_statuses(self):
+        other = {'type': 'directed-identifier', 'value': 'other-uuid'}
+        res = self.get([self.receipt(),
+                        self.receipt(user=other),
+                        self.receipt(typ='test-receipt')])
+        eq_(res, [{'status': 'ok'},
+                  {'status': 'invalid', 'reason': 'NO_PURCHASE'},
+                  {'status': 'invalid', 'reason': 'WRONG_TYPE'}])
+
+    def test_same_as_single(self):
+        receipts = [self.receipt(),
+                    self.receipt(exp=calendar.timegm(time.gmtime()) - 1000),
+                    self.receipt(verify='https://bar.com/verifyme/')]
+        expected = []
+        for receipt in receipts:
+            with mock.patch.object(verify, 'decode_receipt') as decode:
+                decode.return_value = receipt.copy()
+                v = verify.Verify('', RequestFactory().get('/verifyme/').META)
+                v.cursor = connection.cursor()
+                expected.append(v.check_full())
+        eq_(self.get(receipts), expected)
+
+    def test_refunded(self):
+        self.purchase.update(type=amo.CONTRIB_REFUND)
+        eq_(self.get([self.receipt()]), [{'status': 'refunded'}])
+
+    def test_one_query(self):
+        other = {'type': 'directed-identifier', 'value': 'other-uuid'}
+        with self.assertNumQueries(1):
+            self.get([self.receipt(), self.receipt(user=other),
+                      self.receipt()])
+
+    def test_no_queries(self):
+        with self.assertNumQueries(0):
+            eq_(self.get([self.receipt(typ='test-receipt')])[0]['status'],
+                'invalid')
+
+    @mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_EXPIRED_SEND', True)
+    @mock.patch('services.verify.sign')
+    def test_expired_has_receipt(self, sign):
+        sign.return_value = 'new-receipt'
+        res = self.get([self.receipt(),
+                        self.receipt(exp=calendar.timegm(time.gmtime()) - 1)])
+        eq_(res, [{'status': 'ok'},
+                  {'status': 'expired', 'receipt': 'new-receipt'}])
+        eq_(sign.call_count, 1)
+
+    @mock.patch.object(utils.settings, 'SIGNING_SERVER_ACTIVE', True)
+    @mock.patch('services.verify.receipts.certs.ReceiptVerifier')
+    def test_one_verifier(self, verifier):
+        verifier.return_value.verify.return_value = True
+        v = verify.VerifyBatch(['.~' + sample, '.~' + sample],
+                               RequestFactory().get('/verifyme/').META)
+        v.cursor = connection.cursor()
+        eq_(len(v.check_full()), 2)
+        eq_(verifier.call_count, 1)
+        eq_(verifier.return_value.verify.call_count, 2)
+
+
+class TestLoadCache(amo.tests.TestCase):
+
+    def setUp(self):
+        self.load = mock.Mock(side_effect=lambda *args: object())
+        self.cache = verify.LoadCache('test', self.load, 60)
+
+    def test_get(self):
+        eq_(self.cache.get('a'), self.cache.get('a'))
+        eq_(self.load.call_count, 1)
+
+    def test_args(self):
+        first = self.cache.get('a')
+        ok_(self.cache.get('b') is not first)
+        eq_(self.load.call_count, 2)
+
+    @mock.patch('services.verify.time')
+    def test_timeout(self, time_):
+        time_.return_value = 1000
+        first = self.cache.get('a')
+        time_.return_value = 1061
+        ok_(self.cache.get('a') is not first)
+
+    def test_reload(self):
+        first = self.cache.get('a')
+        self.cache.reload()
+        ok_(self.cache.get('a') is not first)
+
+    @mock.patch.object(utils.settings, 'SIGNING_SERVER_ACTIVE', True)
+    @mock.patch('services.verify.receipts.certs.ReceiptVerifier')
+    def test_verifier(self, verifier):
+        eq_(verify.get_verifier(), verify.get_verifier())
+        eq_(verifier.call_count, 1)
+        verify.reload_certs()
+        verify.get_verifier()
+        eq_(verifier.call_count, 2)
+
+    @mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_KEY',
+                       amo.tests.AMOPaths.sample_key())
+    @mock.patch('services.verify.jwt.rsa_load')
+    def test_key(self, rsa_load):
+        verify.reload_certs()
+        for k in range(2):
+            self.assertRaises(Exception, verify.decode_receipt, 'blah')
+        rsa_load.assert_called_once_with(amo.tests.AMOPaths.sample_key())
+
+
+class TestGetBatch(amo.tests.TestCase):
+
+    def test_single(self):
+        eq_(verify.get_batch(sample), None)
+
+    def test_batch(self):
+        eq_(verify.get_batch(json.dumps([sample, sample])), [sample, sample])
+
+    def test_invalid(self):
+        for data in ('[', '[1]', '[["a"]]'):
+            self.assertRaises(ValueError, verify.get_batch, data)
+
+    @mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_VERIFY_BATCH_SIZE', 1)
+    def test_too_many(self):
+        self.assertRaises(ValueError, verify.get_batch,
+                          json.dumps([sample, sample]))
+
+    def test_receipt_check(self):
+        environ = {'wsgi.input': StringIO('[1]')}
+        eq_(verify.receipt_check(environ), (400, ''))
+
+
 class TestBase(amo.tests.TestCase):
 
     def create(self, data, request=None):
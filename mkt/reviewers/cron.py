@@ -0,0 +1,18 @@
+import commonware.log
+import cronjobs
+
+from mkt.reviewers.utils import reconcile_queue_counts
+
+cron_log = commonware.log.getLogger('mkt.reviewers.cron')
+
+
+@cronjobs.register
+def reconcile_queue_counts_cron():
+    """
+    Counts the reviewer queues again, fixing the cached counts which missed
+    changes made without signals, like queryset updates.
+    """
+    drift = reconcile_queue_counts()
+    for name, (cached, count) in sorted(drift.items()):
+        cron_log.info('Queue count of %s was %s instead of %s'
+                      % (name, cached, count))
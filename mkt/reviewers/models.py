@@ -3,7 +3,15 @@ from django.db import models
 
 import amo
 from apps.addons.models import Addon
-from apps.editors.models import CannedResponse, EscalationQueue, RereviewQueue
+from apps.editors.models import (CannedResponse, EscalationQueue,
+                                 RereviewQueue, RereviewQueueTheme)
+from files.models import File
+from versions.models import Version
+from reviews.models import Review, ReviewFlag
+
+from mkt.reviewers.utils import (APP_QUEUE_COUNTS, queue_counts_receiver,
+                                 watch_app_queues, watch_file_queues)
+from mkt.webapps.models import Geodata, Webapp
 
 
 class AppCannedResponseManager(amo.models.ManagerBase):
@@ -24,7 +32,38 @@ def cleanup_queues(sender, instance, **kwargs):
     EscalationQueue.objects.filter(addon=instance).delete()
 
 
+def connect_queue_counts():
+    """Keeps the cached reviewer queue counts up to date."""
+    receivers = (
+        (Addon, APP_QUEUE_COUNTS + ('themes', 'flagged_themes')),
+        (Webapp, APP_QUEUE_COUNTS),
+        (File, ('updates',)),
+        (Version, ('updates',)),
+        (RereviewQueue, ('rereview',)),
+        (EscalationQueue, APP_QUEUE_COUNTS),
+        (Geodata, ('region_cn',)),
+        (Review, ('moderated',)),
+        (ReviewFlag, ('moderated',)),
+        (RereviewQueueTheme, ('rereview_themes',)),
+    )
+    for sender, names in receivers:
+        uid = 'queue-counts-%s' % sender.__name__
+        # Changes of existing apps and files are watched with on_change, to
+        # only invalidate the counts when they move between queues.
+        created_only = sender in (Addon, Webapp, File)
+        models.signals.post_save.connect(
+            queue_counts_receiver(names, created_only=created_only),
+            sender=sender, weak=False, dispatch_uid=uid + '-save')
+        models.signals.post_delete.connect(
+            queue_counts_receiver(names), sender=sender, weak=False,
+            dispatch_uid=uid + '-delete')
+    Addon.on_change(watch_app_queues)
+    Webapp.on_change(watch_app_queues)
+    File.on_change(watch_file_queues)
+
+
 # Don't add this signal in if we are not in the marketplace.
 if settings.MARKETPLACE:
     models.signals.post_delete.connect(cleanup_queues, sender=Addon,
                                        dispatch_uid='queue-addon-cleanup')
+    connect_queue_counts()
@@ -1,7 +1,18 @@
 # -*- coding: utf8 -*-
+from django.core.cache import cache
+
+from mock import patch
+from nose.tools import eq_
+
+import amo
 import amo.tests
+from amo.tests import app_factory
+from editors.models import EscalationQueue, RereviewQueue
 
-from mkt.reviewers.utils import create_sort_link
+from mkt.reviewers.utils import (create_sort_link, get_queue_counts,
+                                 invalidate_pending_queue_counts,
+                                 QUEUE_COUNT_KEY, reconcile_queue_counts)
+from mkt.webapps.models import Webapp
 
 
 class TestCreateSortLink(amo.tests.TestCase):
@@ -43,3 +54,68 @@ class TestCreateSortLink(amo.tests.TestCase):
         assert 'sort=name' in link
         assert 'order=asc' in link
         assert 'text_query=Feliz+A%C3%B1o' in link
+
+
+class TestQueueCounts(amo.tests.TestCase):
+
+    def setUp(self):
+        self.app = app_factory(status=amo.STATUS_PENDING)
+        self.names = ['pending', 'rereview', 'escalated']
+
+    def counts(self):
+        return get_queue_counts(self.names)
+
+    def test_counts(self):
+        eq_(self.counts(), {'pending': 1, 'rereview': 0, 'escalated': 0})
+
+    def test_cached(self):
+        self.counts()
+        with self.assertNumQueries(0):
+            eq_(self.counts()['pending'], 1)
+
+    def test_only_missing_counted(self):
+        self.counts()
+        cache.delete(QUEUE_COUNT_KEY % 'rereview')
+        with patch.dict('mkt.reviewers.utils.QUEUE_COUNTERS',
+                        {'pending': lambda: 42, 'rereview': lambda: 7}):
+            eq_(self.counts(), {'pending': 1, 'rereview': 7, 'escalated': 0})
+
+    def test_status_change(self):
+        self.counts()
+        self.app.update(status=amo.STATUS_PUBLIC)
+        eq_(self.counts()['pending'], 0)
+
+    def test_invalidated_after_commit(self):
+        self.counts()
+        self.app.update(status=amo.STATUS_PUBLIC)
+        # Counted by another process before the change was committed.
+        cache.set(QUEUE_COUNT_KEY % 'pending', 1)
+        invalidate_pending_queue_counts(None)
+        eq_(self.counts()['pending'], 0)
+
+    def test_new_app(self):
+        self.counts()
+        app_factory(status=amo.STATUS_PENDING)
+        eq_(self.counts()['pending'], 2)
+
+    def test_escalation(self):
+        self.counts()
+        EscalationQueue.objects.create(addon=self.app)
+        eq_(self.counts(), {'pending': 0, 'rereview': 0, 'escalated': 1})
+        EscalationQueue.objects.all().delete()
+        eq_(self.counts(), {'pending': 1, 'rereview': 0, 'escalated': 0})
+
+    def test_rereview(self):
+        self.counts()
+        RereviewQueue.objects.create(addon=self.app)
+        eq_(self.counts()['rereview'], 1)
+
+    def test_reconcile(self):
+        self.counts()
+        # Queryset updates don't send signals.
+        Webapp.objects.filter(pk=self.app.pk).update(
+            status=amo.STATUS_PUBLIC)
+        eq_(self.counts()['pending'], 1)
+        eq_(reconcile_queue_counts()['pending'], (1, 0))
+        eq_(self.counts()['pending'], 0)
+        eq_(reconcile_queue_counts(), {})
@@ -1,9 +1,12 @@
 import json
+import threading
 import urllib
 from datetime import datetime
 
 from django.conf import settings
 from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import connection
 from django.utils import translation
 from django.utils.datastructures import SortedDict
 
@@ -16,9 +19,13 @@ from access import acl
 from amo.helpers import absolutify
 from amo.urlresolvers import reverse
 from amo.utils import JSONEncoder, send_mail_jinja, to_language
-from editors.models import EscalationQueue, RereviewQueue, ReviewerScore
+from addons.models import Persona
+from editors.models import (EscalationQueue, RereviewQueue,
+                            RereviewQueueTheme, ReviewerScore)
 from files.models import File
+from reviews.models import Review
 
+import mkt
 from mkt.comm.utils import create_comm_note
 from mkt.constants import comm
 from mkt.constants.features import FeatureProfile
@@ -540,7 +547,11 @@ class ReviewHelper(object):
         action = self.handler.data.get('action', '')
         if not action:
             raise NotImplementedError
-        return self.actions[action]['method']()
+        try:
+            return self.actions[action]['method']()
+        finally:
+            # Review actions update apps and files without signals.
+            invalidate_queue_counts(*APP_QUEUE_COUNTS)
 
 
 def clean_sort_param(request, date_sort='created'):
@@ -646,3 +657,168 @@ def device_queue_search(request):
         ))
     return Webapp.version_and_file_transformer(
         Webapp.objects.filter(**filters))
+
+
+# The cache key of each reviewer queue count, see `get_queue_counts()`.
+QUEUE_COUNT_KEY = 'reviewers:queue-count:%s'
+
+
+def _escalated_ids():
+    return EscalationQueue.objects.no_cache().values_list('addon', flat=True)
+
+
+def _count_pending():
+    return (Webapp.objects.no_cache()
+                  .exclude(id__in=_escalated_ids())
+                  .filter(type=amo.ADDON_WEBAPP, disabled_by_user=False,
+                          status=amo.STATUS_PENDING)
+                  .count())
+
+
+def _count_rereview():
+    return (RereviewQueue.objects.no_cache()
+                         .exclude(addon__in=_escalated_ids())
+                         .filter(addon__disabled_by_user=False)
+                         .count())
+
+
+def _count_updates():
+    # This will work as long as we disable files of existing unreviewed
+    # versions when a new version is uploaded.
+    return (File.objects.no_cache()
+                .exclude(version__addon__id__in=_escalated_ids())
+                .filter(version__addon__type=amo.ADDON_WEBAPP,
+                        version__addon__disabled_by_user=False,
+                        version__addon__is_packaged=True,
+                        version__addon__status__in=(
+                            amo.WEBAPPS_APPROVED_STATUSES),
+                        version__deleted=False,
+                        status=amo.STATUS_PENDING)
+                .count())
+
+
+def _count_escalated():
+    return (EscalationQueue.objects.no_cache()
+                           .filter(addon__disabled_by_user=False)
+                           .count())
+
+
+def _count_moderated():
+    return (Review.objects.no_cache()
+                  .filter(addon__type=amo.ADDON_WEBAPP,
+                          reviewflag__isnull=False, editorreview=True)
+                  .count())
+
+
+def _count_themes(status=amo.STATUS_PENDING):
+    return Persona.objects.no_cache().filter(addon__status=status).count()
+
+
+QUEUE_COUNTERS = {
+    'pending': _count_pending,
+    'rereview': _count_rereview,
+    'updates': _count_updates,
+    'escalated': _count_escalated,
+    'moderated': _count_moderated,
+    'themes': _count_themes,
+    'flagged_themes': lambda: _count_themes(amo.STATUS_REVIEW_PENDING),
+    'rereview_themes': lambda: RereviewQueueTheme.objects.count(),
+    'region_cn': lambda: (Webapp.objects.pending_in_region(mkt.regions.CN)
+                                .count()),
+}
+
+# The counts depending on the state of apps, which any review can change.
+APP_QUEUE_COUNTS = ('pending', 'rereview', 'updates', 'escalated',
+                    'region_cn')
+
+
+def update_queue_count(name):
+    """Counts the queue and caches its count."""
+    count = QUEUE_COUNTERS[name]()
+    cache.set(QUEUE_COUNT_KEY % name, count,
+              settings.REVIEWER_QUEUE_COUNTS_TIMEOUT)
+    return count
+
+
+def get_queue_counts(names):
+    """
+    Returns a dict of the counts of those queues, from the cache. Only the
+    queues whose count was invalidated get counted again.
+    """
+    keys = dict((QUEUE_COUNT_KEY % name, name) for name in names)
+    counts = dict((keys[key], count) for key, count
+                  in cache.get_many(keys.keys()).items())
+    for name in set(names) - set(counts):
+        counts[name] = update_queue_count(name)
+    return counts
+
+
+_pending_queue_counts = threading.local()
+
+
+def invalidate_queue_counts(*names):
+    """Makes those queues get counted again on the next read."""
+    cache.delete_many([QUEUE_COUNT_KEY % name for name in names])
+    if connection.in_atomic_block or not connection.get_autocommit():
+        # Other processes would count the queues again before the change is
+        # committed, invalidate again at the end of the request.
+        if not hasattr(_pending_queue_counts, 'names'):
+            _pending_queue_counts.names = set()
+        _pending_queue_counts.names.update(names)
+
+
+def invalidate_pending_queue_counts(sender, **kw):
+    """Invalidates the counts of the queues changed by a request."""
+    names = getattr(_pending_queue_counts, 'names', set())
+    _pending_queue_counts.names = set()
+    if names:
+        cache.delete_many([QUEUE_COUNT_KEY % name for name in names])
+
+
+request_finished.connect(invalidate_pending_queue_counts,
+                         dispatch_uid='invalidate_pending_queue_counts')
+
+
+def reconcile_queue_counts():
+    """
+    Counts all the queues again, to fix the counts of changes that didn't
+    send signals. Returns a dict of (cached, actual) counts that were off.
+    """
+    keys = [QUEUE_COUNT_KEY % name for name in QUEUE_COUNTERS]
+    cached = cache.get_many(keys)
+    drift = {}
+    for name in QUEUE_COUNTERS:
+        count = update_queue_count(name)
+        old = cached.get(QUEUE_COUNT_KEY % name)
+        if old is not None and old != count:
+            drift[name] = (old, count)
+    return drift
+
+
+def watch_app_queues(old_attr=None, new_attr=None, instance=None, **kw):
+    """on_change callback for apps and themes moving between queues."""
+    old_attr, new_attr = old_attr or {}, new_attr or {}
+    if any(old_attr.get(field) != new_attr.get(field)
+           for field in ('status', 'disabled_by_user', 'is_packaged')):
+        if instance.type == amo.ADDON_PERSONA:
+            invalidate_queue_counts('themes', 'flagged_themes')
+        else:
+            invalidate_queue_counts(*APP_QUEUE_COUNTS)
+
+
+def watch_file_queues(old_attr=None, new_attr=None, **kw):
+    """on_change callback for files of app updates."""
+    if (old_attr or {}).get('status') != (new_attr or {}).get('status'):
+        invalidate_queue_counts('updates')
+
+
+def queue_counts_receiver(names, created_only=False):
+    """
+    Returns a post_save or post_delete receiver invalidating those queue
+    counts, only for new objects if `created_only`.
+    """
+    def receiver(sender, **kw):
+        if kw.get('raw') or (created_only and not kw.get('created')):
+            return
+        invalidate_queue_counts(*names)
+    return receiver
@@ -25,7 +25,7 @@ import amo
 from abuse.models import AbuseReport
 from access import acl
 from addons.decorators import addon_view
-from addons.models import AddonDeviceType, Persona, Version
+from addons.models import AddonDeviceType, Version
 from addons.signals import version_changed
 from amo.decorators import (any_permission_required, json_view,
                             permission_required)
@@ -37,7 +37,7 @@ from amo.utils import (escape_all, HttpResponseSendFile, JSONEncoder, paginate,
 from devhub.models import ActivityLog, ActivityLogAttachment
 from editors.forms import MOTDForm
 from editors.models import (EditorSubscription, EscalationQueue, RereviewQueue,
-                            RereviewQueueTheme, ReviewerScore)
+                            ReviewerScore)
 from editors.views import reviewer_required
 from files.models import File
 from lib.crypto.packaged import SigningError
@@ -48,12 +48,11 @@ from translations.query import order_by_translation
 from users.models import UserProfile
 from zadmin.models import set_config, unmemoized_get_config
 
-import mkt
 from mkt.comm.forms import CommAttachmentFormSet
 from mkt.regions.utils import parse_region
 from mkt.reviewers.forms import ApiReviewersSearchForm
 from mkt.reviewers.utils import (AppsReviewing, clean_sort_param,
-                                 device_queue_search)
+                                 device_queue_search, get_queue_counts)
 from mkt.site import messages
 from mkt.site.helpers import product_as_dict
 from mkt.submit.forms import AppFeaturesForm
@@ -100,55 +99,11 @@ def home(request):
 
 
 def queue_counts(request):
-    excluded_ids = EscalationQueue.objects.no_cache().values_list('addon',
-                                                                  flat=True)
-    public_statuses = amo.WEBAPPS_APPROVED_STATUSES
-
-    counts = {
-        'pending': Webapp.objects.no_cache()
-                         .exclude(id__in=excluded_ids)
-                         .filter(type=amo.ADDON_WEBAPP,
-                                 disabled_by_user=False,
-                                 status=amo.STATUS_PENDING)
-                         .count(),
-        'rereview': RereviewQueue.objects.no_cache()
-                                 .exclude(addon__in=excluded_ids)
-                                 .filter(addon__disabled_by_user=False)
-                                 .count(),
-        # This will work as long as we disable files of existing unreviewed
-        # versions when a new version is uploaded.
-        'updates': File.objects.no_cache()
-                       .exclude(version__addon__id__in=excluded_ids)
-                       .filter(version__addon__type=amo.ADDON_WEBAPP,
-                               version__addon__disabled_by_user=False,
-                               version__addon__is_packaged=True,
-                               version__addon__status__in=public_statuses,
-                               version__deleted=False,
-                               status=amo.STATUS_PENDING)
-                       .count(),
-        'escalated': EscalationQueue.objects.no_cache()
-                                    .filter(addon__disabled_by_user=False)
-                                    .count(),
-        'moderated': Review.objects.no_cache().filter(
-                                            addon__type=amo.ADDON_WEBAPP,
-                                            reviewflag__isnull=False,
-                                            editorreview=True)
-                                    .count(),
-
-        'themes': Persona.objects.no_cache()
-                                 .filter(addon__status=amo.STATUS_PENDING)
-                                 .count(),
-
-        'region_cn': Webapp.objects.pending_in_region(mkt.regions.CN).count(),
-    }
-
+    names = ['pending', 'rereview', 'updates', 'escalated', 'moderated',
+             'themes', 'region_cn']
     if acl.action_allowed(request, 'SeniorPersonasTools', 'View'):
-        counts.update({
-            'flagged_themes': (Persona.objects.no_cache()
-                               .filter(addon__status=amo.STATUS_REVIEW_PENDING)
-                               .count()),
-            'rereview_themes': RereviewQueueTheme.objects.count()
-        })
+        names += ['flagged_themes', 'rereview_themes']
+    counts = get_queue_counts(names)
 
     if 'pro' in request.GET:
         counts.update({'device': device_queue_search(request).count()})
@@ -1,7 +1,13 @@
+import hashlib
 import json
+import time
 
+from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponse
 
+import commonware.log
+from django_statsd.clients import statsd
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.generics import GenericAPIView
@@ -9,6 +15,7 @@ from rest_framework.generics import GenericAPIView
 from translations.helpers import truncate
 
 import mkt
+from amo.utils import cache_ns_key
 from mkt.api.authentication import (RestSharedSecretAuthentication,
                                     RestOAuthAuthentication)
 from mkt.api.base import CORSMixin, form_errors, MarketplaceView
@@ -18,16 +25,20 @@ from mkt.collections.constants import (COLLECTIONS_TYPE_BASIC,
                                        COLLECTIONS_TYPE_OPERATOR)
 from mkt.collections.filters import CollectionFilterSetWithFallback
 from mkt.collections.models import Collection
+from mkt.carriers import get_carrier
 from mkt.collections.serializers import CollectionSerializer
 from mkt.features.utils import get_feature_profile
 from mkt.search.views import _filter_search
 from mkt.search.forms import ApiSearchForm
 from mkt.search.serializers import (ESAppSerializer, RocketbarESAppSerializer,
                                     SuggestionsESAppSerializer)
-from mkt.search.utils import S
+from mkt.search.utils import FEATURED_CACHE_NAMESPACE, S
 from mkt.webapps.models import Webapp, WebappIndexer
 
 
+log = commonware.log.getLogger('z.search')
+
+
 class SearchView(CORSMixin, MarketplaceView, GenericAPIView):
     cors_allowed_methods = ['get']
     authentication_classes = [RestSharedSecretAuthentication,
@@ -95,13 +106,85 @@ class FeaturedSearchView(SearchView):
         return serializer.data, getattr(qs, 'filter_fallback', None)
 
     def get(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        if key is None:
+            data, headers = self.get_data(request)
+        else:
+            data, headers = self.get_cached_data(request, key)
+        response = Response(data)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def get_data(self, request):
         serializer, _ = self.search(request)
         data, filter_fallbacks = self.add_featured_etc(request,
                                                        serializer.data)
-        response = Response(data)
-        for name, value in filter_fallbacks.items():
-            response['API-Fallback-%s' % name] = ','.join(value)
-        return response
+        headers = dict(('API-Fallback-%s' % name, ','.join(value))
+                       for name, value in filter_fallbacks.items())
+        return data, headers
+
+    def get_cache_key(self, request):
+        """
+        Returns the cache key of the response, made of the filters of the
+        API-Filter header and the query, or None if the response is for a
+        user and can't be cached.
+        """
+        if getattr(request, 'amo_user', None):
+            return None
+        region = self.get_region_from_request(request)
+        filters = (
+            ('carrier', get_carrier() or ''),
+            ('device', [d for d in ('GAIA', 'MOBILE', 'TABLET')
+                        if getattr(request, d, False)]),
+            ('host', request.get_host()),
+            ('lang', getattr(request, 'LANG', '')),
+            ('region', region.slug if region else ''),
+            ('query', sorted(request.GET.lists())),
+        )
+        return '%s:%s' % (FEATURED_CACHE_NAMESPACE,
+                          hashlib.md5(repr(filters)).hexdigest())
+
+    def get_cached_data(self, request, key):
+        """
+        Returns the data and headers of the response from the cache, or
+        caches them.
+
+        Once stale, after CACHE_SEARCH_FEATURED_API_TIMEOUT or when the
+        collections or the index change, they are still served for up to
+        CACHE_SEARCH_FEATURED_API_STALE seconds while a single request
+        refreshes them, or if refreshing them fails.
+        """
+        generation = cache_ns_key(FEATURED_CACHE_NAMESPACE)
+        cached = cache.get(key)
+        if cached:
+            cached_generation, expires, data, headers = cached
+            if cached_generation == generation and expires > time.time():
+                statsd.incr('search.featured.cache.hit')
+                return data, headers
+            if not cache.add(key + ':refresh', 1,
+                             settings.CACHE_SEARCH_FEATURED_API_STALE):
+                # Another request is already refreshing it.
+                statsd.incr('search.featured.cache.stale')
+                return data, headers
+
+        statsd.incr('search.featured.cache.miss')
+        try:
+            data, headers = self.get_data(request)
+        except Exception:
+            if not cached:
+                raise
+            log.error('Refreshing featured search failed, serving stale',
+                      exc_info=True)
+            return cached[2:]
+        finally:
+            if cached:
+                cache.delete(key + ':refresh')
+
+        timeout = settings.CACHE_SEARCH_FEATURED_API_TIMEOUT
+        cache.set(key, (generation, time.time() + timeout, data, headers),
+                  timeout + settings.CACHE_SEARCH_FEATURED_API_STALE)
+        return data, headers
 
     def add_featured_etc(self, request, data):
         types = (
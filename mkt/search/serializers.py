@@ -14,6 +14,7 @@ from versions.models import Version
 import mkt
 from mkt.api.fields import ESTranslationSerializerField
 from mkt.submit.serializers import SimplePreviewSerializer
+from mkt.webapps.exclusions import get_exclusions
 from mkt.webapps.models import Geodata, Webapp
 from mkt.webapps.utils import (dehydrate_content_rating,
                                dehydrate_descriptors,
@@ -70,6 +71,7 @@ class ESAppSerializer(AppSerializer):
         """
         if self._data is None:
             if self.many:
+                self.add_user_app_state(self.object)
                 self._data = [self.to_native(item) for item in self.object]
             else:
                 self._data = self.to_native(self.object)
@@ -79,8 +81,12 @@ class ESAppSerializer(AppSerializer):
         # DRF's field_to_native calls .all(), which we want to avoid, so we
         # provide a simplified version that doesn't and just iterates on the
         # object list.
+        self.add_user_app_state(obj.object_list)
         return [self.to_native(item) for item in obj.object_list]
 
+    def get_app_id(self, obj):
+        return obj._source['id']
+
     def to_native(self, obj):
         app = self.create_fake_app(obj._source)
         return super(ESAppSerializer, self).to_native(app)
@@ -172,7 +178,11 @@ class ESAppSerializer(AppSerializer):
         if upsell:
             region_id = self.context['request'].REGION.id
             exclusions = upsell.get('region_exclusions')
-            if exclusions is not None and region_id not in exclusions:
+            # The indexed exclusions can be older than the upsell app's, so
+            # check the current ones too.
+            if (exclusions is not None and region_id not in exclusions and
+                    not get_exclusions().is_excluded(region_id,
+                                                     upsell['id'])):
                 upsell['resource_uri'] = reverse('app-detail',
                     kwargs={'pk': upsell['id']})
             else:
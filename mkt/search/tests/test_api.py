@@ -34,7 +34,7 @@ from mkt.regions.middleware import RegionMiddleware
 from mkt.search.api import SearchView
 from mkt.search.serializers import SimpleESAppSerializer
 from mkt.search.forms import DEVICE_CHOICES_IDS
-from mkt.search.utils import S
+from mkt.search.utils import invalidate_featured_cache, S
 from mkt.search.views import DEFAULT_SORTING
 from mkt.site.fixtures import fixture
 from mkt.webapps.models import Installed, Webapp, WebappIndexer
@@ -966,6 +966,78 @@ class TestFeaturedApps(TestFeaturedCollections):
     prop_name = 'featured'
 
 
+class TestFeaturedCache(BaseFeaturedTests):
+
+    def setUp(self):
+        super(TestFeaturedCache, self).setUp()
+        self.data = ({'objects': []}, {'API-Fallback-featured': 'region'})
+
+    def make_request(self, client=None):
+        res = (client or self.anon).get(self.list_url, self.qs)
+        eq_(res.status_code, 200)
+        return res
+
+    @patch('mkt.search.api.FeaturedSearchView.get_data')
+    def test_cached(self, get_data):
+        get_data.return_value = self.data
+        self.make_request()
+        res = self.make_request()
+        eq_(get_data.call_count, 1)
+        eq_(res.json, {'objects': []})
+        eq_(res['API-Fallback-featured'], 'region')
+
+    @patch('mkt.search.api.FeaturedSearchView.get_data')
+    def test_query_in_key(self, get_data):
+        get_data.return_value = self.data
+        self.make_request()
+        self.qs['cat'] = 'other'
+        self.make_request()
+        eq_(get_data.call_count, 2)
+
+    @patch('mkt.search.api.FeaturedSearchView.get_data')
+    def test_not_cached_for_users(self, get_data):
+        get_data.return_value = self.data
+        self.make_request(self.client)
+        self.make_request(self.client)
+        eq_(get_data.call_count, 2)
+
+    @patch('mkt.search.api.FeaturedSearchView.get_data')
+    def test_refreshed_when_collection_saved(self, get_data):
+        get_data.return_value = self.data
+        self.make_request()
+        Collection.objects.create(
+            name='Hi', description='Mom',
+            collection_type=COLLECTIONS_TYPE_BASIC, category=self.cat,
+            is_public=True)
+        get_data.return_value = ({'objects': [1]}, {})
+        res = self.make_request()
+        eq_(get_data.call_count, 2)
+        eq_(res.json, {'objects': [1]})
+        ok_('API-Fallback-featured' not in res)
+
+    @patch('mkt.search.api.FeaturedSearchView.get_data')
+    def test_stale_while_refreshing(self, get_data):
+        get_data.return_value = self.data
+        self.make_request()
+        invalidate_featured_cache()
+        with patch('mkt.search.api.cache.add') as add:
+            # Another request holds the refresh lock.
+            add.return_value = False
+            res = self.make_request()
+        eq_(get_data.call_count, 1)
+        eq_(res.json, {'objects': []})
+
+    @patch('mkt.search.api.FeaturedSearchView.get_data')
+    def test_stale_when_refresh_fails(self, get_data):
+        get_data.return_value = self.data
+        self.make_request()
+        invalidate_featured_cache()
+        get_data.side_effect = ValueError
+        res = self.make_request()
+        eq_(get_data.call_count, 2)
+        eq_(res.json, {'objects': []})
+
+
 @patch.object(settings, 'SITE_URL', 'http://testserver')
 class TestSuggestionsApi(ESTestCase):
     fixtures = fixture('webapp_337141')
@@ -1,6 +1,12 @@
 from elasticutils.contrib.django import S as eu_S
 from statsd import statsd
 
+from amo.utils import cache_ns_key
+
+
+# The namespace of the cached /search/featured/ responses.
+FEATURED_CACHE_NAMESPACE = 'search:featured'
+
 
 class S(eu_S):
 
@@ -9,3 +15,11 @@ class S(eu_S):
             hits = super(S, self).raw()
             statsd.timing('search.took', hits['took'])
             return hits
+
+
+def invalidate_featured_cache(*args, **kw):
+    """
+    Makes the cached /search/featured/ responses stale, they are served
+    until they get refreshed, see `FeaturedSearchView`.
+    """
+    cache_ns_key(FEATURED_CACHE_NAMESPACE, increment=True)
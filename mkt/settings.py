@@ -159,6 +159,7 @@ CELERY_ROUTES.update({
     # Images.
     'mkt.developers.tasks.resize_icon': {'queue': 'images'},
     'mkt.developers.tasks.resize_preview': {'queue': 'images'},
+    'mkt.developers.tasks.pngcrush_images': {'queue': 'images'},
 })
 
 # Paths.
@@ -220,6 +221,12 @@ MINIFY_MOZMARKET = True
 GEOIP_URL = ''
 GEOIP_DEFAULT_VAL = 'restofworld'
 GEOIP_DEFAULT_TIMEOUT = .2
+# A local database of IP ranges, see the build_geoip_db command. When set,
+# it is used before the GeoIP server, which is only asked about addresses
+# that are not in it.
+GEOIP_DB_PATH = ''
+# How many lookups in the local database are kept in memory.
+GEOIP_CACHE_SIZE = 10000
 
 SENTRY_DSN = None
 
@@ -0,0 +1,68 @@
+"""
+Measures lookups per second of the local GeoIP database, with and without
+the LRU cache, and the memory taken by loading it.
+
+Call like:
+
+    ./manage.py benchmark_geoip --lookups=100000
+
+"""
+import random
+import resource
+import socket
+import struct
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from lib.geoip import GeoIP
+
+
+def rss():
+    """Returns the peak resident memory of the process, in KB on Linux."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--lookups', action='store', type='int', default=100000,
+                    help='Number of lookups'),
+        make_option('--addresses', action='store', type='int',
+                    default=10000,
+                    help='Number of distinct addresses looked up'),
+    )
+
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        if not settings.GEOIP_DB_PATH:
+            raise CommandError('GEOIP_DB_PATH is not set.')
+
+        before = rss()
+        geoip = GeoIP(settings)
+        if not geoip.db:
+            raise CommandError('Could not load %s.' % settings.GEOIP_DB_PATH)
+        # Touch every page, as lookups would over time.
+        sum(ord(geoip.db.map[i]) for i in xrange(0, len(geoip.db.map), 4096))
+        self.stdout.write('Loaded %s ranges, %s KB, resident memory grew by '
+                          '%s KB\n' % (geoip.db.count,
+                                       len(geoip.db.map) / 1024,
+                                       rss() - before))
+
+        addresses = [
+            socket.inet_ntoa(struct.pack('>I', random.getrandbits(32)))
+            for i in xrange(kw['addresses'])]
+        lookups = [random.choice(addresses) for i in xrange(kw['lookups'])]
+
+        for name, size in (('uncached', 0),
+                           ('cached', settings.GEOIP_CACHE_SIZE)):
+            geoip.cache.size = size
+            geoip.cache.entries.clear()
+            start = time.time()
+            for address in lookups:
+                geoip.lookup_local(address)
+            elapsed = time.time() - start
+            self.stdout.write('%s: %.0f lookups/sec\n' % (
+                name, len(lookups) / elapsed))
@@ -0,0 +1,32 @@
+"""
+Builds the local GeoIP database used when GEOIP_DB_PATH is set, from a
+MaxMind GeoIP country CSV file.
+
+Call like:
+
+    ./manage.py build_geoip_db GeoIPCountryWhois.csv /data/geoip.db
+
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lib.geoip import build_database, read_csv
+
+
+class Command(BaseCommand):
+    args = '<csv file> <database file>'
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        if len(args) != 2:
+            raise CommandError('A CSV file and a database file are required.')
+
+        src, dest = args
+        # Write it aside and then move it, so that running processes never
+        # map a partly written file.
+        tmp = dest + '.tmp'
+        with open(src, 'rb') as fp:
+            count = build_database(read_csv(fp), tmp)
+        os.rename(tmp, dest)
+        self.stdout.write('Wrote %s ranges to %s\n' % (count, dest))
@@ -17,7 +17,8 @@ from amo.utils import no_translation
 from constants.payments import PROVIDER_BANGO
 from files.models import FileUpload, Platform
 from lib.metrics import record_action
-from market.models import AddonPremium, Price
+from market.models import AddonPremium, AddonPurchase, Price
+from translations import loader as translations_loader
 
 import mkt
 from mkt.api.authentication import (RestAnonymousAuthentication,
@@ -37,7 +38,8 @@ from mkt.regions import get_region
 from mkt.submit.api import PreviewViewSet
 from mkt.submit.forms import mark_for_rereview
 from mkt.submit.serializers import PreviewSerializer, SimplePreviewSerializer
-from mkt.webapps.models import AppFeatures, get_excluded_in, Webapp
+from mkt.webapps.models import (API_PREFETCH, AppFeatures, get_excluded_in,
+                                Installed, Webapp)
 
 
 log = commonware.log.getLogger('z.api')
@@ -79,6 +81,65 @@ class SemiSerializerMethodField(serializers.SerializerMethodField):
         into[field_name] = data.get(field_name, None)
 
 
+class UserAppState(object):
+    """
+    The developed, installed and purchased state of apps for a user.
+
+    Serializers `add()` all the apps of a response, which get loaded in three
+    queries on the first `get()`. Use `for_request()` to share it in a
+    request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.pending = set()
+        self.loaded = set()
+        self.developed = set()
+        self.installed = set()
+        self.purchased = set()
+
+    @classmethod
+    def for_request(cls, request):
+        """Returns the state of the request user, or None if anonymous."""
+        user = getattr(request, 'amo_user', None)
+        if not user:
+            return None
+        state = getattr(request, '_user_app_state', None)
+        if state is None or state.user != user:
+            state = cls(user)
+            request._user_app_state = state
+        return state
+
+    def add(self, ids):
+        """Adds apps to load on the next `get()`."""
+        self.pending.update(ids)
+
+    def load(self):
+        ids = self.pending - self.loaded
+        self.pending = set()
+        if not ids:
+            return
+        self.developed.update(AddonUser.objects.filter(
+            user=self.user, role=amo.AUTHOR_ROLE_OWNER,
+            addon__in=ids).values_list('addon', flat=True))
+        self.installed.update(Installed.objects.filter(
+            user=self.user, addon__in=ids).values_list('addon', flat=True))
+        self.purchased.update(AddonPurchase.objects.filter(
+            user=self.user, type=amo.CONTRIB_PURCHASE,
+            addon__in=ids).values_list('addon', flat=True))
+        self.loaded.update(ids)
+
+    def get(self, app_id):
+        if app_id not in self.loaded:
+            self.pending.add(app_id)
+            self.load()
+        return {
+            'developed': app_id in self.developed,
+            'installed': app_id in self.installed,
+            'purchased': app_id in self.purchased,
+        }
+
+
 class AppSerializer(serializers.ModelSerializer):
     app_type = serializers.ChoiceField(
         choices=amo.ADDON_WEBAPP_TYPES_LOOKUP.items(), read_only=True)
@@ -151,6 +212,38 @@ class AppSerializer(serializers.ModelSerializer):
             'status', 'support_email', 'support_url', 'supported_locales',
             'tags', 'upsell', 'upsold', 'user', 'versions', 'weekly_downloads']
 
+    @property
+    def data(self):
+        if self._data is None and self.many:
+            self.add_user_app_state(self.object)
+            translations_loader.prefetch(self.Meta.model, self.object)
+        return super(AppSerializer, self).data
+
+    def field_to_native(self, obj, field_name):
+        # Paginated lists are serialized from here rather than from `data`.
+        if not self.many or self.source == '*':
+            return super(AppSerializer, self).field_to_native(obj,
+                                                              field_name)
+        objs = getattr(obj, self.source or field_name)
+        if objs is None:
+            return None
+        objs = list(objs)
+        self.add_user_app_state(objs)
+        translations_loader.prefetch(self.Meta.model, objs)
+        return [self.to_native(item) for item in objs]
+
+    def get_app_id(self, obj):
+        return obj.pk
+
+    def add_user_app_state(self, objs):
+        """
+        Adds all the apps being serialized to the `UserAppState`, so that the
+        user info is loaded for all of them at once.
+        """
+        state = UserAppState.for_request(self.context.get('request'))
+        if state is not None and 'user' in self.fields:
+            state.add(self.get_app_id(obj) for obj in objs)
+
     def _get_region_id(self):
         request = self.context.get('request')
         REGION = getattr(request, 'REGION', None)
@@ -243,14 +336,9 @@ class AppSerializer(serializers.ModelSerializer):
             return False
 
     def get_user_info(self, app):
-        user = getattr(self.context.get('request'), 'amo_user', None)
-        if user:
-            return {
-                'developed': app.addonuser_set.filter(
-                    user=user, role=amo.AUTHOR_ROLE_OWNER).exists(),
-                'installed': app.has_installed(user),
-                'purchased': app.pk in user.purchase_ids(),
-            }
+        state = UserAppState.for_request(self.context.get('request'))
+        if state is not None:
+            return state.get(app.pk)
 
     def get_versions(self, app):
         # Disable transforms, we only need two fields: version and pk.
@@ -312,6 +400,9 @@ class AppSerializer(serializers.ModelSerializer):
         for c in to_remove:
             obj.addoncategory_set.filter(category=c).delete()
 
+        # Forget about the categories prefetched with the app, if any.
+        getattr(obj, '_prefetched_objects_cache', {}).pop('categories', None)
+
     def save_upsold(self, obj, upsold):
         current_upsell = obj.upsold
         if upsold and upsold != obj.upsold.free:
@@ -414,11 +505,11 @@ class AppViewSet(CORSMixin, SlugOrIdMixin, MarketplaceView,
                               RestAnonymousAuthentication]
 
     def get_queryset(self):
-        return Webapp.objects.all().exclude(
+        return Webapp.objects.with_related(*API_PREFETCH).exclude(
             id__in=get_excluded_in(get_region().id))
 
     def get_base_queryset(self):
-        return Webapp.objects.all()
+        return Webapp.objects.with_related(*API_PREFETCH)
 
     def get_object(self, queryset=None):
         try:
@@ -0,0 +1,135 @@
+"""
+Fetches the manifests of many hosted apps at once, for `update_manifests`.
+
+The manifests are fetched by a pool of MANIFEST_CRAWLER_WORKERS threads. At
+most MANIFEST_CRAWLER_HOST_CONCURRENCY requests go to the same host at a
+time, started at least MANIFEST_CRAWLER_HOST_INTERVAL seconds apart, and the
+apps are interleaved by host so that a slow host doesn't hold every worker.
+
+The ETag and Last-Modified of the manifests fetched before are sent back, so
+that the servers can tell the manifests which didn't change without sending
+them again.
+"""
+import collections
+import contextlib
+import sys
+import threading
+import time
+import urlparse
+from itertools import izip_longest
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+
+from mkt.developers.tasks import ManifestNotModified
+
+
+class FetchResult(object):
+    """
+    The outcome of fetching the manifest at `url`: its `content`, or
+    `not_modified`, or the `exc_info` of the error. `validators` are the ones
+    of the manifest fetched.
+    """
+
+    def __init__(self, url, content=None, not_modified=False, exc_info=None,
+                 validators=None):
+        self.url = url
+        self.content = content
+        self.not_modified = not_modified
+        self.exc_info = exc_info
+        self.validators = validators
+
+    @property
+    def error(self):
+        return self.exc_info[1] if self.exc_info else None
+
+
+def get_host(url):
+    return urlparse.urlparse(url).netloc.lower()
+
+
+class HostLimiter(object):
+    """Limits the concurrency and the rate of the requests to each host."""
+
+    def __init__(self, concurrency, interval):
+        self.concurrency = concurrency
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.next_start = {}
+
+    @contextlib.contextmanager
+    def slot(self, url):
+        host = get_host(url)
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(
+                    self.concurrency)
+            semaphore = self.semaphores[host]
+
+        with semaphore:
+            with self.lock:
+                now = time.time()
+                start = max(now, self.next_start.get(host, 0))
+                self.next_start[host] = start + self.interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+def interleave(jobs):
+    """Reorders `jobs`, (key, url, validators), one host after the other."""
+    hosts = collections.OrderedDict()
+    for job in jobs:
+        hosts.setdefault(get_host(job[1]), []).append(job)
+    return [job for row in izip_longest(*hosts.values())
+            for job in row if job is not None]
+
+
+class ManifestCrawler(object):
+    """
+    Fetches manifests with `fetch(url, validators)`, which returns the
+    manifest, raises `ManifestNotModified` or fails with any exception, and
+    updates `validators` with the ones of the manifest fetched.
+    """
+
+    def __init__(self, fetch, workers=None, host_concurrency=None,
+                 host_interval=None):
+        self._fetch = fetch
+        self.workers = workers or settings.MANIFEST_CRAWLER_WORKERS
+        self.limiter = HostLimiter(
+            host_concurrency or settings.MANIFEST_CRAWLER_HOST_CONCURRENCY,
+            settings.MANIFEST_CRAWLER_HOST_INTERVAL
+            if host_interval is None else host_interval)
+
+    def fetch(self, url, validators=None):
+        """Fetches the manifest at `url` and returns a `FetchResult`."""
+        validators = dict(validators or {})
+        try:
+            with self.limiter.slot(url):
+                content = self._fetch(url, validators)
+        except ManifestNotModified:
+            return FetchResult(url, not_modified=True, validators=validators)
+        except Exception:
+            return FetchResult(url, exc_info=sys.exc_info())
+        return FetchResult(url, content=content, validators=validators)
+
+    def _fetch_job(self, job):
+        key, url, validators = job
+        return key, self.fetch(url, validators)
+
+    def crawl(self, jobs):
+        """
+        Fetches the manifests of `jobs`, (key, url, validators), concurrently
+        and returns {key: `FetchResult`}.
+        """
+        jobs = interleave(jobs)
+        if len(jobs) < 2 or self.workers < 2:
+            return dict(map(self._fetch_job, jobs))
+
+        pool = ThreadPool(min(self.workers, len(jobs)))
+        try:
+            return dict(pool.map(self._fetch_job, jobs))
+        finally:
+            pool.close()
+            pool.join()
@@ -7,14 +7,13 @@ from django.conf import settings
 
 import commonware.log
 import cronjobs
-from celery import chord
 
 import amo
 from amo.utils import chunked
 
-from .models import Installed, Webapp
-from .tasks import (dump_user_installs, update_downloads, update_trending,
-                    zip_users)
+from .models import Webapp
+from .tasks import (bulk_update_downloads, bulk_update_trending,
+                    update_downloads, update_trending)
 
 
 log = commonware.log.getLogger('z.cron')
@@ -54,30 +53,6 @@ def update_app_trending():
         countdown += seconds_between
 
 
-@cronjobs.register
-def dump_user_installs_cron():
-    """
-    Sets up tasks to do user install dumps.
-    """
-    chunk_size = 100
-    # Get valid users to dump.
-    user_ids = set(Installed.objects.filter(addon__type=amo.ADDON_WEBAPP)
-                   .values_list('user', flat=True))
-
-    # Remove old dump data before running.
-    user_dir = os.path.join(settings.DUMPED_USERS_PATH, 'users')
-    if os.path.exists(user_dir):
-        shutil.rmtree(user_dir)
-
-    grouping = []
-    for chunk in chunked(user_ids, chunk_size):
-        grouping.append(dump_user_installs.subtask(args=[chunk]))
-
-    post = zip_users.subtask(immutable=True)
-    ts = chord(grouping, post)
-    ts.apply_async()
-
-
 @cronjobs.register
 def update_app_downloads():
     """
@@ -97,3 +72,13 @@ def update_app_downloads():
     for ids in chunked(all_ids, chunk_size):
         update_downloads.delay(ids, countdown=countdown)
         countdown += seconds_between
+
+
+@cronjobs.register
+def bulk_update_app_stats():
+    """
+    Update trending and download/install stats for all apps, with a few
+    Monolith queries for all of them rather than a few per app.
+    """
+    bulk_update_trending()
+    bulk_update_downloads()
@@ -0,0 +1,301 @@
+"""
+Writes the public dumps of the apps and of the user installs as a single
+tarball, without intermediate files.
+
+The ids are read in chunks of DUMP_CHUNK_SIZE, each chunk fetched with one
+bulk query and serialized in a pool of DUMP_PROCESSES processes. The entries
+are added to the tarball in the order of the ids, every chunk as its own
+gzip member: gzip readers decompress the members one after the other, so the
+result is a normal .tgz.
+
+After every chunk, the size of the tarball written so far and the last id
+dumped are saved next to it. A run which failed is resumed from there: the
+tarball is cut back to that size and the dump goes on after that id.
+"""
+import datetime
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import tarfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.template import Context, loader
+
+import pytz
+from test_utils import RequestFactory
+
+import amo
+from addons.models import Addon
+from amo.utils import chunked, JSONEncoder
+from users.models import UserProfile
+
+from mkt.constants.regions import RESTOFWORLD
+from mkt.webapps.models import API_PREFETCH, Installed, Webapp
+
+
+log = logging.getLogger('z.task')
+
+
+def tar_entry(name, data, mtime):
+    """Returns the tar header and blocks of the file `name` holding `data`."""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    info.mode = 0644
+    padding = -len(data) % tarfile.BLOCKSIZE
+    return info.tobuf(tarfile.GNU_FORMAT) + data + tarfile.NUL * padding
+
+
+class TarballWriter(object):
+    """
+    Writes the tarball `path` chunk after chunk, through `path`.part, which
+    is renamed to `path` once finished. The checkpoint, `path`.part.json,
+    holds the `offset` of the end of the last chunk, its `last_id` and the
+    `count` of entries written.
+    """
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.part = path + '.part'
+        self.checkpoint_path = self.part + '.json'
+        self.mtime = int(time.time())
+        self.checkpoint = self.load_checkpoint() if resume else None
+        if self.checkpoint:
+            self.fileobj = open(self.part, 'r+b')
+            self.fileobj.seek(self.checkpoint['offset'])
+            self.fileobj.truncate()
+        else:
+            self.checkpoint = {'offset': 0, 'last_id': None, 'count': 0}
+            self.fileobj = open(self.part, 'wb')
+
+    @property
+    def resumed(self):
+        return self.checkpoint['offset'] > 0
+
+    def load_checkpoint(self):
+        if not (os.path.exists(self.part) and
+                os.path.exists(self.checkpoint_path)):
+            return None
+        with open(self.checkpoint_path) as fileobj:
+            checkpoint = json.load(fileobj)
+        if os.path.getsize(self.part) < checkpoint['offset']:
+            return None
+        return checkpoint
+
+    def write_chunk(self, entries, last_id):
+        """Adds `entries`, (name, data), as one gzip member."""
+        member = gzip.GzipFile(filename='', mode='wb', fileobj=self.fileobj,
+                               mtime=self.mtime)
+        for name, data in entries:
+            member.write(tar_entry(name, data, self.mtime))
+        member.close()
+        self.fileobj.flush()
+        os.fsync(self.fileobj.fileno())
+
+        self.checkpoint = {'offset': self.fileobj.tell(), 'last_id': last_id,
+                           'count': self.checkpoint['count'] + len(entries)}
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w') as fileobj:
+            json.dump(self.checkpoint, fileobj)
+        os.rename(tmp, self.checkpoint_path)
+
+    def close(self):
+        """Ends the tarball and moves it in place."""
+        member = gzip.GzipFile(filename='', mode='wb', fileobj=self.fileobj,
+                               mtime=self.mtime)
+        member.write(tarfile.NUL * tarfile.BLOCKSIZE * 2)
+        member.close()
+        self.fileobj.close()
+        os.rename(self.part, self.path)
+        os.remove(self.checkpoint_path)
+
+
+class Dump(object):
+    """The ids, entries and documents of a dump, and where it's written."""
+    name = None
+    templates = None
+
+    def ids(self):
+        """Returns the ids to dump, sorted."""
+        raise NotImplementedError
+
+    def entries(self, ids):
+        """Returns (name, data) for the objects of `ids` which still exist."""
+        raise NotImplementedError
+
+    def today(self):
+        raise NotImplementedError
+
+    def target(self):
+        raise NotImplementedError
+
+    def documents(self, prefix=''):
+        """The license and readme of the dump, as entries."""
+        context = Context({'date': self.today(), 'url': settings.SITE_URL})
+        return [(prefix + f, loader.get_template(self.templates + f)
+                 .render(context).encode('utf-8'))
+                for f in ('license.txt', 'readme.txt')]
+
+
+def dump_request():
+    req = RequestFactory().get('/')
+    req.user = AnonymousUser()
+    req.REGION = RESTOFWORLD
+    return req
+
+
+class AppsDump(Dump):
+    name = 'apps'
+    templates = 'webapps/dump/apps/'
+
+    def ids(self):
+        return list(Webapp.objects.visible().order_by('id')
+                    .values_list('id', flat=True))
+
+    def entries(self, ids):
+        from mkt.webapps.api import AppSerializer
+        context = {'request': dump_request()}
+        apps = Webapp.objects.with_related(*API_PREFETCH).filter(pk__in=ids)
+        return [('apps/%s/%s.json' % (app.id / 1000, app.id),
+                 json.dumps(AppSerializer(app, context=context).data,
+                            cls=JSONEncoder))
+                for app in sorted(apps, key=lambda app: app.id)]
+
+    def today(self):
+        return datetime.datetime.today().strftime('%Y-%m-%d')
+
+    def target(self):
+        return os.path.join(settings.DUMPED_APPS_PATH, 'tarballs',
+                            self.today() + '.tgz')
+
+
+def user_hash(user_id):
+    return hashlib.sha256('%s%s' % (str(user_id),
+                                    settings.SECRET_KEY)).hexdigest()
+
+
+def user_installs(ids):
+    """
+    Returns the data dumped for the users of `ids`, by user id, with three
+    queries whatever the number of users.
+    """
+    installs = list(Installed.objects.filter(user__in=ids,
+                                             addon__type=amo.ADDON_WEBAPP)
+                    .values_list('user', 'addon', 'created'))
+    # Deleted apps aren't returned, we can't recommend them.
+    slugs = dict(Addon.objects.filter(pk__in=set(i[1] for i in installs))
+                 .values_list('id', 'app_slug'))
+    zone = pytz.timezone(settings.TIME_ZONE)
+    installed = {}
+    for user_id, app_id, created in installs:
+        if app_id not in slugs:
+            continue
+        installed.setdefault(user_id, []).append({
+            'id': app_id,
+            'slug': slugs[app_id],
+            'installed': pytz.utc.normalize(
+                zone.localize(created)).strftime('%Y-%m-%dT%H:%M:%S')
+        })
+
+    return dict((user.id, {
+        'user': user_hash(user.id),
+        'region': user.region,
+        'lang': user.lang,
+        'installed_apps': installed.get(user.id, []),
+    }) for user in UserProfile.objects.filter(pk__in=ids))
+
+
+class UserInstallsDump(Dump):
+    name = 'users'
+    templates = 'webapps/dump/users/'
+
+    def ids(self):
+        return sorted(set(Installed.objects
+                          .filter(addon__type=amo.ADDON_WEBAPP)
+                          .values_list('user', flat=True)))
+
+    def entries(self, ids):
+        users = user_installs(ids)
+        return [('users/%s/%s.json' % (data['user'][0], data['user']),
+                 json.dumps(data, cls=JSONEncoder))
+                for user_id, data in sorted(users.items())]
+
+    def today(self):
+        return datetime.datetime.utcnow().strftime('%Y-%m-%d')
+
+    def target(self):
+        return os.path.join(settings.DUMPED_USERS_PATH, 'tarballs',
+                            self.today() + '.tgz')
+
+    def documents(self):
+        return super(UserInstallsDump, self).documents(prefix='users/')
+
+
+DUMPS = dict((dump.name, dump) for dump in (AppsDump, UserInstallsDump))
+
+
+def _dump_chunk(args):
+    """Process pool entry point: serializes a chunk of ids."""
+    name, ids = args
+    return DUMPS[name]().entries(ids)
+
+
+def write_dump(name, resume=True, processes=None, chunk_size=None):
+    """
+    Writes the dump `name` of `DUMPS`, resuming a run which failed unless
+    `resume` is False. Returns the path of the tarball and the number of
+    objects dumped by this run.
+    """
+    dump = DUMPS[name]()
+    processes = processes or settings.DUMP_PROCESSES
+    chunk_size = chunk_size or settings.DUMP_CHUNK_SIZE
+    target = dump.target()
+    if not os.path.exists(os.path.dirname(target)):
+        os.makedirs(os.path.dirname(target))
+
+    writer = TarballWriter(target, resume=resume)
+    if writer.resumed:
+        log.info(u'Resuming dump {0} after {1} [{2}]'.format(
+            target, writer.checkpoint['last_id'],
+            writer.checkpoint['count']))
+    else:
+        writer.write_chunk(dump.documents(), None)
+
+    last_id = writer.checkpoint['last_id']
+    chunks = list(chunked([id for id in dump.ids()
+                           if last_id is None or id > last_id], chunk_size))
+    log.info(u'Dumping {0} {1} to {2}'.format(
+        sum(map(len, chunks)), name, target))
+    jobs = [(name, chunk) for chunk in chunks]
+
+    pool = None
+    if processes > 1 and len(chunks) > 1:
+        # Each child process opens its own database connection, never share
+        # the one of the parent.
+        connection.close()
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_dump_chunk, jobs)
+    else:
+        results = itertools.imap(_dump_chunk, jobs)
+    dumped = 0
+    try:
+        for chunk, entries in itertools.izip(chunks, results):
+            writer.write_chunk(entries, chunk[-1])
+            dumped += len(entries)
+        if pool:
+            pool.close()
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    writer.close()
+    log.info(u'Dumped {0} {1} to {2}'.format(dumped, name, target))
+    return target, dumped
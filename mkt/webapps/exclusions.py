@@ -0,0 +1,186 @@
+"""
+The apps excluded from each region, by `AddonExcludedRegion` or by the
+region flags of `Geodata`, kept in memory as a sorted array of app ids per
+region.
+
+The exclusions are loaded from the master once per process. Changes made by
+the process update them in place from the model signals, and bump a version
+in the cache once committed. Other processes check that version every
+REGION_EXCLUSIONS_CHECK_INTERVAL seconds and reload when it moved. They also
+reload every REGION_EXCLUSIONS_RELOAD_INTERVAL seconds, in case a change was
+missed.
+"""
+import bisect
+import operator
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.models import Q
+
+from amo.decorators import use_master
+
+import mkt
+
+
+VERSION_KEY = 'region-exclusions:version'
+
+# The Geodata flags excluding apps from a region.
+GEODATA_EXCLUSIONS = (
+    ('region_br_iarc_exclude', mkt.regions.BR.id),
+    ('region_de_iarc_exclude', mkt.regions.DE.id),
+    ('region_de_usk_exclude', mkt.regions.DE.id),
+)
+
+
+def _array(ids=()):
+    return array('I', sorted(set(ids)))
+
+
+class RegionExclusions(object):
+    """{region id: sorted array of the ids of the apps excluded from it}."""
+
+    def __init__(self, regions=None):
+        self.regions = regions or {}
+
+    @classmethod
+    @use_master
+    def load(cls):
+        from mkt.webapps.models import AddonExcludedRegion, Geodata
+        regions = {}
+        for region, app in (AddonExcludedRegion.objects
+                            .values_list('region', 'addon')):
+            regions.setdefault(region, []).append(app)
+        flags = [flag for flag, region in GEODATA_EXCLUSIONS]
+        qs = Geodata.objects.filter(
+            reduce(operator.or_, [Q(**{flag: True}) for flag in flags]))
+        for row in qs.values_list('addon', *flags):
+            for (flag, region), excluded in zip(GEODATA_EXCLUSIONS, row[1:]):
+                if excluded:
+                    regions.setdefault(region, []).append(row[0])
+        return cls(dict((region, _array(apps))
+                        for region, apps in regions.items()))
+
+    @staticmethod
+    @use_master
+    def load_app(app_id):
+        """
+        Returns the ids of the regions `app_id` is excluded from, reading
+        from the master right after a change.
+        """
+        from mkt.webapps.models import AddonExcludedRegion, Geodata
+        region_ids = set(AddonExcludedRegion.objects.filter(addon=app_id)
+                         .values_list('region', flat=True))
+        flags = [flag for flag, region in GEODATA_EXCLUSIONS]
+        for row in Geodata.objects.filter(addon=app_id).values_list(*flags):
+            region_ids.update(region for (flag, region), excluded
+                              in zip(GEODATA_EXCLUSIONS, row) if excluded)
+        return region_ids
+
+    def __len__(self):
+        return sum(len(apps) for apps in self.regions.values())
+
+    def excluded_in(self, region_id):
+        """Returns the sorted array of the apps excluded from the region."""
+        return self.regions.get(region_id, _array())
+
+    def is_excluded(self, region_id, app_id):
+        apps = self.regions.get(region_id)
+        if not apps:
+            return False
+        index = bisect.bisect_left(apps, app_id)
+        return index < len(apps) and apps[index] == app_id
+
+    def region_ids(self, app_id):
+        """Returns the sorted ids of the regions `app_id` is excluded from."""
+        return sorted(region for region in self.regions
+                      if self.is_excluded(region, app_id))
+
+    def set_app(self, app_id, region_ids):
+        """Excludes `app_id` from `region_ids` only."""
+        region_ids = set(region_ids)
+        for region in set(self.regions) | region_ids:
+            apps = self.regions.setdefault(region, _array())
+            index = bisect.bisect_left(apps, app_id)
+            present = index < len(apps) and apps[index] == app_id
+            if region in region_ids and not present:
+                apps.insert(index, app_id)
+            elif region not in region_ids and present:
+                apps.pop(index)
+
+
+_exclusions = None
+_version = None
+_checked = 0
+_loaded = 0
+_lock = threading.RLock()
+_local = threading.local()
+
+
+def get_exclusions():
+    """Returns the `RegionExclusions` of the process, up to date."""
+    global _exclusions, _version, _checked, _loaded
+    with _lock:
+        now = time.time()
+        if (_exclusions is None or
+                now - _checked >= settings.REGION_EXCLUSIONS_CHECK_INTERVAL):
+            version = cache.get(VERSION_KEY)
+            if (_exclusions is None or version is None or
+                    version != _version or now - _loaded >=
+                    settings.REGION_EXCLUSIONS_RELOAD_INTERVAL):
+                if version is None:
+                    version = _bump_version()
+                _exclusions = RegionExclusions.load()
+                _version = version
+                _loaded = now
+            _checked = now
+        return _exclusions
+
+
+def _bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # Start from a value no other process has already seen.
+        version = int(time.time() * 1000000)
+        cache.set(VERSION_KEY, version, None)
+        return version
+
+
+def refresh_app(app_id):
+    """Updates the exclusions of `app_id` after a change made here."""
+    with _lock:
+        if _exclusions is not None:
+            _exclusions.set_app(app_id, RegionExclusions.load_app(app_id))
+    if connection.in_atomic_block:
+        # Other processes would reload before the change is committed, bump
+        # the version at the end of the request instead.
+        _local.changed = True
+    else:
+        publish_changes()
+
+
+def publish_changes():
+    """Bumps the version, for other processes to reload the exclusions."""
+    global _version
+    _local.changed = False
+    with _lock:
+        version = _bump_version()
+        # Only the changes made here happened since the exclusions were
+        # loaded, others will get the exclusions reloaded at the next check.
+        if _version is not None and version == _version + 1:
+            _version = version
+
+
+def publish_pending_changes(sender, **kw):
+    """Publishes the changes of a request once its transaction is over."""
+    if getattr(_local, 'changed', False):
+        publish_changes()
+
+
+request_finished.connect(publish_pending_changes,
+                         dispatch_uid='region_exclusions_publish_changes')
@@ -0,0 +1,112 @@
+"""
+A fake server of hosted app manifests, for tests and benchmarks of the
+manifest crawler.
+
+It serves /<number>/manifest.webapp for any number, after an optional delay,
+with an ETag and a Last-Modified, and answers 304 Not Modified to conditional
+requests for manifests which didn't change:
+
+    python mkt/webapps/fake_manifests.py --port=9000 --delay=0.05
+
+"""
+import hashlib
+import json
+import optparse
+import re
+import threading
+import time
+from email.utils import formatdate
+from SocketServer import ThreadingMixIn
+from wsgiref import simple_server
+
+
+CONTENT_TYPE = 'application/x-web-app-manifest+json'
+
+
+class ThreadingServer(ThreadingMixIn, simple_server.WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(simple_server.WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeManifests(object):
+    """
+    The WSGI app, answering after `delay` seconds. Set `versions[number]` to
+    change a manifest. `requests` and `not_modified` count the requests and
+    the 304 responses.
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.versions = {}
+        self.last_modified = formatdate(usegmt=True)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+
+    def manifest(self, number):
+        return json.dumps({
+            'name': 'App %s' % number,
+            'version': self.versions.get(number, '1.0'),
+            'description': 'A fake app.',
+            'developer': {'name': 'Fake Manifests'},
+        })
+
+    def __call__(self, environ, start_response):
+        match = re.match(r'^/(\d+)/manifest.webapp$', environ['PATH_INFO'])
+        if not match:
+            start_response('404 Not Found', [('Content-Length', '0')])
+            return ['']
+
+        if self.delay:
+            time.sleep(self.delay)
+        body = self.manifest(int(match.group(1)))
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        with self.lock:
+            self.requests += 1
+            if environ.get('HTTP_IF_NONE_MATCH') == etag:
+                self.not_modified += 1
+                start_response('304 Not Modified', [('ETag', etag)])
+                return ['']
+
+        start_response('200 OK', [('Content-Type', CONTENT_TYPE),
+                                  ('Content-Length', str(len(body))),
+                                  ('ETag', etag),
+                                  ('Last-Modified', self.last_modified)])
+        return [body]
+
+
+def start(port=0, **kw):
+    """
+    Serves fake manifests from a thread, on a free port by default. Returns
+    the server, which has to be shut down, and its URL. The `FakeManifests`
+    app is `server.get_app()`.
+    """
+    server = simple_server.make_server('127.0.0.1', port, FakeManifests(**kw),
+                                       server_class=ThreadingServer,
+                                       handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:%s' % server.server_port
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--port', type='int', default=9000)
+    parser.add_option('--delay', type='float', default=0,
+                      help='Seconds to wait before answering.')
+    options, args = parser.parse_args()
+    server = simple_server.make_server('127.0.0.1', options.port,
+                                       FakeManifests(delay=options.delay),
+                                       server_class=ThreadingServer)
+    print 'Serving fake manifests on port %s' % options.port
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
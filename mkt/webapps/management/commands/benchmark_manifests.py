@@ -0,0 +1,76 @@
+"""
+Compares how many apps per minute update_manifests gets the manifests of,
+from local fake manifest servers: one app after the other as before, with
+the concurrent crawler, and with the crawler again once the servers can
+answer that the manifests didn't change.
+
+Call like:
+
+    ./manage.py benchmark_manifests --apps=500 --hosts=10 --delay=0.05
+
+"""
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mkt.developers.tasks import _fetch_manifest
+from mkt.webapps import fake_manifests
+from mkt.webapps.crawler import ManifestCrawler
+
+
+def fetch(url, validators):
+    return _fetch_manifest(url, validators=validators)
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--apps', action='store', type='int', default=500,
+                    help='Number of apps'),
+        make_option('--hosts', action='store', type='int', default=10,
+                    help='Number of hosts serving the manifests'),
+        make_option('--delay', action='store', type='float', default=0.05,
+                    help='Seconds the servers take to answer'),
+        make_option('--workers', action='store', type='int',
+                    default=settings.MANIFEST_CRAWLER_WORKERS,
+                    help='Number of threads of the crawler'),
+    )
+
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        servers = [fake_manifests.start(delay=kw['delay'])
+                   for k in range(kw['hosts'])]
+        urls = ['%s/%s/manifest.webapp' % (servers[k % len(servers)][1], k)
+                for k in range(kw['apps'])]
+        crawler = ManifestCrawler(fetch, workers=kw['workers'])
+        validators = {}
+
+        def serial():
+            for url in urls:
+                fetch(url, {})
+            return len(urls), 0
+
+        def crawl():
+            results = crawler.crawl((k, url, validators.get(k))
+                                    for k, url in enumerate(urls))
+            for k, result in results.items():
+                validators[k] = result.validators
+            return (len([r for r in results.values() if r.content]),
+                    len([r for r in results.values() if r.not_modified]))
+
+        try:
+            for name, run in (('serial', serial),
+                              ('crawler', crawl),
+                              ('crawler, conditional', crawl)):
+                start = time.time()
+                fetched, not_modified = run()
+                elapsed = time.time() - start
+                self.stdout.write(
+                    '%s: %.0f apps/min, %s fetched, %s not modified\n' % (
+                        name, len(urls) * 60 / elapsed, fetched,
+                        not_modified))
+        finally:
+            for server, url in servers:
+                server.shutdown()
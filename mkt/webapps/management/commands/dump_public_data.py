@@ -0,0 +1,56 @@
+"""
+Writes the public dump of the apps or of the user installs to a tarball, and
+reports the throughput and the peak memory of the processes.
+
+A run which failed is resumed, unless --restart is given.
+
+Call like:
+
+    ./manage.py dump_public_data --dump=apps --processes=4
+
+"""
+import resource
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mkt.webapps.dump import DUMPS, write_dump
+
+
+def peak_rss(who=resource.RUSAGE_SELF):
+    """Returns the peak resident memory, in KB on Linux."""
+    return resource.getrusage(who).ru_maxrss
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--dump', action='store', type='string',
+                    help='Dump to write: %s' % ', '.join(sorted(DUMPS))),
+        make_option('--restart', action='store_true', default=False,
+                    help='Start again instead of resuming a failed run'),
+        make_option('--processes', action='store', type='int',
+                    default=settings.DUMP_PROCESSES,
+                    help='Number of processes serializing the objects'),
+        make_option('--chunk-size', action='store', type='int',
+                    default=settings.DUMP_CHUNK_SIZE,
+                    help='Number of objects serialized at once'),
+    )
+
+    help = __doc__
+
+    def handle(self, *args, **kw):
+        if kw['dump'] not in DUMPS:
+            raise CommandError('Unknown dump provided. Options are: %s'
+                               % ', '.join(sorted(DUMPS)))
+
+        start = time.time()
+        target, count = write_dump(kw['dump'], resume=not kw['restart'],
+                                   processes=kw['processes'],
+                                   chunk_size=kw['chunk_size'])
+        elapsed = time.time() - start
+        self.stdout.write('%s: %s %s in %.1fs, %.0f/s\n' % (
+            target, count, kw['dump'], elapsed, count / max(elapsed, 0.001)))
+        self.stdout.write('Peak RSS: %.1f MB, %.1f MB in the workers\n' % (
+            peak_rss() / 1024.0, peak_rss(resource.RUSAGE_CHILDREN) / 1024.0))
@@ -15,13 +15,12 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.storage import default_storage as storage
 from django.core.urlresolvers import NoReverseMatch
 from django.db import models
-from django.db.models import Max, Min, Q, signals as dbsignals
+from django.db.models import Max, signals as dbsignals
 from django.dispatch import receiver
 
 import commonware.log
 import json_field
 import waffle
-from cache_nuggets.lib import memoize, memoize_key
 from elasticutils.contrib.django import F, Indexable, MappingType
 from tower import ugettext as _
 
@@ -29,9 +28,9 @@ import amo
 import amo.models
 from access.acl import action_allowed, check_reviewer
 from addons import query
-from addons.models import (Addon, AddonDeviceType, AddonUpsell,
-                           attach_categories, attach_devices, attach_prices,
-                           attach_tags, attach_translations, Category)
+from addons.models import (Addon, AddonDeviceType, AddonUpsell, AddonUser,
+                           attach_devices, attach_prices, attach_translations,
+                           Category, Preview)
 from addons.signals import version_changed
 from amo.decorators import skip_cache, write
 from amo.helpers import absolutify
@@ -43,7 +42,6 @@ from constants.payments import PROVIDER_CHOICES
 from files.models import File, nfd_str, Platform
 from files.utils import parse_addon, WebAppParser
 from market.models import AddonPremium
-from stats.models import ClientData
 from translations.fields import PurifiedField, save_signal
 from versions.models import Version
 
@@ -58,6 +56,8 @@ from mkt.developers.models import AddonPaymentAccount
 from mkt.regions.utils import parse_region
 from mkt.search.utils import S
 from mkt.site.models import DynamicBoolFieldsMixin
+from mkt.webapps.exclusions import (get_exclusions, refresh_app,
+                                    RegionExclusions)
 from mkt.webapps.utils import (dehydrate_content_rating, dehydrate_descriptors,
                                dehydrate_interactives, get_locale_properties,
                                get_supported_locales)
@@ -252,11 +252,7 @@ class Webapp(Addon):
     @staticmethod
     def indexing_transformer(apps):
         """Attach everything we need to index apps."""
-        transforms = (attach_categories, attach_devices, attach_prices,
-                      attach_tags, attach_translations)
-        for t in transforms:
-            qs = apps.transform(t)
-        return qs
+        return apps.with_related(*INDEXING_PREFETCH)
 
     @property
     def geodata(self):
@@ -752,7 +748,7 @@ class Webapp(Addon):
 
         return sorted(set(all_ids) - set(excluded or []))
 
-    def get_excluded_region_ids(self):
+    def get_excluded_region_ids(self, from_master=False):
         """
         Return IDs of regions for which this app is excluded.
 
@@ -760,10 +756,16 @@ class Webapp(Addon):
         this will also exclude any region that does not have the price tier
         set.
 
+        The addon excluded regions come from the exclusions kept in memory,
+        which may lag behind a change made by another process, unless
+        `from_master` is True.
+
         Note: free and in-app are not included in this.
         """
-        excluded = set(self.addonexcludedregion
-                           .values_list('region', flat=True))
+        if from_master:
+            excluded = RegionExclusions.load_app(self.id)
+        else:
+            excluded = set(get_exclusions().region_ids(self.id))
 
         if self.is_premium():
             all_regions = set(mkt.regions.ALL_REGION_IDS)
@@ -772,12 +774,6 @@ class Webapp(Addon):
             excluded = excluded.union(
                 all_regions.difference(self.get_price_region_ids()))
 
-        geo = self.geodata
-        if geo.region_de_iarc_exclude or geo.region_de_usk_exclude:
-            excluded.add(mkt.regions.DE.id)
-        if geo.region_br_iarc_exclude:
-            excluded.add(mkt.regions.BR.id)
-
         return sorted(list(excluded))
 
     def get_price_region_ids(self):
@@ -1400,6 +1396,20 @@ class Webapp(Addon):
             return self.content_ratings.order_by('-modified')[0].modified
 
 
+# Related data that can be attached to a queryset of apps with
+# `Webapp.objects.with_related(*names)`.
+amo.models.register_prefetch(Webapp, 'categories', 'categories')
+amo.models.register_prefetch(Webapp, 'devices', attach_devices)
+amo.models.register_prefetch(Webapp, 'prices', attach_prices)
+amo.models.register_prefetch(Webapp, 'tags', 'tags')
+amo.models.register_prefetch(Webapp, 'translations', attach_translations)
+
+# What `WebappIndexer.extract_document` and the API serializers need.
+INDEXING_PREFETCH = ('categories', 'devices', 'prices', 'tags',
+                     'translations')
+API_PREFETCH = ('categories', 'tags')
+
+
 class Trending(amo.models.ModelBase):
     addon = models.ForeignKey(Addon, related_name='trending')
     value = models.FloatField(default=0.0)
@@ -1704,26 +1714,144 @@ class WebappIndexer(MappingType, Indexable):
         return mapping
 
     @classmethod
-    def extract_document(cls, pk, obj=None):
-        """Extracts the ElasticSearch index document for this instance."""
+    def get_indexing_data(cls, objs, max_downloads=None):
+        """
+        Return a dict mapping app ids to the related data `extract_document`
+        needs, fetched with one set-based query per relation for all `objs`.
+
+        `max_downloads` is the maximum `weekly_downloads` across all apps. It
+        is computed here when not passed in, but callers indexing many chunks
+        should compute it once with `get_max_downloads` and pass it along.
+
+        As a side effect, the geodata, current version features and the
+        translations of both are attached to the objects.
+        """
+        from editors.models import EscalationQueue
+        from mkt.collections.models import CollectionMembership
+
+        objs = list(objs)
+        ids = [obj.id for obj in objs]
+        public_ids = [obj.id for obj in objs if obj.is_public()]
+        if max_downloads is None:
+            max_downloads = cls.get_max_downloads()
+
+        data = dict((pk, {'collections': [],
+                          'installed_count': 0,
+                          'installed_regions': {},
+                          'is_escalated': False,
+                          'max_downloads': max_downloads,
+                          'owners': [],
+                          'previews': [],
+                          'reviewed': None,
+                          'versions': []}) for pk in ids)
+
+        installs = (Installed.objects.filter(addon__in=ids).order_by()
+                    .values_list('addon').annotate(models.Count('id')))
+        for addon_id, count in installs:
+            data[addon_id]['installed_count'] = count
+
+        regions = (Installed.objects.filter(addon__in=ids,
+                                            client_data__isnull=False)
+                   .order_by().values_list('addon', 'client_data__region')
+                   .annotate(models.Count('id')))
+        for addon_id, region, count in regions:
+            data[addon_id]['installed_regions'][region] = count
+
+        for addon_id in (EscalationQueue.objects.filter(addon__in=ids)
+                         .values_list('addon', flat=True)):
+            data[addon_id]['is_escalated'] = True
+
+        if public_ids:
+            memberships = (CollectionMembership.objects
+                           .filter(app__in=public_ids)
+                           .values_list('app', 'collection', 'order'))
+            for addon_id, collection_id, order in memberships:
+                data[addon_id]['collections'].append(
+                    {'id': collection_id, 'order': order})
+
+        owners = (AddonUser.objects.filter(addon__in=ids,
+                                           role=amo.AUTHOR_ROLE_OWNER)
+                  .values_list('addon', 'user'))
+        for addon_id, user_id in owners:
+            data[addon_id]['owners'].append(user_id)
+
+        previews = (Preview.objects.filter(addon__in=ids).no_transforms()
+                    .values_list('addon', 'filetype', 'modified', 'id'))
+        for addon_id, filetype, modified, preview_id in previews:
+            data[addon_id]['previews'].append(
+                {'filetype': filetype, 'modified': modified,
+                 'id': preview_id})
+
+        versions = Version.objects.filter(addon__in=ids).no_transforms()
+        for version in versions:
+            app_data = data[version.addon_id]
+            app_data['versions'].append(version)
+            if version.reviewed and (app_data['reviewed'] is None or
+                                     version.reviewed < app_data['reviewed']):
+                app_data['reviewed'] = version.reviewed
+
+        # Attach the one-to-one relations and the translations we need.
+        geodata = dict((g.addon_id, g) for g in
+                       Geodata.objects.filter(addon__in=ids))
+        for obj in objs:
+            if obj.id in geodata:
+                obj._geodata = geodata[obj.id]
+
+        current_versions = filter(None, (obj.current_version for obj in objs))
+        features = dict((f.version_id, f) for f in AppFeatures.objects.filter(
+            version__in=[v.id for v in current_versions]))
+        for version in current_versions:
+            if version.id in features:
+                version.features = features[version.id]
+        # Fetch the translations of both models at once.
+        amo.utils.attach_trans_dicts([(Geodata, geodata.values()),
+                                      (Version, current_versions)])
+
+        return data
+
+    @classmethod
+    def get_max_downloads(cls):
+        """Return the maximum weekly downloads of all apps, as a float."""
+        return float(Webapp.objects.aggregate(Max('weekly_downloads'))
+                     .values()[0] or 0)
+
+    @classmethod
+    def extract_documents(cls, objs, max_downloads=None):
+        """
+        Extract the documents for all `objs` at once, sharing the related
+        data queries between them. Returns a list of documents.
+        """
+        objs = list(objs)
+        data = cls.get_indexing_data(objs, max_downloads=max_downloads)
+        return [cls.extract_document(obj.id, obj, data=data[obj.id])
+                for obj in objs]
+
+    @classmethod
+    def extract_document(cls, pk, obj=None, data=None):
+        """
+        Extracts the ElasticSearch index document for this instance.
+
+        `data` is the related data returned by `get_indexing_data` for this
+        instance. It is fetched if not provided.
+        """
         if obj is None:
-            obj = cls.get_model().objects.no_cache().get(pk=pk)
+            obj = Webapp.indexing_transformer(
+                cls.get_model().objects.no_cache()).get(pk=pk)
+        if data is None:
+            data = cls.get_indexing_data([obj])[obj.id]
 
         latest_version = obj.latest_version
         version = obj.current_version
         geodata = obj.geodata
         features = (version.features.to_dict()
                     if version else AppFeatures().to_dict())
-        is_escalated = obj.escalationqueue_set.exists()
+        is_escalated = data['is_escalated']
 
         try:
             status = latest_version.statuses[0][1] if latest_version else None
         except IndexError:
             status = None
 
-        installed_ids = list(Installed.objects.filter(addon=obj)
-                             .values_list('id', flat=True))
-
         attrs = ('app_slug', 'average_daily_users', 'bayesian_rating',
                  'created', 'id', 'is_disabled', 'last_updated', 'modified',
                  'premium_type', 'status', 'type', 'uses_flash',
@@ -1733,12 +1861,8 @@ class WebappIndexer(MappingType, Indexable):
         d['app_type'] = obj.app_type_id
         d['author'] = obj.developer_name
         d['banner_regions'] = geodata.banner_regions_slugs()
-        d['category'] = list(obj.categories.values_list('slug', flat=True))
-        if obj.is_public:
-            d['collection'] = [{'id': cms.collection_id, 'order': cms.order}
-                               for cms in obj.collectionmembership_set.all()]
-        else:
-            d['collection'] = []
+        d['category'] = [c.slug for c in obj.categories.all()]
+        d['collection'] = data['collections']
         d['content_ratings'] = (obj.get_content_ratings_by_body(es=True) or
                                 None)
         d['content_descriptors'] = obj.get_descriptors_slugs()
@@ -1771,11 +1895,9 @@ class WebappIndexer(MappingType, Indexable):
         d['name'] = list(
             set(string for _, string in obj.translations[obj.name_id]))
         d['name_sort'] = unicode(obj.name).lower()
-        d['owners'] = [au.user.id for au in
-                       obj.addonuser_set.filter(role=amo.AUTHOR_ROLE_OWNER)]
-        d['popularity'] = d['_boost'] = len(installed_ids)
-        d['previews'] = [{'filetype': p.filetype, 'modified': p.modified,
-                          'id': p.id} for p in obj.previews.all()]
+        d['owners'] = data['owners']
+        d['popularity'] = d['_boost'] = data['installed_count']
+        d['previews'] = data['previews']
         try:
             p = obj.addonpremium.price
             d['price_tier'] = p.name
@@ -1786,16 +1908,16 @@ class WebappIndexer(MappingType, Indexable):
             'average': obj.average_rating,
             'count': obj.total_reviews,
         }
-        d['region_exclusions'] = obj.get_excluded_region_ids()
-        d['reviewed'] = obj.versions.filter(
-            deleted=False).aggregate(Min('reviewed')).get('reviewed__min')
+        # Indexing often follows the change of the exclusions right away.
+        d['region_exclusions'] = obj.get_excluded_region_ids(from_master=True)
+        d['reviewed'] = data['reviewed']
         if version:
             d['supported_locales'] = filter(
                 None, version.supported_locales.split(','))
         else:
             d['supported_locales'] = []
 
-        d['tags'] = getattr(obj, 'tag_list', [])
+        d['tags'] = [t.tag_text for t in obj.tags.all() if not t.blacklisted]
         if obj.upsell and obj.upsell.premium.is_public():
             upsell_obj = obj.upsell.premium
             d['upsell'] = {
@@ -1804,18 +1926,18 @@ class WebappIndexer(MappingType, Indexable):
                 'icon_url': upsell_obj.get_icon_url(128),
                 # TODO: Store all localizations of upsell.name.
                 'name': unicode(upsell_obj.name),
-                'region_exclusions': upsell_obj.get_excluded_region_ids()
+                'region_exclusions': upsell_obj.get_excluded_region_ids(
+                    from_master=True)
             }
 
         d['versions'] = [dict(version=v.version,
                               resource_uri=reverse_version(v))
-                         for v in obj.versions.all()]
+                         for v in data['versions']]
 
         # Calculate weight. It's similar to popularity, except that we can
         # expose the number - it's relative to the max weekly downloads for
         # the whole database.
-        max_downloads = float(
-            Webapp.objects.aggregate(Max('weekly_downloads')).values()[0] or 0)
+        max_downloads = data['max_downloads']
         if max_downloads:
             d['weight'] = math.ceil(d['weekly_downloads'] / max_downloads * 5)
         else:
@@ -1830,14 +1952,14 @@ class WebappIndexer(MappingType, Indexable):
                 in obj.translations[getattr(obj, '%s_id' % field)]
                 if string]
         if version:
-            amo.utils.attach_trans_dict(Version, [version])
             d['release_notes_translations'] = [
                 {'lang': to_language(lang), 'string': string}
                 for lang, string
                 in version.translations[version.releasenotes_id]]
         else:
             d['release_notes_translations'] = None
-        amo.utils.attach_trans_dict(Geodata, [geodata])
+        if not hasattr(geodata, 'translations'):
+            amo.utils.attach_trans_dict(Geodata, [geodata])
         d['banner_message_translations'] = [
             {'lang': to_language(lang), 'string': string}
             for lang, string
@@ -1845,16 +1967,13 @@ class WebappIndexer(MappingType, Indexable):
 
         # Calculate regional popularity for "mature regions"
         # (installs + reviews/installs from that region).
-        installs = dict(ClientData.objects.filter(installed__in=installed_ids)
-                        .annotate(region_counts=models.Count('region'))
-                        .values_list('region', 'region_counts').distinct())
         for region in mkt.regions.ALL_REGION_IDS:
-            cnt = installs.get(region, 0)
+            cnt = data['installed_regions'].get(region, 0)
             if cnt:
                 # Magic number (like all other scores up in this piece).
                 d['popularity_%s' % region] = d['popularity'] + cnt * 10
             else:
-                d['popularity_%s' % region] = len(installed_ids)
+                d['popularity_%s' % region] = d['popularity']
             d['_boost'] += cnt * 10
 
         # Bump the boost if the add-on is public.
@@ -2037,38 +2156,12 @@ class AddonExcludedRegion(amo.models.ModelBase):
         return mkt.regions.REGIONS_CHOICES_ID_DICT.get(self.region)
 
 
-@memoize(prefix='get_excluded_in')
 def get_excluded_in(region_id):
     """
     Return IDs of Webapp objects excluded from a particular region or excluded
     due to Geodata flags.
     """
-    aers = list(AddonExcludedRegion.objects.filter(region=region_id)
-                .values_list('addon', flat=True))
-
-    # For pre-IARC unrated games in Brazil/Germany.
-    geodata_qs = Q()
-    region = parse_region(region_id)
-    if region in (mkt.regions.BR, mkt.regions.DE):
-        geodata_qs |= Q(**{'region_%s_iarc_exclude' % region.slug: True})
-    # For USK_RATING_REFUSED apps in Germany.
-    if region == mkt.regions.DE:
-        geodata_qs |= Q(**{'region_de_usk_exclude': True})
-
-    geodata_exclusions = []
-    if geodata_qs:
-        geodata_exclusions = list(Geodata.objects.filter(geodata_qs)
-                                  .values_list('addon', flat=True))
-    return set(aers + geodata_exclusions)
-
-
-@receiver(models.signals.post_save, sender=AddonExcludedRegion,
-          dispatch_uid='clean_memoized_exclusions')
-def clean_memoized_exclusions(sender, **kw):
-    if not kw.get('raw'):
-        for k in mkt.regions.ALL_REGION_IDS:
-            cache.delete_many([memoize_key('get_excluded_in', k)
-                               for k in mkt.regions.ALL_REGION_IDS])
+    return set(get_exclusions().excluded_in(region_id))
 
 
 class IARCInfo(amo.models.ModelBase):
@@ -2308,6 +2401,30 @@ class AppManifest(amo.models.ModelBase):
         db_table = 'app_manifest'
 
 
+class ManifestValidators(amo.models.ModelBase):
+    """
+    The ETag and Last-Modified of the manifest of a hosted app, sent back by
+    `update_manifests` to only get the manifest again when it changed.
+
+    They only hold for the `manifest_url` they were sent from: the manifest
+    at a new URL is always fetched.
+    """
+    addon = models.OneToOneField('addons.Addon',
+                                 related_name='manifest_validators')
+    manifest_url = models.URLField(max_length=255, null=True)
+    etag = models.CharField(max_length=255, null=True)
+    last_modified = models.CharField(max_length=64, null=True)
+
+    class Meta:
+        db_table = 'webapps_manifest_validators'
+
+    def get_validators(self, manifest_url):
+        """Returns the validators, or None if they are for another URL."""
+        if manifest_url != self.manifest_url:
+            return None
+        return {'etag': self.etag, 'last_modified': self.last_modified}
+
+
 class RegionListField(json_field.JSONField):
     def to_python(self, value):
         value = super(RegionListField, self).to_python(value)
@@ -2442,3 +2559,14 @@ for region in (mkt.regions.BR, mkt.regions.DE):
 # Save geodata translations when a Geodata instance is saved.
 models.signals.pre_save.connect(save_signal, sender=Geodata,
                                 dispatch_uid='geodata_translations')
+
+
+@receiver(models.signals.post_save, sender=AddonExcludedRegion,
+          dispatch_uid='aer_refresh_exclusions')
+@receiver(models.signals.post_delete, sender=AddonExcludedRegion,
+          dispatch_uid='aer_delete_refresh_exclusions')
+@receiver(models.signals.post_save, sender=Geodata,
+          dispatch_uid='geodata_refresh_exclusions')
+def refresh_exclusions(sender, instance, **kw):
+    if not kw.get('raw'):
+        refresh_app(instance.addon_id)
@@ -3,43 +3,38 @@ import hashlib
 import json
 import logging
 import os
-import shutil
-import subprocess
 import time
 
 from django.conf import settings
-from django.contrib.auth.models import AnonymousUser
 from django.core.files.storage import default_storage as storage
-from django.template import Context, loader
+from django.db import connection
 
-import pytz
 import requests
 from celery.exceptions import RetryTaskError
 from celeryutils import task
 from pyelasticsearch.exceptions import ElasticHttpNotFoundError
 from requests.exceptions import RequestException
-from test_utils import RequestFactory
 from tower import ugettext as _
 
 import amo
-from addons.models import Addon
 from amo.decorators import use_master, write
 from amo.helpers import absolutify
 from amo.urlresolvers import reverse
-from amo.utils import chunked, days_ago, JSONEncoder, send_mail_jinja
+from amo.utils import chunked, days_ago, send_mail_jinja
 from editors.models import RereviewQueue
 from files.models import FileUpload
 from files.utils import WebAppParser
 from lib.es.utils import get_indices
 from lib.metrics import get_monolith_client
-from users.models import UserProfile
 from users.utils import get_task_user
 
 import mkt
-from mkt.constants.regions import RESTOFWORLD
 from mkt.developers.tasks import (_fetch_manifest, fetch_icon, pngcrush_image,
                                   resize_preview, validator)
-from mkt.webapps.models import AppManifest, Webapp, WebappIndexer
+from mkt.search.utils import invalidate_featured_cache
+from mkt.webapps.crawler import ManifestCrawler
+from mkt.webapps.models import (AppManifest, ManifestValidators, Trending,
+                                Webapp, WebappIndexer)
 from mkt.webapps.utils import get_locale_properties
 
 
@@ -69,8 +64,9 @@ def update_manifests(ids, **kw):
     # we'll need to log in as user.
     amo.set_user(get_task_user())
 
+    fetched = _crawl_manifests(ids, check_hash)
     for id in ids:
-        _update_manifest(id, check_hash, retries)
+        _update_manifest(id, check_hash, retries, fetched=fetched.get(id))
     if retries:
         try:
             update_manifests.retry(args=(retries.keys(),),
@@ -113,7 +109,45 @@ def notify_developers_of_failure(app, error_message, has_link=False):
                             context, recipient_list=to)
 
 
-def _update_manifest(id, check_hash, failed_fetches):
+def _fetch_manifest_conditionally(url, validators):
+    return _fetch_manifest(url, validators=validators)
+
+
+def _crawl_manifests(ids, check_hash):
+    """
+    Fetches the manifests of the hosted apps `ids` concurrently, only when
+    they changed unless `check_hash` is False. Returns {id: `FetchResult`}.
+    """
+    saved = {}
+    if check_hash:
+        saved = dict((v.addon_id, v) for v in
+                     ManifestValidators.objects.filter(addon__in=ids))
+    jobs = []
+    for id, url in (Webapp.objects.filter(pk__in=ids, is_packaged=False)
+                    .values_list('id', 'manifest_url')):
+        if url:
+            validators = saved[id].get_validators(url) if id in saved else None
+            jobs.append((id, url, validators))
+    return ManifestCrawler(_fetch_manifest_conditionally).crawl(jobs)
+
+
+def _save_validators(webapp, fetched):
+    """Saves the validators of the manifest `fetched`, with its URL."""
+    validators = fetched.validators
+    if not validators:
+        return
+    values = dict(validators, manifest_url=fetched.url)
+    obj, created = ManifestValidators.objects.get_or_create(
+        addon=webapp, defaults=values)
+    if not created and obj.get_validators(fetched.url) != validators:
+        obj.update(**values)
+
+
+def _update_manifest(id, check_hash, failed_fetches, fetched=None):
+    """
+    Updates the app `id` from its manifest, `fetched` already by
+    `_crawl_manifests` or fetched here if None.
+    """
     webapp = Webapp.objects.get(pk=id)
     version = webapp.versions.latest()
     file_ = version.files.latest()
@@ -124,11 +158,15 @@ def _update_manifest(id, check_hash, failed_fetches):
         return
 
     # Fetch manifest, catching and logging any exception.
-    try:
-        content = _fetch_manifest(webapp.manifest_url)
-    except Exception, e:
+    if fetched is None:
+        fetched = ManifestCrawler(_fetch_manifest_conditionally).fetch(
+            webapp.manifest_url)
+    if fetched.not_modified:
+        _log(webapp, u'Manifest not modified')
+        return
+    if fetched.exc_info:
         msg = u'Failed to get manifest from %s. Error: %s' % (
-            webapp.manifest_url, e)
+            webapp.manifest_url, fetched.error)
         failed_fetches[id] = failed_fetches.get(id, 0) + 1
         if failed_fetches[id] == 3:
             # This is our 3rd attempt, let's send the developer(s) an email to
@@ -137,20 +175,22 @@ def _update_manifest(id, check_hash, failed_fetches):
         elif failed_fetches[id] >= 4:
             # This is our 4th attempt, we should already have notified the
             # developer(s). Let's put the app in the re-review queue.
-            _log(webapp, msg, rereview=True, exc_info=True)
+            _log(webapp, msg, rereview=True, exc_info=fetched.exc_info)
             if webapp.status in amo.WEBAPPS_APPROVED_STATUSES:
                 RereviewQueue.flag(webapp, amo.LOG.REREVIEW_MANIFEST_CHANGE,
                                    msg)
             del failed_fetches[id]
         else:
-            _log(webapp, msg, rereview=False, exc_info=True)
+            _log(webapp, msg, rereview=False, exc_info=fetched.exc_info)
         return
+    content = fetched.content
 
     # Check hash.
     if check_hash:
         hash_ = _get_content_hash(content)
         if file_.hash == hash_:
             _log(webapp, u'Manifest the same')
+            _save_validators(webapp, fetched)
             return
         _log(webapp, u'Manifest different')
 
@@ -177,6 +217,9 @@ def _update_manifest(id, check_hash, failed_fetches):
                 notify_developers_of_failure(webapp, msg, has_link=True)
                 RereviewQueue.flag(webapp, amo.LOG.REREVIEW_MANIFEST_CHANGE,
                                    msg)
+            # The same manifest would fail again, don't fetch it until it
+            # changes.
+            _save_validators(webapp, fetched)
             return
     else:
         _log(webapp,
@@ -191,6 +234,8 @@ def _update_manifest(id, check_hash, failed_fetches):
         webapp.manifest_updated(content, upload)
     except:
         _log(webapp, u'Failed to create version', exc_info=True)
+    else:
+        _save_validators(webapp, fetched)
 
     # Check for any name changes at root and in locales. If any were added or
     # updated, send to re-review queue.
@@ -306,10 +351,13 @@ def index_webapps(ids, **kw):
     es = WebappIndexer.get_es(urls=settings.ES_URLS)
     qs = Webapp.indexing_transformer(Webapp.with_deleted.no_cache().filter(
         id__in=ids))
-    for obj in qs:
-        doc = WebappIndexer.extract_document(obj.id, obj)
-        for idx in indices:
-            WebappIndexer.index(doc, id_=obj.id, es=es, index=idx)
+    docs = WebappIndexer.extract_documents(
+        qs, max_downloads=kw.pop('max_downloads', None))
+    if not docs:
+        return
+    for idx in indices:
+        WebappIndexer.bulk_index(docs, es=es, index=idx)
+    invalidate_featured_cache()
 
 
 @task(acks_late=True)
@@ -334,151 +382,7 @@ def unindex_webapps(ids, **kw):
                 # Ignore if it's not there.
                 task_log.info(
                     u'[Webapp:%s] Unindexing app but not found in index' % id_)
-
-
-@task
-def dump_app(id, **kw):
-    from mkt.webapps.api import AppSerializer
-    # Because @robhudson told me to.
-    # Note: not using storage because all these operations should be local.
-    target_dir = os.path.join(settings.DUMPED_APPS_PATH, 'apps',
-                              str(id / 1000))
-    target_file = os.path.join(target_dir, str(id) + '.json')
-
-    try:
-        obj = Webapp.objects.get(pk=id)
-    except Webapp.DoesNotExist:
-        task_log.info(u'Webapp does not exist: {0}'.format(id))
-        return
-
-    req = RequestFactory().get('/')
-    req.user = AnonymousUser()
-    req.REGION = RESTOFWORLD
-
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-
-    task_log.info('Dumping app {0} to {1}'.format(id, target_file))
-    res = AppSerializer(obj, context={'request': req}).data
-    json.dump(res, open(target_file, 'w'), cls=JSONEncoder)
-    return target_file
-
-
-@task
-def clean_apps(pks, **kw):
-    app_dir = os.path.join(settings.DUMPED_APPS_PATH, 'apps')
-    if os.path.exists(app_dir):
-        shutil.rmtree(app_dir)
-    return pks
-
-
-@task(ignore_result=False)
-def dump_apps(ids, **kw):
-    task_log.info(u'Dumping apps {0} to {1}. [{2}]'
-                  .format(ids[0], ids[-1], len(ids)))
-    for id in ids:
-        dump_app(id)
-
-
-@task
-def zip_apps(*args, **kw):
-    # Note: not using storage because all these operations should be local.
-    today = datetime.datetime.today().strftime('%Y-%m-%d')
-    target_dir = os.path.join(settings.DUMPED_APPS_PATH, 'tarballs')
-    target_file = os.path.join(target_dir, today + '.tgz')
-
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-
-    # Put some .txt files in place.
-    context = Context({'date': today, 'url': settings.SITE_URL})
-    files = ['license.txt', 'readme.txt']
-    for f in files:
-        template = loader.get_template('webapps/dump/apps/' + f)
-        dest = os.path.join(settings.DUMPED_APPS_PATH, f)
-        open(dest, 'w').write(template.render(context))
-
-    cmd = ['tar', 'czf', target_file, '-C',
-           settings.DUMPED_APPS_PATH, 'apps'] + files
-    task_log.info(u'Creating app dump {0}'.format(target_file))
-    subprocess.call(cmd)
-    return target_file
-
-
-@task(ignore_result=False)
-def dump_user_installs(ids, **kw):
-    task_log.info(u'Dumping user installs {0} to {1}. [{2}]'
-                  .format(ids[0], ids[-1], len(ids)))
-
-    for user_id in ids:
-        try:
-            user = UserProfile.objects.get(pk=user_id)
-        except UserProfile.DoesNotExist:
-            task_log.info('User profile does not exist: {0}'.format(user_id))
-            continue
-
-        hash = hashlib.sha256('%s%s' % (str(user.id),
-                                        settings.SECRET_KEY)).hexdigest()
-        target_dir = os.path.join(settings.DUMPED_USERS_PATH, 'users', hash[0])
-        target_file = os.path.join(target_dir, '%s.json' % hash)
-
-        if not os.path.exists(target_dir):
-            try:
-                os.makedirs(target_dir)
-            except OSError:
-                pass  # Catch race condition if file exists now.
-
-        # Gather data about user.
-        installed = []
-        zone = pytz.timezone(settings.TIME_ZONE)
-        for install in user.installed_set.filter(addon__type=amo.ADDON_WEBAPP):
-            try:
-                app = install.addon
-            except Addon.DoesNotExist:
-                continue
-
-            installed.append({
-                'id': app.id,
-                'slug': app.app_slug,
-                'installed': pytz.utc.normalize(
-                    zone.localize(install.created)).strftime(
-                        '%Y-%m-%dT%H:%M:%S')
-            })
-
-        data = {
-            'user': hash,
-            'region': user.region,
-            'lang': user.lang,
-            'installed_apps': installed,
-        }
-
-        task_log.info('Dumping user {0} to {1}'.format(user.id, target_file))
-        json.dump(data, open(target_file, 'w'), cls=JSONEncoder)
-
-
-@task
-def zip_users(*args, **kw):
-    # Note: not using storage because all these operations should be local.
-    today = datetime.datetime.utcnow().strftime('%Y-%m-%d')
-    target_dir = os.path.join(settings.DUMPED_USERS_PATH, 'tarballs')
-    target_file = os.path.join(target_dir, '{0}.tgz'.format(today))
-
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-
-    # Put some .txt files in place.
-    context = Context({'date': today, 'url': settings.SITE_URL})
-    files = ['license.txt', 'readme.txt']
-    for f in files:
-        template = loader.get_template('webapps/dump/users/' + f)
-        dest = os.path.join(settings.DUMPED_USERS_PATH, 'users', f)
-        open(dest, 'w').write(template.render(context))
-
-    cmd = ['tar', 'czf', target_file, '-C',
-           settings.DUMPED_USERS_PATH, 'users']
-    task_log.info(u'Creating user dump {0}'.format(target_file))
-    subprocess.call(cmd)
-    return target_file
+    invalidate_featured_cache()
 
 
 def _fix_missing_icons(id):
@@ -605,7 +509,11 @@ def _get_trending(app_id, region=None):
         task_log.info('Call to ES failed: {0}'.format(e))
         count_3 = 0
 
-    if count_3 > 1:
+    return _trending_value(count_1, count_3)
+
+
+def _trending_value(count_1, count_3):
+    if count_1 > 100 and count_3 > 1:
         return (count_1 - count_3) / count_3
     else:
         return 0.0
@@ -725,6 +633,161 @@ def update_downloads(ids, **kw):
                   % (count, len(ids)))
 
 
+def _date_filter(start, end):
+    return {'range': {'date': {'gte': start.strftime('%Y-%m-%d'),
+                               'lte': end.strftime('%Y-%m-%d')}}}
+
+
+def _installs_by_app(client, filters):
+    """
+    Returns {name: {app id: installs}} for each facet filter of `filters`,
+    {name: filter}, with a single Monolith query.
+    """
+    query = {
+        'query': {'match_all': {}},
+        'facets': dict((name, {
+            'terms_stats': {'key_field': 'app-id',
+                            'value_field': 'app_installs',
+                            # All the apps, not only the top 10.
+                            'size': 0},
+            'facet_filter': facet_filter,
+        }) for name, facet_filter in filters.items()),
+        'size': 0}
+    facets = client.raw(query).get('facets', {})
+    # The totals are floats, keep to the integer arithmetic of the counts of
+    # the per-app queries, see `_get_trending`.
+    return dict((name, dict((int(term['term']), int(term['total']))
+                            for term in facets.get(name, {}).get('terms', [])))
+                for name in filters)
+
+
+def get_bulk_trending(client):
+    """
+    Returns {region id: {app id: trending}} for all the apps, region 0 being
+    global trending, see `_get_trending`. Two Monolith queries.
+    """
+    regions = {0: None}
+    for region in mkt.regions.REGIONS_DICT.values():
+        regions[region.id] = {'term': {'region': region.slug}}
+
+    def filters(start, end):
+        return dict((str(region), {'and': filter(None, [
+            _date_filter(start, end), term])})
+            for region, term in regions.items())
+
+    today = datetime.datetime.today()
+    last_week = _installs_by_app(client, filters(days_ago(7), today))
+    previous = _installs_by_app(client, filters(days_ago(28), days_ago(8)))
+
+    trending = {}
+    for region in regions:
+        counts = previous[str(region)]
+        trending[region] = dict(
+            (app, _trending_value(count, counts.get(app, 0) / 3))
+            for app, count in last_week[str(region)].items())
+    return trending
+
+
+def get_bulk_downloads(client):
+    """
+    Returns ({app id: weekly downloads}, {app id: total downloads}) for all
+    the apps, see `update_downloads`. One Monolith query.
+    """
+    counts = _installs_by_app(client, {
+        'weekly': _date_filter(days_ago(8), days_ago(1)),
+        'total': {'match_all': {}},
+    })
+    return counts['weekly'], counts['total']
+
+
+def _bulk_update(model, fields, values, chunk_size=500):
+    """
+    Sets `fields` of the rows of `model` to `values`, {pk: field values},
+    with one UPDATE per chunk of rows.
+    """
+    cursor = connection.cursor()
+    table = connection.ops.quote_name(model._meta.db_table)
+    for chunk in chunked(sorted(values.items()), chunk_size):
+        sets, params = [], []
+        for index, field in enumerate(fields):
+            sets.append('%s = CASE id %s END' % (
+                connection.ops.quote_name(field),
+                ' '.join(['WHEN %s THEN %s'] * len(chunk))))
+            for pk, row in chunk:
+                params.extend([pk, row[index]])
+        params.extend(pk for pk, row in chunk)
+        cursor.execute('UPDATE %s SET %s WHERE id IN (%s)' % (
+            table, ', '.join(sets), ', '.join(['%s'] * len(chunk))), params)
+    # Those updates bypassed cache-machine.
+    model.objects.invalidate(*[model(pk=pk) for pk in values])
+
+
+@write
+def bulk_update_trending():
+    """Updates the trending of all the public apps, see `update_trending`."""
+    start = time.time()
+    try:
+        trending = get_bulk_trending(get_monolith_client())
+    except Exception as e:
+        task_log.info('Call to ES failed: {0}'.format(e))
+        return
+    apps = set(Webapp.objects.no_cache().filter(status=amo.STATUS_PUBLIC)
+                     .values_list('id', flat=True))
+    existing = dict(((addon, region), (pk, value)) for pk, addon, region, value
+                    in Trending.objects.no_cache().values_list(
+                        'id', 'addon', 'region', 'value'))
+
+    # Like `update_trending`, only save values that aren't zero.
+    created, updated = [], {}
+    for region, values in trending.items():
+        for app, value in values.items():
+            if not value or app not in apps:
+                continue
+            if (app, region) not in existing:
+                created.append(Trending(addon_id=app, region=region,
+                                        value=value))
+            elif existing[app, region][1] != value:
+                updated[existing[app, region][0]] = (value,)
+
+    Trending.objects.bulk_create(created, batch_size=500)
+    if updated:
+        _bulk_update(Trending, ['value'], updated)
+    task_log.info('Trending created for %s and updated for %s apps and '
+                  'regions in %.2fs.' % (len(created), len(updated),
+                                         time.time() - start))
+
+
+@write
+def bulk_update_downloads():
+    """
+    Updates the downloads of all the public apps, see `update_downloads`.
+    The apps whose weekly downloads changed get reindexed.
+    """
+    start = time.time()
+    try:
+        weekly, total = get_bulk_downloads(get_monolith_client())
+    except Exception as e:
+        task_log.info('Call to ES failed: {0}'.format(e))
+        return
+    changed, reindex = {}, []
+    for pk, old_weekly, old_total in (
+            Webapp.objects.no_cache().filter(status=amo.STATUS_PUBLIC)
+                  .values_list('id', 'weekly_downloads', 'total_downloads')):
+        new = (int(weekly.get(pk, 0)), int(total.get(pk, 0)))
+        if new != (old_weekly, old_total):
+            changed[pk] = new
+            if new[0] != old_weekly:
+                reindex.append(pk)
+
+    if changed:
+        _bulk_update(Webapp, ['weekly_downloads', 'total_downloads'],
+                     changed)
+    for ids in chunked(reindex, 150):
+        index_webapps.delay(ids)
+    task_log.info('App downloads updated for %s apps in %.2fs.'
+                  % (len(changed), time.time() - start))
+
+
 class PreGenAPKError(Exception):
     """
     An error encountered while trying to pre-generate an APK.
@@ -3,16 +3,19 @@ from django.core.urlresolvers import reverse
 from nose.tools import eq_, ok_
 from test_utils import RequestFactory
 
+import amo
 import amo.tests
+from addons.models import AddonUser
 from constants.payments import PROVIDER_BANGO, PROVIDER_REFERENCE
+from market.models import AddonPurchase
 from mkt.api.tests.test_oauth import BaseOAuth
 from mkt.constants import APP_FEATURES
 from mkt.developers.models import (AddonPaymentAccount, PaymentAccount,
                                    SolitudeSeller)
 from mkt.site.fixtures import fixture
 from mkt.webapps.api import (AppSerializer, AppFeaturesSerializer,
-                             SimpleAppSerializer)
-from mkt.webapps.models import Webapp
+                             SimpleAppSerializer, UserAppState)
+from mkt.webapps.models import Installed, Webapp
 from users.models import UserProfile
 
 
@@ -89,3 +92,58 @@ class TestSimpleAppSerializer(amo.tests.TestCase):
         acct = self.add_pay_account()
         eq_(self.app().data['payment_account'],
             reverse('payment-account-detail', args=[acct.pk]))
+
+
+class TestUserAppState(amo.tests.TestCase):
+    fixtures = fixture('user_2519', 'webapp_337141')
+
+    def setUp(self):
+        self.webapp = Webapp.objects.get(pk=337141)
+        self.other = amo.tests.app_factory()
+        self.user = UserProfile.objects.get(pk=2519)
+        self.request = RequestFactory().get('/')
+        self.request.amo_user = self.user
+
+    def test_anonymous(self):
+        self.request.amo_user = None
+        eq_(UserAppState.for_request(self.request), None)
+        eq_(self.serialize(self.webapp)['user'], None)
+
+    def test_for_request(self):
+        state = UserAppState.for_request(self.request)
+        eq_(UserAppState.for_request(self.request), state)
+        self.request.amo_user = UserProfile.objects.create(username='other')
+        ok_(UserAppState.for_request(self.request) is not state)
+
+    def test_get(self):
+        AddonUser.objects.create(addon=self.webapp, user=self.user)
+        Installed.objects.create(addon=self.other, user=self.user)
+        AddonPurchase.objects.create(addon=self.other, user=self.user,
+                                     type=amo.CONTRIB_PURCHASE)
+        state = UserAppState(self.user)
+        state.add([self.webapp.pk, self.other.pk])
+        with self.assertNumQueries(3):
+            eq_(state.get(self.webapp.pk),
+                {'developed': True, 'installed': False, 'purchased': False})
+            eq_(state.get(self.other.pk),
+                {'developed': False, 'installed': True, 'purchased': True})
+
+    def test_not_added(self):
+        state = UserAppState(self.user)
+        with self.assertNumQueries(3):
+            state.get(self.webapp.pk)
+        with self.assertNumQueries(0):
+            state.get(self.webapp.pk)
+
+    def serialize(self, obj, many=False):
+        return AppSerializer(obj, many=many,
+                             context={'request': self.request}).data
+
+    def test_serializer_many(self):
+        Installed.objects.create(addon=self.other, user=self.user)
+        data = self.serialize(Webapp.objects.filter(
+            pk__in=[self.webapp.pk, self.other.pk]).order_by('pk'),
+            many=True)
+        eq_([d['user']['installed'] for d in data], [False, True])
+        state = UserAppState.for_request(self.request)
+        eq_(state.loaded, set([self.webapp.pk, self.other.pk]))
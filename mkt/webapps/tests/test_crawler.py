@@ -0,0 +1,103 @@
+import threading
+import time
+
+from nose.tools import eq_, ok_
+
+import amo.tests
+from mkt.developers.tasks import _fetch_manifest, ManifestNotModified
+from mkt.webapps import fake_manifests
+from mkt.webapps.crawler import interleave, ManifestCrawler
+
+
+def test_interleave():
+    jobs = [(1, 'http://a.com/1', None), (2, 'http://a.com/2', None),
+            (3, 'http://A.com/3', None), (4, 'http://b.com/4', None),
+            (5, 'http://c.com/5', None), (6, 'http://b.com/6', None)]
+    eq_([job[0] for job in interleave(jobs)], [1, 4, 5, 2, 6, 3])
+
+
+class TestManifestCrawler(amo.tests.TestCase):
+
+    def test_results(self):
+        def fetch(url, validators):
+            if url.endswith('same'):
+                raise ManifestNotModified()
+            if url.endswith('error'):
+                raise ValueError('Oops')
+            validators['etag'] = '"new"'
+            return '{}'
+
+        results = ManifestCrawler(fetch, workers=2).crawl([
+            (1, 'http://a.com/new', {'etag': '"old"'}),
+            (2, 'http://a.com/same', {'etag': '"old"'}),
+            (3, 'http://b.com/error', None)])
+        eq_(results[1].content, '{}')
+        eq_(results[1].validators, {'etag': '"new"'})
+        ok_(results[2].not_modified)
+        eq_(results[2].content, None)
+        ok_(isinstance(results[3].error, ValueError))
+
+    def test_host_concurrency(self):
+        lock = threading.Lock()
+        running = {}
+        most = {}
+
+        def fetch(url, validators):
+            host = url.split('/')[2]
+            with lock:
+                running[host] = running.get(host, 0) + 1
+                most[host] = max(most.get(host, 0), running[host])
+            time.sleep(0.01)
+            with lock:
+                running[host] -= 1
+            return '{}'
+
+        jobs = [(k, 'http://%s.com/%s' % ('ab'[k % 2], k), None)
+                for k in range(20)]
+        results = ManifestCrawler(fetch, workers=6, host_concurrency=2,
+                                  host_interval=0).crawl(jobs)
+        eq_(len(results), 20)
+        eq_(most, {'a.com': 2, 'b.com': 2})
+
+    def test_host_interval(self):
+        starts = []
+
+        def fetch(url, validators):
+            starts.append(time.time())
+            return '{}'
+
+        jobs = [(k, 'http://a.com/%s' % k, None) for k in range(3)]
+        ManifestCrawler(fetch, workers=3, host_concurrency=3,
+                        host_interval=0.05).crawl(jobs)
+        starts.sort()
+        ok_(starts[2] - starts[0] >= 0.1, starts)
+
+
+class TestConditionalFetch(amo.tests.TestCase):
+
+    def setUp(self):
+        self.server, url = fake_manifests.start()
+        self.addCleanup(self.server.shutdown)
+        self.manifests = self.server.get_app()
+        self.url = url + '/1/manifest.webapp'
+        self.crawler = ManifestCrawler(
+            lambda url, validators: _fetch_manifest(url,
+                                                    validators=validators))
+
+    def test_not_modified(self):
+        result = self.crawler.fetch(self.url, {})
+        eq_(result.content, self.manifests.manifest(1))
+        ok_(result.validators['etag'])
+        eq_(result.validators['last_modified'], self.manifests.last_modified)
+
+        result = self.crawler.fetch(self.url, result.validators)
+        ok_(result.not_modified)
+        eq_(self.manifests.not_modified, 1)
+
+    def test_modified(self):
+        validators = self.crawler.fetch(self.url, {}).validators
+        self.manifests.versions[1] = '2.0'
+        result = self.crawler.fetch(self.url, validators)
+        eq_(result.content, self.manifests.manifest(1))
+        ok_(result.validators['etag'] != validators['etag'])
+        eq_(self.manifests.not_modified, 0)
@@ -7,7 +7,7 @@ from django.core.files.storage import default_storage as storage
 from django.core.management import call_command
 
 import mock
-from nose.tools import eq_
+from nose.tools import eq_, ok_
 
 import amo
 import amo.tests
@@ -15,10 +15,10 @@ from addons.models import Addon
 
 import mkt
 from mkt.site.fixtures import fixture
-from mkt.webapps.cron import (clean_old_signed, update_app_trending,
-                              update_downloads)
-from mkt.webapps.models import Webapp
-from mkt.webapps.tasks import _get_trending
+from mkt.webapps.cron import (bulk_update_app_stats, clean_old_signed,
+                              update_app_trending, update_downloads)
+from mkt.webapps.models import Trending, Webapp
+from mkt.webapps.tasks import _get_trending, get_bulk_trending
 
 
 class TestWeeklyDownloads(amo.tests.TestCase):
@@ -202,3 +202,105 @@ class TestUpdateTrending(amo.tests.TestCase):
         client.side_effect = ValueError
         _mock.return_value = client
         eq_(_get_trending(self.app.id), 0.0)
+
+
+class TestBulkUpdateAppStats(amo.tests.TestCase):
+
+    def setUp(self):
+        self.app = Webapp.objects.create(type=amo.ADDON_WEBAPP,
+                                         status=amo.STATUS_PUBLIC)
+        self.other = Webapp.objects.create(type=amo.ADDON_WEBAPP,
+                                           status=amo.STATUS_PENDING)
+        self.monolith = mock.Mock()
+        self.monolith.raw.side_effect = self.raw
+        # {facet name: {app id: total}}, for the current and the previous
+        # weeks of the trending queries, then the downloads query.
+        self.installs = [{}, {}, {}]
+        patcher = mock.patch('mkt.webapps.tasks.get_monolith_client')
+        patcher.start().return_value = self.monolith
+        self.addCleanup(patcher.stop)
+
+    def raw(self, query):
+        installs = self.installs[self.monolith.raw.call_count - 1]
+        return {'facets': dict(
+            (name, {'_type': 'terms_stats', 'terms': [
+                {'term': app_id, 'count': 1, 'total': total}
+                for app_id, total in installs.get(name, {}).items()]})
+            for name in query['facets'])}
+
+    def set_trending(self, current, previous):
+        regions = ['0'] + [str(r.id) for r in
+                           mkt.regions.REGIONS_DICT.values()]
+        self.installs[0] = dict((r, current) for r in regions)
+        self.installs[1] = dict((r, previous) for r in regions)
+
+    def test_get_bulk_trending(self):
+        # Same as `test_get_trending`, 255 installs this week and 255 over
+        # the 3 previous weeks: (255 - 85) / 85 = 2.0
+        self.set_trending({self.app.id: 255.0, self.other.id: 99.0},
+                          {self.app.id: 255.0})
+        trending = get_bulk_trending(self.monolith)
+        eq_(self.monolith.raw.call_count, 2)
+        eq_(trending[0], {self.app.id: 2.0, self.other.id: 0.0})
+        for region in mkt.regions.REGIONS_DICT.values():
+            eq_(trending[region.id][self.app.id], 2.0)
+
+    def test_get_bulk_trending_rounded(self):
+        # Integer divisions, as for the per-app trending: 256 / 3 = 85 and
+        # (256 - 85) / 85 = 2.
+        self.set_trending({self.app.id: 256.0}, {self.app.id: 256.0})
+        eq_(get_bulk_trending(self.monolith)[0][self.app.id], 2)
+        self.monolith.side_effect = [[{'count': 256}], [{'count': 256}]]
+        eq_(_get_trending(self.app.id), 2)
+
+    def test_trending_saved(self):
+        self.set_trending({self.app.id: 255.0, self.other.id: 255.0},
+                          {self.app.id: 255.0, self.other.id: 255.0})
+        bulk_update_app_stats()
+        eq_(self.app.get_trending(), 2.0)
+        for region in mkt.regions.REGIONS_DICT.values():
+            eq_(self.app.get_trending(region=region), 2.0)
+        # Only public apps get their trending saved.
+        eq_(Trending.objects.filter(addon=self.other).count(), 0)
+
+        # Running again updates the values.
+        self.monolith.raw.reset_mock()
+        self.set_trending({self.app.id: 1020.0}, {self.app.id: 1020.0})
+        bulk_update_app_stats()
+        eq_(Trending.objects.get(addon=self.app, region=0).value, 2.0)
+        self.set_trending({self.app.id: 1020.0}, {self.app.id: 255.0})
+        self.monolith.raw.reset_mock()
+        bulk_update_app_stats()
+        eq_(Trending.objects.get(addon=self.app, region=0).value, 11.0)
+        eq_(Trending.objects.filter(addon=self.app).count(),
+            len(mkt.regions.REGIONS_DICT) + 1)
+
+    @mock.patch('mkt.webapps.tasks.index_webapps')
+    def test_downloads_saved(self, index_webapps):
+        self.installs[2] = {'weekly': {self.app.id: 255.0},
+                            'total': {self.app.id: 6638.0,
+                                      self.other.id: 12.0}}
+        bulk_update_app_stats()
+        eq_(self.monolith.raw.call_count, 3)
+        app = Webapp.objects.no_cache().get(pk=self.app.pk)
+        eq_(app.weekly_downloads, 255)
+        eq_(app.total_downloads, 6638)
+        eq_(Webapp.objects.no_cache().get(pk=self.other.pk).total_downloads,
+            0)
+        index_webapps.delay.assert_called_with([self.app.pk])
+
+        # Only the total changed, no need to reindex.
+        index_webapps.reset_mock()
+        self.monolith.raw.reset_mock()
+        self.installs[2]['total'][self.app.id] = 6700.0
+        bulk_update_app_stats()
+        eq_(Webapp.objects.no_cache().get(pk=self.app.pk).total_downloads,
+            6700)
+        ok_(not index_webapps.delay.called)
+
+    def test_monolith_error(self):
+        self.monolith.raw.side_effect = Exception
+        bulk_update_app_stats()
+        eq_(Trending.objects.count(), 0)
+        eq_(Webapp.objects.no_cache().get(pk=self.app.pk).weekly_downloads,
+            0)
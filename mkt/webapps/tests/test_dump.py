@@ -0,0 +1,127 @@
+import datetime
+import json
+import os
+import tarfile
+
+from django.conf import settings
+
+import mock
+from nose.tools import eq_, ok_
+
+import amo
+import amo.tests
+from users.models import UserProfile
+
+from mkt.site.fixtures import fixture
+from mkt.webapps.dump import (AppsDump, TarballWriter, user_hash,
+                              user_installs, write_dump)
+from mkt.webapps.models import Webapp
+
+
+def read(path, name):
+    return tarfile.open(path).extractfile(name).read()
+
+
+class TestTarballWriter(amo.tests.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(settings.TMP_PATH, 'dump-test.tgz')
+        self.addCleanup(lambda: os.path.exists(self.path) and
+                        os.remove(self.path))
+
+    def test_write(self):
+        writer = TarballWriter(self.path, resume=False)
+        writer.write_chunk([('a.json', '{}'), ('b/c.json', '[1]')], 3)
+        writer.write_chunk([('d.json', '2')], 4)
+        writer.close()
+        eq_(tarfile.open(self.path).getnames(), ['a.json', 'b/c.json',
+                                                 'd.json'])
+        eq_(read(self.path, 'b/c.json'), '[1]')
+        ok_(not os.path.exists(writer.part))
+        ok_(not os.path.exists(writer.checkpoint_path))
+
+    def test_resume(self):
+        writer = TarballWriter(self.path)
+        writer.write_chunk([('a.json', '1')], 1)
+        # Failed while writing the next chunk.
+        writer.fileobj.write('half a chunk')
+        writer.fileobj.close()
+
+        writer = TarballWriter(self.path)
+        ok_(writer.resumed)
+        eq_(writer.checkpoint['last_id'], 1)
+        writer.write_chunk([('b.json', '2')], 2)
+        writer.close()
+        eq_(tarfile.open(self.path).getnames(), ['a.json', 'b.json'])
+
+    def test_no_resume(self):
+        writer = TarballWriter(self.path)
+        writer.write_chunk([('a.json', '1')], 1)
+        writer.fileobj.close()
+
+        writer = TarballWriter(self.path, resume=False)
+        ok_(not writer.resumed)
+        writer.close()
+        eq_(tarfile.open(self.path).getnames(), [])
+
+
+class TestWriteDump(amo.tests.TestCase):
+    fixtures = fixture('user_2519', 'webapp_337141')
+
+    def setUp(self):
+        self.app = Webapp.objects.get(pk=337141)
+        self.user = UserProfile.objects.get(pk=2519)
+
+    def test_apps(self):
+        second = amo.tests.app_factory(status=amo.STATUS_PUBLIC)
+        amo.tests.app_factory(status=amo.STATUS_PENDING)
+        path, count = write_dump('apps', chunk_size=1)
+        eq_(count, 2)
+        names = tarfile.open(path).getnames()
+        eq_(names, ['license.txt', 'readme.txt', 'apps/337/337141.json',
+                    'apps/%s/%s.json' % (second.id / 1000, second.id)])
+        eq_(json.loads(read(path, names[2]))['id'], 337141)
+
+    def test_apps_resumed(self):
+        second = amo.tests.app_factory(status=amo.STATUS_PUBLIC)
+        entries = AppsDump.entries
+        with mock.patch.object(AppsDump, 'entries') as patched:
+            patched.side_effect = [entries(AppsDump(), [337141]),
+                                   ValueError('Oops')]
+            with self.assertRaises(ValueError):
+                write_dump('apps', chunk_size=1)
+
+        with mock.patch.object(AppsDump, 'entries') as patched:
+            patched.side_effect = lambda ids: entries(AppsDump(), ids)
+            path, count = write_dump('apps', chunk_size=1)
+        eq_(count, 1)
+        patched.assert_called_once_with([second.id])
+        eq_(len(tarfile.open(path).getnames()), 4)
+
+    def test_users(self):
+        self.app.installed.create(user=self.user)
+        deleted = amo.tests.app_factory()
+        deleted.installed.create(user=self.user)
+        deleted.delete()
+
+        path, count = write_dump('users')
+        eq_(count, 1)
+        hash = user_hash(self.user.pk)
+        ok_('users/license.txt' in tarfile.open(path).getnames())
+        data = json.loads(read(path, 'users/%s/%s.json' % (hash[0], hash)))
+        eq_(data['user'], hash)
+        eq_(data['lang'], self.user.lang)
+        eq_([app['id'] for app in data['installed_apps']], [self.app.id])
+
+    def test_user_installs(self):
+        self.app.installed.create(user=self.user)
+        data = user_installs([self.user.pk])[self.user.pk]
+        eq_(data['user'], user_hash(self.user.pk))
+        eq_(data['region'], self.user.region)
+        installed = data['installed_apps'][0]
+        eq_(installed['id'], self.app.id)
+        eq_(installed['slug'], self.app.app_slug)
+        self.assertCloseToNow(
+            datetime.datetime.strptime(installed['installed'],
+                                       '%Y-%m-%dT%H:%M:%S'),
+            datetime.datetime.utcnow())
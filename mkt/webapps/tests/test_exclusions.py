@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import connection
+
+import mock
+from nose.tools import eq_, ok_
+
+import amo.tests
+from amo.tests import app_factory
+
+import mkt
+from mkt.webapps import exclusions
+from mkt.webapps.exclusions import get_exclusions, RegionExclusions
+from mkt.webapps.models import AddonExcludedRegion, get_excluded_in
+
+
+BR = mkt.regions.BR.id
+DE = mkt.regions.DE.id
+US = mkt.regions.US.id
+
+
+def test_set_app():
+    excl = RegionExclusions()
+    excl.set_app(5, [BR, DE])
+    excl.set_app(3, [BR])
+    excl.set_app(9, [BR])
+    eq_(list(excl.excluded_in(BR)), [3, 5, 9])
+    eq_(list(excl.excluded_in(DE)), [5])
+    eq_(list(excl.excluded_in(US)), [])
+    ok_(excl.is_excluded(BR, 3))
+    ok_(not excl.is_excluded(DE, 3))
+    ok_(not excl.is_excluded(US, 3))
+    eq_(excl.region_ids(5), sorted([BR, DE]))
+    eq_(len(excl), 4)
+
+    excl.set_app(5, [DE])
+    eq_(list(excl.excluded_in(BR)), [3, 9])
+    eq_(excl.region_ids(5), [DE])
+    excl.set_app(5, [])
+    eq_(excl.region_ids(5), [])
+    eq_(len(excl), 2)
+
+
+class TestRegionExclusions(amo.tests.TestCase):
+
+    def setUp(self):
+        self.app = app_factory()
+
+    def test_load(self):
+        AddonExcludedRegion.objects.create(addon=self.app, region=US)
+        self.app._geodata.update(region_de_usk_exclude=True)
+        excl = RegionExclusions.load()
+        eq_(list(excl.excluded_in(US)), [self.app.id])
+        eq_(list(excl.excluded_in(DE)), [self.app.id])
+        eq_(list(excl.excluded_in(BR)), [])
+
+    def test_refreshed_from_signals(self):
+        ok_(not get_exclusions().is_excluded(US, self.app.id))
+        with mock.patch.object(RegionExclusions, 'load') as load:
+            aer = AddonExcludedRegion.objects.create(addon=self.app,
+                                                     region=US)
+            ok_(get_exclusions().is_excluded(US, self.app.id))
+            self.app._geodata.update(region_br_iarc_exclude=True)
+            eq_(self.app.get_excluded_region_ids(), sorted([BR, US]))
+            aer.delete()
+            eq_(self.app.get_excluded_region_ids(), [BR])
+            # Updated in place, without reloading everything.
+            ok_(not load.called)
+        eq_(get_excluded_in(BR), set([self.app.id]))
+
+    def test_reloaded_when_changed_elsewhere(self):
+        get_exclusions()
+        AddonExcludedRegion.objects.create(addon=self.app, region=US)
+        # Another process changed the exclusions.
+        cache.incr(exclusions.VERSION_KEY)
+        with mock.patch.object(RegionExclusions, 'load') as load:
+            load.return_value = RegionExclusions()
+            get_exclusions()
+            eq_(load.call_count, 1)
+            get_exclusions()
+            eq_(load.call_count, 1)
+
+    def test_published_after_the_request(self):
+        get_exclusions()
+        version = cache.get(exclusions.VERSION_KEY)
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            AddonExcludedRegion.objects.create(addon=self.app, region=US)
+        # Not committed yet, other processes mustn't reload.
+        eq_(cache.get(exclusions.VERSION_KEY), version)
+        request_finished.send(sender=self.__class__)
+        eq_(cache.get(exclusions.VERSION_KEY), version + 1)
+        ok_(get_exclusions().is_excluded(US, self.app.id))
+
+    def test_reloaded_periodically(self):
+        get_exclusions()
+        with mock.patch.object(RegionExclusions, 'load') as load:
+            load.return_value = RegionExclusions()
+            get_exclusions()
+            ok_(not load.called)
+            with self.settings(REGION_EXCLUSIONS_RELOAD_INTERVAL=0):
+                get_exclusions()
+            eq_(load.call_count, 1)
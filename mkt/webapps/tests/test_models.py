@@ -12,8 +12,9 @@ from datetime import datetime, timedelta
 from django.conf import settings
 from django.core import mail
 from django.core.files.storage import default_storage as storage
+from django.db import connection
 from django.db.models.signals import post_delete, post_save
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.utils.translation import ugettext_lazy as _
 
 import mock
@@ -38,6 +39,7 @@ from lib.crypto.tests import mock_sign
 from lib.iarc.utils import (DESC_MAPPING, INTERACTIVES_MAPPING,
                             REVERSE_DESC_MAPPING, REVERSE_INTERACTIVES_MAPPING)
 from market.models import AddonPremium, Price
+from tags.models import AddonTag, Tag
 from users.models import UserProfile
 from versions.models import update_status, Version
 
@@ -1875,6 +1877,26 @@ class TestWebappIndexer(amo.tests.TestCase):
         obj, doc = self._get_doc()
         eq_(doc['device'], [device])
 
+    def test_extract_tags(self):
+        for tag in (Tag.objects.create(tag_text='tag'),
+                    Tag.objects.create(tag_text='blacklisted',
+                                       blacklisted=True)):
+            AddonTag.objects.create(addon=self.app, tag=tag)
+        obj, doc = self._get_doc()
+        eq_(doc['tags'], ['tag'])
+
+    def test_indexing_transformer_queries(self):
+        cat = Category.objects.create(name='c', type=amo.ADDON_WEBAPP)
+        AddonCategory.objects.create(addon=self.app, category=cat)
+        AddonTag.objects.create(addon=self.app,
+                                tag=Tag.objects.create(tag_text='tag'))
+        qs = Webapp.indexing_transformer(
+            Webapp.objects.no_cache().filter(id__in=[self.app.pk]))
+        obj = list(qs)[0]
+        with self.assertNumQueries(0):
+            eq_([c.slug for c in obj.categories.all()], [cat.slug])
+            eq_([t.tag_text for t in obj.tags.all()], ['tag'])
+
     def test_extract_features(self):
         enabled = ('has_apps', 'has_sms', 'has_geolocation')
         self.app.current_version.features.update(
@@ -1890,6 +1912,14 @@ class TestWebappIndexer(amo.tests.TestCase):
         self.assertSetEqual(doc['region_exclusions'],
                             set([mkt.regions.BR.id, mkt.regions.UK.id]))
 
+    @mock.patch('mkt.webapps.models.get_exclusions')
+    def test_extract_regions_from_master(self, get_exclusions):
+        # The exclusions in memory weren't reloaded yet.
+        get_exclusions.return_value.region_ids.return_value = []
+        self.app.addonexcludedregion.create(region=mkt.regions.BR.id)
+        obj, doc = self._get_doc()
+        eq_(list(doc['region_exclusions']), [mkt.regions.BR.id])
+
     def test_extract_supported_locales(self):
         locales = 'en-US,es,pt-BR'
         self.app.current_version.update(supported_locales=locales)
@@ -1950,6 +1980,55 @@ class TestWebappIndexer(amo.tests.TestCase):
         eq_(doc['release_notes_translations'][1],
             {'lang': 'fr', 'string': release_notes['fr']})
 
+    def test_extract_popularity(self):
+        user = UserProfile.objects.create(username='popular')
+        Installed.objects.create(addon=self.app, user=user)
+        obj, doc = self._get_doc()
+        eq_(doc['popularity'], 1)
+        eq_(doc['popularity_%s' % mkt.regions.BR.id], 1)
+
+    def test_extract_owners(self):
+        obj, doc = self._get_doc()
+        eq_(doc['owners'], [au.user_id for au in self.app.addonuser_set.filter(
+            role=amo.AUTHOR_ROLE_OWNER)])
+
+    def test_extract_weight(self):
+        self.app.update(weekly_downloads=10)
+        app_factory(weekly_downloads=20)
+        obj, doc = self._get_doc()
+        eq_(doc['weight'], 3)
+
+    def test_extract_weight_max_downloads(self):
+        self.app.update(weekly_downloads=10)
+        qs = Webapp.indexing_transformer(
+            Webapp.objects.no_cache().filter(id__in=[self.app.pk]))
+        doc = WebappIndexer.extract_documents(qs, max_downloads=100.0)[0]
+        eq_(doc['weight'], 1)
+
+    def test_extract_documents(self):
+        app2 = app_factory()
+        EscalationQueue.objects.create(addon=app2)
+        qs = Webapp.indexing_transformer(
+            Webapp.objects.no_cache().filter(id__in=[self.app.pk, app2.pk]))
+        docs = dict((d['id'], d) for d in WebappIndexer.extract_documents(qs))
+        for obj in qs:
+            eq_(docs[obj.id], WebappIndexer.extract_document(obj.pk, obj))
+        eq_(docs[self.app.pk]['is_escalated'], False)
+        eq_(docs[app2.pk]['is_escalated'], True)
+
+    def test_get_indexing_data_queries(self):
+        # The number of queries doesn't depend on the number of apps.
+        def get_num_queries(apps):
+            qs = list(Webapp.indexing_transformer(
+                Webapp.objects.no_cache().filter(
+                    id__in=[app.pk for app in apps])))
+            with CaptureQueriesContext(connection) as context:
+                WebappIndexer.get_indexing_data(qs)
+            return len(context.captured_queries)
+
+        apps = [app_factory() for i in range(3)]
+        eq_(get_num_queries(apps[:1]), get_num_queries(apps))
+
 
 class TestRatingDescriptors(DynamicBoolFieldsTestMixin, amo.tests.TestCase):
 
@@ -1,9 +1,7 @@
 # -*- coding: utf-8 -*-
 import datetime
-import hashlib
 import json
 import os
-import stat
 from copy import deepcopy
 
 from django.conf import settings
@@ -27,13 +25,11 @@ from users.models import UserProfile
 from versions.models import Version
 
 from mkt.site.fixtures import fixture
-from mkt.webapps.models import Webapp
-from mkt.webapps.tasks import (dump_app, dump_user_installs,
-                               notify_developers_of_failure,
+from mkt.webapps.models import ManifestValidators, Webapp
+from mkt.webapps.tasks import (notify_developers_of_failure,
                                pre_generate_apk,
                                PreGenAPKError,
-                               update_manifests,
-                               zip_apps)
+                               update_manifests)
 
 
 original = {
@@ -312,6 +308,40 @@ class TestUpdateManifest(amo.tests.TestCase):
         assert not retry.called
         assert RereviewQueue.objects.filter(addon=self.addon).exists()
 
+    def test_validators_saved(self):
+        self._hash = ohash
+        self.response_mock.headers['etag'] = '"abc"'
+        self._run()
+        validators = ManifestValidators.objects.get(addon=self.addon)
+        eq_(validators.manifest_url, self.addon.manifest_url)
+        eq_(validators.etag, '"abc"')
+        eq_(validators.last_modified, None)
+
+    def test_not_modified(self):
+        ManifestValidators.objects.create(
+            addon=self.addon, manifest_url=self.addon.manifest_url,
+            etag='"abc"')
+        self.response_mock.status_code = 304
+        self._run()
+        eq_(self.req_mock.call_args[1]['headers'], {'If-None-Match': '"abc"'})
+        ok_(not self.validator.called)
+        eq_(FileUpload.objects.count(), 0)
+
+    def test_validators_not_sent_for_another_url(self):
+        ManifestValidators.objects.create(
+            addon=self.addon, manifest_url='http://old.example.com/manifest',
+            etag='"abc"')
+        self._run()
+        ok_('headers' not in self.req_mock.call_args[1])
+
+    def test_validators_not_sent_without_check_hash(self):
+        ManifestValidators.objects.create(
+            addon=self.addon, manifest_url=self.addon.manifest_url,
+            etag='"abc"')
+        self._run(check_hash=False)
+        ok_('headers' not in self.req_mock.call_args[1])
+        ok_(self.validator.called)
+
     @mock.patch('mkt.webapps.models.Webapp.set_iarc_storefront_data')
     def test_manifest_validation_failure(self, _iarc):
         # We are already mocking validator, but this test needs to make sure
@@ -504,90 +534,6 @@ class TestUpdateManifest(amo.tests.TestCase):
         ok_(_iarc.called)
 
 
-class TestDumpApps(amo.tests.TestCase):
-    fixtures = fixture('webapp_337141')
-
-    def test_dump_app(self):
-        fn = dump_app(337141)
-        result = json.load(open(fn, 'r'))
-        eq_(result['id'], 337141)
-
-    def test_zip_apps(self):
-        dump_app(337141)
-        fn = zip_apps()
-        for f in ['license.txt', 'readme.txt']:
-            ok_(os.path.exists(os.path.join(settings.DUMPED_APPS_PATH, f)))
-        ok_(os.stat(fn)[stat.ST_SIZE])
-
-    @mock.patch('mkt.webapps.tasks.dump_app')
-    def test_not_public(self, dump_app):
-        app = Addon.objects.get(pk=337141)
-        app.update(status=amo.STATUS_PENDING)
-        call_command('process_addons', task='dump_apps')
-        assert not dump_app.called
-
-    def test_removed(self):
-        # At least one public app must exist for dump_apps to run.
-        amo.tests.app_factory(name='second app', status=amo.STATUS_PUBLIC)
-        app_path = os.path.join(settings.DUMPED_APPS_PATH, 'apps', '337',
-                                '337141.json')
-        app = Addon.objects.get(pk=337141)
-        app.update(status=amo.STATUS_PUBLIC)
-        call_command('process_addons', task='dump_apps')
-        assert os.path.exists(app_path)
-
-        app.update(status=amo.STATUS_PENDING)
-        call_command('process_addons', task='dump_apps')
-        assert not os.path.exists(app_path)
-
-    @mock.patch('mkt.webapps.tasks.dump_app')
-    def test_public(self, dump_app):
-        call_command('process_addons', task='dump_apps')
-        assert dump_app.called
-
-
-class TestDumpUserInstalls(amo.tests.TestCase):
-    fixtures = fixture('user_2519', 'webapp_337141')
-
-    def setUp(self):
-        # Create a user install.
-        self.app = Webapp.objects.get(pk=337141)
-        self.user = UserProfile.objects.get(pk=2519)
-        self.app.installed.create(user=self.user)
-        self.hash = hashlib.sha256('%s%s' % (str(self.user.pk),
-                                             settings.SECRET_KEY)).hexdigest()
-        self.path = os.path.join(settings.DUMPED_USERS_PATH, 'users',
-                                 self.hash[0], '%s.json' % self.hash)
-
-    def dump_and_load(self):
-        dump_user_installs([self.user.pk])
-        return json.load(open(self.path, 'r'))
-
-    def test_dump_user_installs(self):
-        data = self.dump_and_load()
-        eq_(data['user'], self.hash)
-        eq_(data['region'], self.user.region)
-        eq_(data['lang'], self.user.lang)
-        installed = data['installed_apps'][0]
-        eq_(installed['id'], self.app.id)
-        eq_(installed['slug'], self.app.app_slug)
-        self.assertCloseToNow(
-            datetime.datetime.strptime(installed['installed'],
-                                       '%Y-%m-%dT%H:%M:%S'),
-            datetime.datetime.utcnow())
-
-    def test_dump_exludes_deleted(self):
-        """We can't recommend deleted apps, so don't include them."""
-        app = amo.tests.app_factory()
-        app.installed.create(user=self.user)
-        app.delete()
-
-        data = self.dump_and_load()
-        eq_(len(data['installed_apps']), 1)
-        installed = data['installed_apps'][0]
-        eq_(installed['id'], self.app.id)
-
-
 class TestFixMissingIcons(amo.tests.TestCase):
     fixtures = fixture('webapp_337141')
 
@@ -0,0 +1,82 @@
+"""
+Time the add-on recommendations of the recs cron on synthetic data: the
+inverted index of recommend.SimilarityIndex, in one or more processes, versus
+the previous comparison of every add-on with every other one.
+
+The previous loop is only run on a sample of add-ons and extrapolated, it
+would take hours at the default size, about 10x the current catalog:
+
+    python scripts/benchmark_recs.py --addons=100000 --processes=4
+"""
+import array
+import operator
+import os
+import random
+import sys
+import time
+from optparse import OptionParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'lib'))
+
+import recommend  # noqa
+
+
+def make_addons(count, collections, max_size):
+    """
+    Returns {addon: array of collections}, the add-ons being in 4 to
+    `max_size` collections, the first collections being the most popular.
+    """
+    rand = random.Random(0)
+    addons = {}
+    for addon in xrange(count):
+        size = rand.randint(4, max_size)
+        cs = set(int(collections * rand.random() ** 2)
+                 for _ in xrange(size))
+        addons[addon] = array.array('l', sorted(cs))
+    return addons
+
+
+def quadratic(addons, sample):
+    sim = recommend.similarity
+    for addon in sample:
+        xs = [(other, sim(addons[addon], cs))
+              for other, cs in addons.iteritems()]
+        others = sorted(xs, key=operator.itemgetter(1), reverse=True)
+        [(k, v) for k, v in others[:11] if k != addon]
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--addons', type='int', default=100000)
+    parser.add_option('--collections', type='int', default=200000)
+    parser.add_option('--max-size', type='int', default=40,
+                      help='Maximum number of collections of an add-on.')
+    parser.add_option('--processes', type='int', default=4)
+    parser.add_option('--sample', type='int', default=10,
+                      help='Number of add-ons compared with the previous '
+                           'loop.')
+    options, args = parser.parse_args()
+
+    start = time.time()
+    addons = make_addons(options.addons, options.collections,
+                         options.max_size)
+    print '%s add-ons generated in %.2fs' % (len(addons), time.time() - start)
+
+    start = time.time()
+    quadratic(addons, sorted(addons)[:options.sample])
+    elapsed = time.time() - start
+    print 'previous loop: %.2fs for %s add-ons, about %.0fs for all' % (
+        elapsed, options.sample, elapsed / options.sample * len(addons))
+
+    for processes in sorted(set([1, options.processes])):
+        start = time.time()
+        count = sum(1 for _ in recommend.all_top(addons,
+                                                 processes=processes))
+        elapsed = time.time() - start
+        print 'index, %s process(es): %.2fs for %s add-ons, %.0f/sec' % (
+            processes, elapsed, count, count / elapsed)
+
+
+if __name__ == '__main__':
+    main()
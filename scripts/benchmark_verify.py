@@ -0,0 +1,65 @@
+"""
+Time the decoding of receipts by the verify service, loading the receipt
+verifier and key for every receipt as before, then from the in-process cache,
+and report the latency percentiles of both.
+
+The file contains one receipt per line, as posted to the verify service:
+
+    python scripts/benchmark_verify.py receipts.txt --repeat=10
+
+The settings are those of the verify service, for SIGNING_SERVER_ACTIVE,
+SIGNING_VALID_ISSUERS and WEBAPPS_RECEIPT_KEY.
+"""
+import os
+import sys
+import time
+from optparse import OptionParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ('services', 'apps', ''):
+    sys.path.insert(0, os.path.join(ROOT, path))
+
+import verify  # noqa
+
+
+def percentile(timings, percent):
+    return timings[min(len(timings) - 1, int(len(timings) * percent / 100))]
+
+
+def run(receipts, reload):
+    timings, errors = [], 0
+    for receipt in receipts:
+        if reload:
+            verify.reload_certs()
+        start = time.time()
+        try:
+            verify.decode_receipt(receipt)
+        except Exception:
+            errors += 1
+        timings.append((time.time() - start) * 1000)
+    return sorted(timings), errors
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] RECEIPTS')
+    parser.add_option('--repeat', type='int', default=1,
+                      help='Number of times each receipt is decoded.')
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('A file of receipts is required.')
+
+    receipts = [line.strip() for line in open(args[0]) if line.strip()]
+    receipts = receipts * options.repeat
+
+    for name, reload in (('uncached', True), ('cached', False)):
+        verify.reload_certs()
+        timings, errors = run(receipts, reload)
+        print ('%s: %s receipts, %s errors, mean %.2fms, p50 %.2fms, '
+               'p99 %.2fms, max %.2fms' % (
+                   name, len(timings), errors,
+                   sum(timings) / len(timings), percentile(timings, 50),
+                   percentile(timings, 99), timings[-1]))
+
+
+if __name__ == '__main__':
+    main()
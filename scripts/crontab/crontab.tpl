@@ -6,10 +6,14 @@ HOME=/tmp
 
 # Every minute!
 * * * * * %(z_cron)s fast_current_version
+* * * * * %(django)s load_monolith_spool --settings=settings_local_mkt
 
 # Every 30 minutes.
 */30 * * * * %(z_cron)s update_addons_current_version
 
+# Every 10 minutes.
+*/10 * * * * %(z_cron)s reconcile_queue_counts_cron --settings=settings_local_mkt
+
 #once per hour
 5 * * * * %(z_cron)s update_collections_subscribers
 10 * * * * %(z_cron)s update_blog_posts
@@ -40,14 +44,14 @@ HOME=/tmp
 05 8 * * * %(z_cron)s email_daily_ratings --settings=settings_local_mkt
 10 8 * * * %(z_cron)s update_monolith_stats `/bin/date -d 'yesterday' +\%%Y-\%%m-\%%d`
 15 8 * * * %(z_cron)s process_iarc_changes --settings=settings_local_mkt
-30 8 * * * %(z_cron)s dump_user_installs_cron --settings=settings_local_mkt
-00 9 * * * %(z_cron)s update_app_downloads --settings=settings_local_mkt
+30 8 * * * %(django)s dump_public_data --dump=users --settings=settings_local_mkt
+00 9 * * * %(z_cron)s bulk_update_app_stats --settings=settings_local_mkt
 30 9 * * * %(z_cron)s update_user_ratings
 50 9 * * * %(z_cron)s gc
 45 9 * * * %(z_cron)s mkt_gc --settings=settings_local_mkt
 45 9 * * * %(z_cron)s clean_old_signed --settings=settings_local_mkt
 45 10 * * * %(django)s process_addons --task=update_manifests --settings=settings_local_mkt
-45 11 * * * %(django)s process_addons --task=dump_apps --settings=settings_local_mkt
+45 11 * * * %(django)s dump_public_data --dump=apps --settings=settings_local_mkt
 30 12 * * * %(z_cron)s cleanup_synced_collections
 30 13 * * * %(z_cron)s expired_resetcode
 30 14 * * * %(z_cron)s category_totals
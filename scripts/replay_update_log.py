@@ -0,0 +1,66 @@
+"""
+Replay a log of update service queries against the WSGI app, and report the
+throughput and the hit rate of the response cache.
+
+The log contains one query string per line, for instance the part after the
+"?" of the requests to /update/VersionCheck.php in the access logs:
+
+    python scripts/replay_update_log.py queries.log --repeat=3
+
+The app talks to the database configured in SERVICES_DATABASE.
+"""
+import os
+import sys
+import time
+from optparse import OptionParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ('services', 'apps', ''):
+    sys.path.insert(0, os.path.join(ROOT, path))
+
+import update  # noqa
+
+
+def replay(queries):
+    statuses = {}
+
+    def start_response(status, headers):
+        statuses[status] = statuses.get(status, 0) + 1
+
+    for query in queries:
+        update.application({'QUERY_STRING': query}, start_response)
+    return statuses
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] QUERY_LOG')
+    parser.add_option('--repeat', type='int', default=1,
+                      help='Number of times the log is replayed.')
+    parser.add_option('--no-cache', action='store_true', default=False,
+                      help='Disable the response cache.')
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('A query log is required.')
+
+    queries = [line.strip() for line in open(args[0]) if line.strip()]
+    if options.no_cache:
+        update.update_cache.size = 0
+
+    start = time.time()
+    for i in range(options.repeat):
+        statuses = replay(queries)
+    elapsed = time.time() - start
+
+    total = len(queries) * options.repeat
+    cache = update.update_cache
+    lookups = cache.hits + cache.misses
+    print '%s requests in %.2fs, %.1f requests/sec' % (
+        total, elapsed, total / elapsed)
+    print 'Statuses of the last run: %s' % statuses
+    print 'Cache: %s hits, %s misses, %.1f%% hit rate, %s entries' % (
+        cache.hits, cache.misses,
+        100.0 * cache.hits / lookups if lookups else 0, len(cache.entries))
+
+
+if __name__ == '__main__':
+    main()
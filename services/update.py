@@ -24,6 +24,7 @@ except ImportError:
     from apps.versions.compare import version_int
 
 from constants import applications, base
+from update_cache import UpdateCache
 from utils import (APP_GUIDS, get_mirror, log_configure, PLATFORMS,
                    STATUSES_PUBLIC)
 
@@ -75,6 +76,39 @@ no_updates_rdf = """<?xml version="1.0"?>
 </RDF:RDF>"""
 
 
+# The columns of an update row, see `Update.get_update()`, and the tables
+# they come from.
+update_columns = """
+    addons.guid as guid, addons.addontype_id as type,
+    addons.inactive as disabled_by_user,
+    applications.guid as appguid, appmin.version as min,
+    appmax.version as max, files.id as file_id,
+    files.status as file_status, files.hash,
+    files.filename, versions.id as version_id,
+    files.datestatuschanged as datestatuschanged,
+    files.strict_compatibility as strict_compat,
+    versions.releasenotes, versions.version as version,
+    addons.premium_type
+"""
+
+update_joins = """
+    FROM versions
+    INNER JOIN addons
+        ON addons.id = versions.addon_id AND addons.id = %(id)s
+    INNER JOIN applications_versions
+        ON applications_versions.version_id = versions.id
+    INNER JOIN applications
+        ON applications_versions.application_id = applications.id
+        AND applications.id = %(app_id)s
+    INNER JOIN appversions appmin
+        ON appmin.id = applications_versions.min
+    INNER JOIN appversions appmax
+        ON appmax.id = applications_versions.max
+    INNER JOIN files
+        ON files.version_id = versions.id
+"""
+
+
 timing_log = commonware.log.getLogger('z.timer')
 error_log = commonware.log.getLogger('z.services')
 
@@ -88,9 +122,137 @@ def getconn():
 mypool = pool.QueuePool(getconn, max_overflow=10, pool_size=5, recycle=300)
 
 
+update_cache = UpdateCache(
+    getattr(settings, 'SERVICES_UPDATE_CACHE_SIZE', 0),
+    getattr(settings, 'SERVICES_UPDATE_CACHE_TIMEOUT', 0),
+    servers=getattr(settings, 'SERVICES_UPDATE_CACHE_SERVERS', None))
+
+
+def _le(a, b):
+    """`a <= b` with the semantics of SQL, where NULL never matches."""
+    return a is not None and b is not None and a <= b
+
+
+class CompatIndex(object):
+    """
+    An in-memory index of the files an add-on offers for an application.
+
+    The first lookup for an (add-on, application) pair loads all its files
+    along with the version ranges they are compatible with and the compat
+    overrides of its versions, in two queries. Every later lookup for that
+    pair, whatever the application version, compat mode or status asked for,
+    is answered from memory until the entry expires or is invalidated, see
+    `UpdateCache`.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def load(self, update):
+        data = update.data
+        update.cursor.execute(''.join([
+            'SELECT ', update_columns, """,
+                files.platform_id, files.binary_components,
+                appmin.version_int, appmax.version_int""",
+            update_joins, 'ORDER BY versions.id DESC;']), data)
+        files = update.cursor.fetchall()
+
+        update.cursor.execute("""
+            SELECT version_id, app_id, min_app_version, max_app_version,
+                   min_app_version_int, max_app_version_int
+            FROM incompatible_versions
+            INNER JOIN versions
+                ON versions.id = incompatible_versions.version_id
+            WHERE versions.addon_id = %(id)s;""", data)
+        overrides = update.cursor.fetchall()
+        return files, overrides
+
+    def get(self, update):
+        key = (update.data['guid'], update.data['app_id'])
+        entry = self.cache.get(key)
+        if entry is None:
+            generation = self.cache.generation_for(key)
+            entry = self.load(update)
+            self.cache.set(key, entry, generation)
+        return entry
+
+    def get_incompatible(self, overrides, app_id, vint):
+        """
+        Return the ids of the versions made incompatible by compat overrides.
+
+        This mirrors the incompatible_versions subquery of
+        `Update.get_update_sql()`, including the operator precedence that
+        makes the application only matter for overrides starting at "0".
+        """
+        return set(
+            version_id for (version_id, app, min_version, max_version,
+                            min_int, max_int) in overrides
+            if (app == app_id and min_version == '0' and
+                _le(vint, max_int)) or
+               (_le(min_int, vint) and max_version == '*') or
+               (_le(min_int, vint) and _le(vint, max_int)))
+
+    def lookup(self, update):
+        """
+        Return the same row as `Update.get_update_sql()` would for `update`.
+        """
+        data, flags = update.data, update.flags
+        files, overrides = self.get(update)
+        vint = data['version_int']
+        platforms = (1, data['appOS']) if data.get('appOS') else (1,)
+        if update.compat_mode == 'normal':
+            d2c_max = applications.D2C_MAX_VERSIONS.get(data['app_id'])
+            d2c_max = version_int(d2c_max) if d2c_max else None
+            incompatible = self.get_incompatible(overrides, data['app_id'],
+                                                 vint)
+
+        for f in files:
+            row, (platform, binary, min_int, max_int) = f[:16], f[16:]
+            file_status, version_id, version = f[7], f[10], f[14]
+            if platform not in platforms:
+                continue
+
+            if flags['use_version']:
+                if not (file_status > data['status'] and
+                        version == data['version']):
+                    continue
+            elif flags['multiple_status']:
+                if file_status not in STATUSES_PUBLIC.values():
+                    continue
+            elif file_status != data['status']:
+                continue
+
+            if not _le(min_int, vint):
+                continue
+
+            if update.compat_mode == 'ignore':
+                pass
+            elif update.compat_mode == 'normal':
+                strict_compat = f[12]
+                if ((strict_compat or binary) and
+                        not _le(vint, max_int)):
+                    continue
+                if d2c_max and not _le(d2c_max, max_int):
+                    continue
+                if version_id in incompatible:
+                    continue
+            elif not _le(vint, max_int):
+                continue
+
+            return row
+        return None
+
+
+compat_index = CompatIndex(UpdateCache(
+    getattr(settings, 'SERVICES_UPDATE_INDEX_SIZE', 0),
+    getattr(settings, 'SERVICES_UPDATE_CACHE_TIMEOUT', 0),
+    servers=getattr(settings, 'SERVICES_UPDATE_CACHE_SERVERS', None),
+    name='update.index'))
+
+
 class Update(object):
 
-    def __init__(self, data, compat_mode='strict'):
+    def __init__(self, data, compat_mode='strict', compat_index=None):
         self.conn, self.cursor = None, None
         self.data = data.copy()
         self.data['row'] = {}
@@ -98,6 +260,27 @@ class Update(object):
         self.is_beta_version = False
         self.version_int = 0
         self.compat_mode = compat_mode
+        self.compat_index = compat_index
+
+    def get_cache_key(self):
+        """
+        Return the normalized query the response depends on, or None if the
+        query is invalid anyway.
+        """
+        data = self.data
+        for field in ['reqVersion', 'id', 'appID', 'appVersion']:
+            if field not in data:
+                return None
+
+        app_os = None
+        for k, v in PLATFORMS.items():
+            if k in data.get('appOS', ''):
+                app_os = v
+                break
+
+        # MySQL matches guids without case, any casing gets the same response.
+        return (data['id'].lower(), data.get('version', ''), data['appID'],
+                data['appVersion'], app_os, self.compat_mode)
 
     def is_valid(self):
         # If you accessing this from unit tests, then before calling
@@ -181,33 +364,32 @@ class Update(object):
         self.get_beta()
         data = self.data
 
-        sql = ["""
-            SELECT
-                addons.guid as guid, addons.addontype_id as type,
-                addons.inactive as disabled_by_user,
-                applications.guid as appguid, appmin.version as min,
-                appmax.version as max, files.id as file_id,
-                files.status as file_status, files.hash,
-                files.filename, versions.id as version_id,
-                files.datestatuschanged as datestatuschanged,
-                files.strict_compatibility as strict_compat,
-                versions.releasenotes, versions.version as version,
-                addons.premium_type
-            FROM versions
-            INNER JOIN addons
-                ON addons.id = versions.addon_id AND addons.id = %(id)s
-            INNER JOIN applications_versions
-                ON applications_versions.version_id = versions.id
-            INNER JOIN applications
-                ON applications_versions.application_id = applications.id
-                AND applications.id = %(app_id)s
-            INNER JOIN appversions appmin
-                ON appmin.id = applications_versions.min
-            INNER JOIN appversions appmax
-                ON appmax.id = applications_versions.max
-            INNER JOIN files
-                ON files.version_id = versions.id AND (files.platform_id = 1
-            """]
+        if self.compat_index is not None:
+            result = self.compat_index.lookup(self)
+        else:
+            result = self.get_update_sql()
+
+        if result:
+            row = dict(zip([
+                'guid', 'type', 'disabled_by_user', 'appguid', 'min', 'max',
+                'file_id', 'file_status', 'hash', 'filename', 'version_id',
+                'datestatuschanged', 'strict_compat', 'releasenotes',
+                'version', 'premium_type'],
+                list(result)))
+            row['type'] = base.ADDON_SLUGS_UPDATE[row['type']]
+            row['url'] = get_mirror(self.data['addon_status'],
+                                    self.data['id'], row)
+            data['row'] = row
+            return True
+
+        return False
+
+    def get_update_sql(self):
+        """Return the row of the best file to update to, straight from SQL."""
+        data = self.data
+
+        sql = ['SELECT ', update_columns, update_joins,
+               ' AND (files.platform_id = 1']
         if data.get('appOS'):
             sql.append(' OR files.platform_id = %(appOS)s')
 
@@ -261,22 +443,7 @@ class Update(object):
         sql.append('ORDER BY versions.id DESC LIMIT 1;')
 
         self.cursor.execute(''.join(sql), data)
-        result = self.cursor.fetchone()
-
-        if result:
-            row = dict(zip([
-                'guid', 'type', 'disabled_by_user', 'appguid', 'min', 'max',
-                'file_id', 'file_status', 'hash', 'filename', 'version_id',
-                'datestatuschanged', 'strict_compat', 'releasenotes',
-                'version', 'premium_type'],
-                list(result)))
-            row['type'] = base.ADDON_SLUGS_UPDATE[row['type']]
-            row['url'] = get_mirror(self.data['addon_status'],
-                                    self.data['id'], row)
-            data['row'] = row
-            return True
-
-        return False
+        return self.cursor.fetchone()
 
     def get_bad_rdf(self):
         return bad_rdf
@@ -352,8 +519,15 @@ def application(environ, start_response):
         data = dict(parse_qsl(environ['QUERY_STRING']))
         compat_mode = data.pop('compatMode', 'strict')
         try:
-            update = Update(data, compat_mode)
-            output = update.get_rdf()
+            update = Update(data, compat_mode,
+                            compat_index=compat_index
+                            if compat_index.cache.size else None)
+            key = update.get_cache_key()
+            output = update_cache.get(key)
+            if output is None:
+                generation = update_cache.generation_for(key)
+                output = update.get_rdf()
+                update_cache.set(key, output, generation)
             start_response(status, update.get_headers(len(output)))
         except:
             #mail_exception(data)
@@ -0,0 +1,118 @@
+"""
+A cache for the responses of the update service, see services/update.py.
+
+This doesn't import any settings so that the Django side can use it to
+invalidate cached responses when add-ons change.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from time import time
+
+import commonware.log
+import memcache
+from django_statsd.clients import statsd
+
+
+log = commonware.log.getLogger('z.services')
+
+
+class UpdateCache(object):
+    """
+    A bounded LRU cache of update RDF responses, with a timeout.
+
+    Entries are keyed on tuples starting with the add-on guid, e.g. the
+    normalized query for responses, see `Update.get_cache_key()`.
+    When memcache `servers` are given, a generation number per add-on guid is
+    kept there and stored alongside each entry, so that bumping it with
+    `invalidate()` from any process expires the entries of that add-on.
+
+    The generation has to be read with `generation_for()` before reading the
+    database for a new entry: bumped after the change is committed, it then
+    expires the entries computed from the data before the change.
+    """
+
+    def __init__(self, size, timeout, servers=None, name='update'):
+        self.size = size
+        self.name = name
+        self.timeout = timeout
+        self.client = memcache.Client(servers) if servers else None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def generation_key(self, guid):
+        # Guids are matched without case by MySQL, and can contain characters
+        # memcache doesn't accept in keys.
+        return 'update:generation:%s' % hashlib.md5(
+            guid.lower().encode('utf-8')).hexdigest()
+
+    def get_generation(self, guid):
+        if not self.client:
+            return 0
+        try:
+            return self.client.get(self.generation_key(guid)) or 0
+        except Exception:
+            log.info(u'Unable to fetch update cache generation.')
+            return None
+
+    def generation_for(self, key):
+        """Returns the generation to `set()` the entry `key` with."""
+        if not self.size or key is None:
+            return None
+        return self.get_generation(key[0])
+
+    def get(self, key):
+        if not self.size or key is None:
+            return None
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            statsd.incr('services.%s.cache.miss' % self.name)
+            return None
+
+        expires, generation, value = entry
+        if (expires < time() or
+                generation != self.get_generation(key[0])):
+            self.misses += 1
+            statsd.incr('services.%s.cache.expired' % self.name)
+            return None
+
+        with self.lock:
+            # Put it back at the end, as the most recently used.
+            self.entries[key] = entry
+        self.hits += 1
+        statsd.incr('services.%s.cache.hit' % self.name)
+        return value
+
+    def set(self, key, value, generation):
+        if not self.size or key is None or generation is None:
+            # Without a generation, memcache was unreachable and we wouldn't
+            # be able to invalidate.
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time() + self.timeout, generation, value)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        statsd.gauge('services.%s.cache.size' % self.name,
+                     len(self.entries))
+
+    def invalidate(self, guid):
+        """Expire the cached responses for the add-on `guid`, everywhere."""
+        with self.lock:
+            for key in [k for k in self.entries
+                        if k[0].lower() == guid.lower()]:
+                del self.entries[key]
+        if self.client:
+            key = self.generation_key(guid)
+            try:
+                if self.client.incr(key) is None:
+                    self.client.set(key, 1)
+            except Exception:
+                log.info(u'Unable to invalidate update cache.')
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
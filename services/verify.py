@@ -1,5 +1,6 @@
 import calendar
 import json
+import threading
 from datetime import datetime
 from time import gmtime, time
 from urlparse import parse_qsl, urlparse
@@ -27,6 +28,7 @@ import receipts  # NOQA, used for patching in the tests
 
 status_codes = {
     200: '200 OK',
+    400: '400 Bad Request',
     405: '405 Method Not Allowed',
     500: '500 Internal Server Error',
 }
@@ -50,9 +52,11 @@ class RefundedReceipt(Exception):
 
 class Verify:
 
-    def __init__(self, receipt, environ):
+    def __init__(self, receipt, environ, verifier=None):
         self.receipt = receipt
         self.environ = environ
+        # A ReceiptVerifier to share between receipts, see `VerifyBatch`.
+        self.verifier = verifier
         # These will be extracted from the receipt.
         self.decoded = None
         self.addon_id = None
@@ -73,15 +77,28 @@ class Verify:
         """
         receipt_domain = urlparse(settings.WEBAPPS_RECEIPT_URL).netloc
         try:
-            self.decoded = self.decode()
-            self.check_type('purchase-receipt')
-            self.check_db()
-            self.check_url(receipt_domain)
+            self.check_purchase_receipt(receipt_domain)
         except InvalidReceipt, err:
             return self.invalid(str(err))
 
+        return self.purchase_status(self.check_purchase)
+
+    def check_purchase_receipt(self, receipt_domain):
+        """
+        Verifies everything about a purchase receipt but the purchase itself.
+        """
+        self.decoded = self.decode()
+        self.check_type('purchase-receipt')
+        self.check_db()
+        self.check_url(receipt_domain)
+
+    def purchase_status(self, check, *args):
+        """
+        Returns the status of the receipt, once the purchase has been
+        verified by calling `check` with `args`.
+        """
         try:
-            self.check_purchase()
+            check(*args)
         except InvalidReceipt, err:
             return self.invalid(str(err))
         except RefundedReceipt:
@@ -129,7 +146,7 @@ class Verify:
         information.
         """
         try:
-            receipt = decode_receipt(self.receipt)
+            receipt = decode_receipt(self.receipt, verifier=self.verifier)
         except:
             log_exception({'receipt': '%s...' % self.receipt[:10],
                            'addon': self.addon_id})
@@ -207,7 +224,13 @@ class Verify:
                  AND uuid = %(uuid)s LIMIT 1;"""
         self.cursor.execute(sql, {'addon_id': self.addon_id,
                                   'uuid': self.uuid})
-        result = self.cursor.fetchone()
+        self.check_purchase_result(self.cursor.fetchone())
+
+    def check_purchase_result(self, result):
+        """
+        Verifies the purchase found for the receipt, a row ending with the
+        type of the purchase, or None.
+        """
         if not result:
             log_info('Invalid receipt, no purchase')
             raise InvalidReceipt('NO_PURCHASE')
@@ -269,6 +292,75 @@ class Verify:
         return {'status': 'expired'}
 
 
+class VerifyBatch:
+    """
+    Verifies many purchase receipts at once, for example when an app restores
+    its purchases on a new device.
+
+    Each receipt gets the same checks and status as with `Verify.check_full`,
+    but the receipts are decoded with one verifier and all the purchases are
+    looked up in a single query.
+    """
+
+    def __init__(self, batch, environ):
+        self.batch = batch
+        self.environ = environ
+        # This is so the unit tests can override the connection.
+        self.conn, self.cursor = None, None
+
+    def setup_db(self):
+        if not self.cursor:
+            self.conn = mypool.connect()
+            self.cursor = self.conn.cursor()
+
+    def check_full(self):
+        """
+        Returns the status of each receipt, in the order they were given.
+        """
+        self.setup_db()
+        receipt_domain = urlparse(settings.WEBAPPS_RECEIPT_URL).netloc
+        verifier = get_verifier()
+        results, valid = [], []
+        for receipt in self.batch:
+            verify = Verify(receipt, self.environ, verifier=verifier)
+            verify.conn, verify.cursor = self.conn, self.cursor
+            try:
+                verify.check_purchase_receipt(receipt_domain)
+            except InvalidReceipt, err:
+                results.append(verify.invalid(str(err)))
+                continue
+            valid.append((len(results), verify))
+            results.append(None)
+
+        purchases = self.get_purchases(
+            set((verify.addon_id, verify.uuid) for _, verify in valid))
+        for index, verify in valid:
+            results[index] = verify.purchase_status(
+                verify.check_purchase_result,
+                purchases.get((verify.addon_id, verify.uuid)))
+        return results
+
+    def get_purchases(self, keys):
+        """
+        Returns the purchases for the (addon_id, uuid) `keys`, as a dict of
+        rows ending with the type of the purchase.
+        """
+        if not keys:
+            return {}
+
+        keys = list(keys)
+        sql = """SELECT addon_id, uuid, type FROM addon_purchase
+                 WHERE (addon_id, uuid) IN (%s);""" % (
+            ', '.join(['(%s, %s)'] * len(keys)))
+        with statsd.timer('services.verify.batch.purchases'):
+            self.cursor.execute(sql, [v for key in keys for v in key])
+        purchases = {}
+        for row in self.cursor.fetchall():
+            # Like the single lookup, any purchase for the receipt will do.
+            purchases.setdefault((row[0], row[1]), row)
+        return purchases
+
+
 def get_headers(length):
     return [('Access-Control-Allow-Origin', '*'),
             ('Access-Control-Allow-Methods', 'POST'),
@@ -278,15 +370,79 @@ def get_headers(length):
             ('Last-Modified', format_date_time(time()))]
 
 
-def decode_receipt(receipt):
+class LoadCache(object):
+    """
+    Keeps what `load(*args)` returns in memory, for the whole process, until
+    it is older than `timeout` seconds, `args` change or `reload()` is called.
+    """
+
+    def __init__(self, name, load, timeout):
+        self.name = name
+        self.load = load
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.args = None
+        self.value = None
+        self.expires = 0
+
+    def get(self, *args):
+        if self.expires < time() or self.args != args:
+            with self.lock:
+                # Another thread could have loaded it in the meantime.
+                if self.expires < time() or self.args != args:
+                    with statsd.timer('services.verify.%s.load' % self.name):
+                        self.value = self.load(*args)
+                    self.args = args
+                    self.expires = time() + self.timeout
+        return self.value
+
+    def reload(self):
+        """Loads it again on the next `get()`."""
+        self.expires = 0
+
+
+verifier_cache = LoadCache(
+    'verifier',
+    lambda cls, issuers: cls(valid_issuers=list(issuers)),
+    getattr(settings, 'SIGNING_VERIFIER_CACHE_TIMEOUT', 0))
+key_cache = LoadCache(
+    'key', lambda path: jwt.rsa_load(path),
+    getattr(settings, 'SIGNING_VERIFIER_CACHE_TIMEOUT', 0))
+
+
+def reload_certs():
+    """
+    Forces the receipt verifier, and so the issuer certificates, and the
+    receipt key to be loaded again, for example after rotating them.
+    """
+    verifier_cache.reload()
+    key_cache.reload()
+
+
+def get_verifier():
+    """
+    Returns the ReceiptVerifier to check receipts against the signing server
+    certs, or None if it's not used.
+
+    The verifier, and the issuer certificates it has fetched, are shared by
+    the requests for SIGNING_VERIFIER_CACHE_TIMEOUT seconds.
+    """
+    if settings.SIGNING_SERVER_ACTIVE:
+        return verifier_cache.get(certs.ReceiptVerifier,
+                                  tuple(settings.SIGNING_VALID_ISSUERS))
+
+
+def decode_receipt(receipt, verifier=None):
     """
     Cracks the receipt using the private key. This will probably change
     to using the cert at some point, especially when we get the HSM.
+
+    A `verifier` from `get_verifier` can be given to avoid looking it up
+    for each receipt.
     """
     with statsd.timer('services.decode'):
         if settings.SIGNING_SERVER_ACTIVE:
-            verifier = certs.ReceiptVerifier(valid_issuers=
-                                             settings.SIGNING_VALID_ISSUERS)
+            verifier = verifier or get_verifier()
             try:
                 result = verifier.verify(receipt)
             except ExpiredSignatureError:
@@ -296,7 +452,7 @@ def decode_receipt(receipt):
                 raise VerificationError()
             return jwt.decode(receipt.split('~')[1], verify=False)
         else:
-            key = jwt.rsa_load(settings.WEBAPPS_RECEIPT_KEY)
+            key = key_cache.get(settings.WEBAPPS_RECEIPT_KEY)
             raw = jwt.decode(receipt, key)
     return raw
 
@@ -319,10 +475,37 @@ def status_check(environ):
     return 200, output
 
 
+def get_batch(data):
+    """
+    Returns the receipts posted as a JSON array, or None if a single receipt
+    was posted.
+
+    Raises ValueError if the array isn't a valid batch of receipts.
+    """
+    if not data.lstrip().startswith('['):
+        return None
+
+    batch = json.loads(data)
+    if (not isinstance(batch, list) or
+            len(batch) > settings.WEBAPPS_RECEIPT_VERIFY_BATCH_SIZE or
+            not all(isinstance(r, basestring) for r in batch)):
+        raise ValueError('Invalid batch of receipts')
+    return [r.encode('utf-8') for r in batch]
+
+
 def receipt_check(environ):
     output = ''
     with statsd.timer('services.verify'):
         data = environ['wsgi.input'].read()
+        try:
+            batch = get_batch(data)
+        except ValueError:
+            log_info('Invalid batch of receipts')
+            return 400, ''
+
+        if batch is not None:
+            return batch_receipt_check(batch, environ)
+
         try:
             verify = Verify(data, environ)
             return 200, json.dumps(verify.check_full())
@@ -332,6 +515,17 @@ def receipt_check(environ):
     return output
 
 
+def batch_receipt_check(batch, environ):
+    with statsd.timer('services.verify.batch'):
+        statsd.incr('services.verify.batch.receipts', len(batch))
+        try:
+            verify = VerifyBatch(batch, environ)
+            return 200, json.dumps(verify.check_full())
+        except:
+            log_exception('<none>')
+            return 500, ''
+
+
 def application(environ, start_response):
     body = ''
     path = environ.get('PATH_INFO', '')
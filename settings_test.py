@@ -44,6 +44,7 @@ COLLECTIONS_ICON_PATH = _polite_tmpdir()
 PACKAGER_PATH = _polite_tmpdir()
 REVIEWER_ATTACHMENTS_PATH = _polite_tmpdir()
 DUMPED_APPS_PATH = _polite_tmpdir()
+DUMP_PROCESSES = 1
 
 # Don't call out to persona in tests.
 AUTHENTICATION_BACKENDS = (
@@ -87,6 +88,12 @@ CACHES = {
 # is just too annoying for tests, so disable it.
 CACHE_COUNT_TIMEOUT = -1
 
+# Reload the region exclusions as soon as the cache is cleared.
+REGION_EXCLUSIONS_CHECK_INTERVAL = 0
+
+# Don't wait between the manifests fetched from the same host.
+MANIFEST_CRAWLER_HOST_INTERVAL = 0
+
 # No more failures!
 APP_PREVIEW = False
 